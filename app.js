@@ -1,4 +1,4 @@
-const { createApp, ref, computed, onMounted } = Vue;
+const { createApp, ref, computed, onMounted, watch } = Vue;
 
 createApp({
     setup() {
@@ -9,6 +9,8 @@ createApp({
         const loading = ref(false);
         const selected_item = ref(null);
         const selected_item_type = ref('');
+        // 选中项目的关联记录，例如分类的文献、上级分类和样本
+        const related = ref({});
         
         // 数据存储
         const literatureData = ref([]);
@@ -22,101 +24,39 @@ createApp({
             { id: 'about', name: '关于' }
         ];
 
-        // 等待数据加载完成
-        const waitForData = () => {
-            return new Promise(resolve => {
-                const checkData = () => {
-                    if (window.sampleData) {
-                        resolve(window.sampleData);
-                    } else {
-                        setTimeout(checkData, 100);
-                    }
-                };
-                checkData();
-            });
+        // 各集合在没有预建倒排表时逐条扫描的字段
+        const searchFields = {
+            literature: ['id', 'title', 'authors', 'journal', 'year', 'doi', 'abstract'],
+            taxonomy: ['id', 'name', 'level', 'type', 'lit_id', 'description'],
+            samples: ['id', 'tax_id', 'collector', 'latitude', 'longitude', 'description']
         };
 
-        // 初始化数据
-        const initData = async () => {
+        // 按需加载集合后用预建的倒排表搜索，首屏只请求当前标签页的数据
+        const fetchCollection = async (name, target, searchTerm) => {
             try {
                 loading.value = true;
-                await waitForData();
-                literatureData.value = window.sampleData.literature || [];
-                taxonomyData.value = window.sampleData.taxonomy || [];
-                sampleData.value = window.sampleData.samples || [];
+                const collection = await loadCollection(name);
+                target.value = searchCollection(collection, searchTerm.value, searchFields[name]);
             } catch (error) {
-                console.error('初始化数据出错:', error);
+                console.error('处理数据出错:', error);
             } finally {
                 loading.value = false;
             }
         };
 
-        // 搜索算法实现
-        const searchInData = (data, searchTerm, fields) => {
-            if (!searchTerm) return data;
-            
-            const term = searchTerm.toLowerCase();
-            return data.filter(item => {
-                return fields.some(field => {
-                    const value = item[field];
-                    if (value === undefined || value === null) return false;
-                    return value.toString().toLowerCase().includes(term);
-                });
-            });
-        };
-
         // 获取文献数据
-        const fetchLiterature = async () => {
-            try {
-                loading.value = true;
-                await waitForData();
-                // 使用本地数据和搜索算法
-                literatureData.value = searchInData(
-                    window.sampleData.literature || [], 
-                    literatureSearch.value,
-                    ['id', 'title', 'authors', 'journal', 'year', 'doi', 'abstract']
-                );
-            } catch (error) {
-                console.error('处理文献数据出错:', error);
-            } finally {
-                loading.value = false;
-            }
-        };
+        const fetchLiterature = () => fetchCollection('literature', literatureData, literatureSearch);
 
         // 获取分类数据
-        const fetchTaxonomy = async () => {
-            try {
-                loading.value = true;
-                await waitForData();
-                // 使用本地数据和搜索算法
-                taxonomyData.value = searchInData(
-                    window.sampleData.taxonomy || [], 
-                    taxonomySearch.value,
-                    ['id', 'name', 'level', 'type', 'lit_id', 'description']
-                );
-            } catch (error) {
-                console.error('处理分类数据出错:', error);
-            } finally {
-                loading.value = false;
-            }
-        };
+        const fetchTaxonomy = () => fetchCollection('taxonomy', taxonomyData, taxonomySearch);
 
         // 获取样本数据
-        const fetchSamples = async () => {
-            try {
-                loading.value = true;
-                await waitForData();
-                // 使用本地数据和搜索算法
-                sampleData.value = searchInData(
-                    window.sampleData.samples || [], 
-                    sampleSearch.value,
-                    ['id', 'tax_id', 'collector', 'latitude', 'longitude', 'description']
-                );
-            } catch (error) {
-                console.error('处理样本数据出错:', error);
-            } finally {
-                loading.value = false;
-            }
+        const fetchSamples = () => fetchCollection('samples', sampleData, sampleSearch);
+
+        const fetchers = {
+            literature: fetchLiterature,
+            taxonomy: fetchTaxonomy,
+            samples: fetchSamples
         };
 
         // 生成ID（仅用于演示，实际部署时需要后端支持）
@@ -126,12 +66,13 @@ createApp({
             return `${prefix}-${Math.random().toString(36).substr(2, 9)}`;
         };
 
-        // 初始化数据获取
-        onMounted(async () => {
-            await initData();
-            await fetchLiterature();
-            await fetchTaxonomy();
-            await fetchSamples();
+        // 初始化数据获取，只加载当前标签页，其余集合在切换到对应标签页时再加载
+        onMounted(() => {
+            if (fetchers[activeTab.value]) fetchers[activeTab.value]();
+        });
+
+        watch(activeTab, tab => {
+            if (fetchers[tab]) fetchers[tab]();
         });
 
         // 监听搜索变化
@@ -147,16 +88,37 @@ createApp({
             fetchSamples();
         };
 
+        // 通过数据包的ID和外键查找表取出关联记录，不逐条扫描集合
+        const loadRelated = async (item, type) => {
+            const result = {};
+            if (type === 'literature') {
+                result.taxa = findByKey(await loadCollection('taxonomy'), 'lit_id', item.id);
+            } else if (type === 'taxonomy') {
+                const [literature, taxonomy, samples] = await Promise.all(
+                    ['literature', 'taxonomy', 'samples'].map(loadCollection));
+                result.literature = findById(literature, item.lit_id);
+                result.parent = item.parent_tax_id ? findById(taxonomy, item.parent_tax_id) : null;
+                result.samples = findByKey(samples, 'tax_id', item.id);
+            } else if (type === 'sample') {
+                result.taxon = findById(await loadCollection('taxonomy'), item.tax_id);
+            }
+            // 加载期间可能已经选中了其他项目
+            if (selected_item.value === item) related.value = result;
+        };
+
         // 选中项目
         const selectItem = (item, type) => {
             selected_item.value = item;
             selected_item_type.value = type;
+            related.value = {};
+            loadRelated(item, type).catch(error => console.error('加载关联数据出错:', error));
         };
 
         // 取消选中项目
         const deselectItem = () => {
             selected_item.value = null;
             selected_item_type.value = '';
+            related.value = {};
         };
 
         // 过滤后的数据
@@ -181,6 +143,7 @@ createApp({
             loading,
             selected_item,
             selected_item_type,
+            related,
             filteredLiterature,
             filteredTaxonomy,
             filteredSamples,
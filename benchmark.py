@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""
+性能基准：在合成数据上测量服务器各API路由（带与不带搜索）、写入吞吐量、冷启动，
+以及管理界面 refresh_*_table 的耗时（离屏运行），结果写成JSON，可以与之前的结果比较以发现性能回退
+
+路由分别测量冷请求（每次请求前清空响应体缓存和学名模糊匹配的缓存，真正执行查询和序列化）和命中响应体缓存的热请求
+
+    python benchmark.py --sizes 10k,100k --storage json,journal --json results.json
+    python benchmark.py --sizes 10k --compare results.json
+
+每种规模和存储方式都在临时目录中的数据副本上运行，服务器和界面分别在独立的子进程中测量
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from generate_data import generate, parse_size
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_FILES = ['literature.json', 'taxonomy.json', 'sample.json']
+# 生成的数据按规模和种子缓存，重复运行时不必重新生成
+DATA_CACHE_DIR = os.path.join(REPO_DIR, '.bench_data')
+# 与之前的结果相比变慢超过这个比例时视为性能回退
+DEFAULT_THRESHOLD = 0.2
+# 绝对差值小于1毫秒的变化视为测量噪声
+NOISE_FLOOR_MS = 1.0
+
+
+def timed(function, repeat, setup=None):
+    """重复执行并返回耗时统计（毫秒），setup 在每次执行前调用，不计入耗时"""
+    samples = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        function()
+        samples.append((time.perf_counter() - started) * 1000)
+    return {
+        'median_ms': round(statistics.median(samples), 3),
+        'min_ms': round(min(samples), 3),
+        'max_ms': round(max(samples), 3),
+    }
+
+
+def benchmark_routes(server, client, repeat):
+    """按数据中实际存在的ID生成各路由的请求并计时"""
+    literature = server.store['literature'].all()
+    taxonomy = server.store['taxonomy'].all()
+    samples = server.store['samples'].all()
+    species = next((taxon for taxon in reversed(taxonomy) if taxon.get('parent_tax_id')), taxonomy[-1])
+    family = next((taxon for taxon in taxonomy if taxon.get('level') == 'Family'), taxonomy[0])
+    sample = next((item for item in samples if item.get('latitude')), samples[0])
+    lat, lon = sample['latitude'], sample['longitude']
+
+    routes = [
+        ('literature', '/api/literature'),
+        ('literature_page', '/api/literature?limit=50&offset=100'),
+        ('literature_search', '/api/literature?search=新种'),
+        ('literature_search_prefix', '/api/literature?search=revis'),
+        ('literature_item', f"/api/literature/{literature[len(literature) // 2]['id']}"),
+        ('taxonomy', '/api/taxonomy'),
+        ('taxonomy_page', '/api/taxonomy?limit=50&offset=1000'),
+        ('taxonomy_search', '/api/taxonomy?search=mirifica'),
+        ('taxonomy_search_cjk', '/api/taxonomy?search=螺层'),
+        ('taxonomy_by_literature', f"/api/taxonomy?lit_id={species['lit_id']}"),
+        ('taxonomy_item', f"/api/taxonomy/{species['id']}"),
+        ('taxonomy_ancestors', f"/api/taxonomy/{species['id']}/ancestors"),
+        ('taxonomy_descendants', f"/api/taxonomy/{family['id']}/descendants"),
+        ('taxonomy_full', f"/api/taxonomy/{species['id']}/full"),
+        # 删掉一个字母的学名前缀，需要模糊匹配
+        ('taxonomy_suggest', f"/api/taxonomy/suggest?q={species['name'][:3] + species['name'][4:12]}"),
+        ('samples', '/api/samples'),
+        ('samples_search', '/api/samples?search=IZ'),
+        ('samples_by_taxon', f"/api/samples?tax_id={sample['tax_id']}"),
+        ('samples_bbox', f'/api/samples?bbox={lon - 1},{lat - 1},{lon + 1},{lat + 1}'),
+        ('samples_near', f'/api/samples?near={lat},{lon}&radius_km=50'),
+        ('stats', '/api/stats'),
+        ('facets', '/api/facets'),
+        ('changes', '/api/changes?since=0'),
+    ]
+
+    def clear_caches():
+        # 冷请求不命中响应体缓存，也不命中学名模糊匹配的缓存
+        server.response_cache.clear()
+        server.taxon_names.clear_cache()
+
+    results = {}
+    for name, path in routes:
+        clear_caches()
+        response = client.get(path)
+        body = response.get_data()
+
+        def request():
+            client.get(path).get_data()
+
+        cold = timed(request, repeat, clear_caches)
+        # 带查询参数的结果第二次请求时才放入缓存
+        request()
+        request()
+        warm = timed(request, repeat)
+        results[name] = dict(cold, warm_median_ms=warm['median_ms'], path=path, status=response.status_code,
+                             bytes=len(body))
+    return results
+
+
+def benchmark_writes(client, writes, batch):
+    """单条写入和批量导入的吞吐量"""
+    started = time.perf_counter()
+    for i in range(writes):
+        client.post('/api/samples', json={'id': f'BENCH-{i}', 'tax_id': 'BENCH', 'collector': 'benchmark'})
+    single = time.perf_counter() - started
+
+    body = '\n'.join(json.dumps({'id': f'BENCH-BULK-{i}', 'tax_id': 'BENCH', 'latitude': 25.0, 'longitude': 110.0})
+                     for i in range(batch))
+    started = time.perf_counter()
+    response = client.post('/api/samples/bulk', data=body.encode('utf-8'), content_type='application/x-ndjson')
+    bulk = time.perf_counter() - started
+    return {
+        'single_writes': writes,
+        'single_writes_per_sec': round(writes / single, 1),
+        'bulk_records': batch,
+        'bulk_status': response.status_code,
+        'bulk_records_per_sec': round(batch / bulk, 1),
+    }
+
+
+def run_server_suite(repeat, writes, batch):
+    """在当前目录的数据上测量服务器，冷启动包括导入模块和第一次加载全部集合"""
+    started = time.perf_counter()
+    import server
+    imported = time.perf_counter()
+    client = server.app.test_client()
+    client.get('/api/stats').get_data()
+    loaded = time.perf_counter()
+
+    return {
+        'cold_start': {
+            'import_seconds': round(imported - started, 3),
+            'first_request_seconds': round(loaded - imported, 3),
+            'total_seconds': round(loaded - started, 3),
+        },
+        'routes': benchmark_routes(server, client, repeat),
+        'writes': benchmark_writes(client, writes, batch),
+    }
+
+
+def run_gui_suite(repeat, timeout):
+    """离屏运行管理界面，测量窗口显示、后台加载完成以及各表格刷新的耗时"""
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    try:
+        from PyQt5.QtWidgets import QApplication
+    except ImportError as e:
+        return {'skipped': str(e)}
+
+    app = QApplication.instance() or QApplication([])
+    import taxonomy_manager
+
+    started = time.perf_counter()
+    window = taxonomy_manager.TaxonomyManager()
+    window.show()
+    app.processEvents()
+    shown = time.perf_counter()
+    deadline = shown + timeout
+    while window.loading and time.perf_counter() < deadline:
+        app.processEvents()
+        time.sleep(0.001)
+    loaded = time.perf_counter()
+
+    results = {
+        'window_seconds': round(shown - started, 3),
+        'load_seconds': round(loaded - started, 3),
+        'rows': {name: model.rowCount() for name, model in window.models.items()},
+        'refresh': {},
+    }
+    # 停止定期同步并等待进行中的同步完成，避免后台线程抢先重新加载被修改的文件
+    window.sync_timer.stop()
+    while window.pulling and time.perf_counter() < deadline:
+        app.processEvents()
+        time.sleep(0.001)
+    tables = [('literature', window.refresh_literature_table, 'literature.json'),
+              ('taxonomy', window.refresh_taxonomy_table, 'taxonomy.json'),
+              ('samples', window.refresh_sample_table, 'sample.json')]
+    for name, refresh, file_name in tables:
+        unchanged = timed(refresh, repeat)
+
+        # 修改文件时间使集合被视为已被其他进程修改，按后台线程同步的路径重新加载集合，再让表格换成新列表
+        def touch(file_name=file_name):
+            os.utime(file_name, ns=(time.time_ns(), time.time_ns()))
+
+        def reload(name=name):
+            window.store[name].refresh()
+            window.models[name].sync()
+
+        results['refresh'][name] = {'unchanged': unchanged, 'reloaded': timed(reload, max(1, repeat // 2), touch)}
+    window.close()
+    return results
+
+
+def prepare_dataset(size, seed):
+    """生成或复用缓存的数据集目录"""
+    directory = os.path.join(DATA_CACHE_DIR, f'{size}-{seed}')
+    if not all(os.path.exists(os.path.join(directory, name)) for name in DATA_FILES):
+        print(f'生成 {size} 条分类的数据集 -> {directory}', file=sys.stderr)
+        generate(size, seed, directory)
+    return directory
+
+
+def run_child(suite, workdir, storage, args):
+    """在数据副本目录中以子进程运行一个测量套件，返回其JSON结果"""
+    env = dict(os.environ, STORAGE_MODE=storage, PYTHONPATH=REPO_DIR)
+    command = [sys.executable, os.path.abspath(__file__), '--suite', suite, '--repeat', str(args.repeat),
+               '--writes', str(args.writes), '--batch', str(args.batch), '--timeout', str(args.timeout)]
+    completed = subprocess.run(command, cwd=workdir, env=env, capture_output=True, text=True, timeout=args.timeout)
+    if completed.returncode != 0:
+        return {'error': completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else '子进程失败'}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def run_benchmarks(args):
+    results = []
+    for size in args.sizes:
+        source = prepare_dataset(size, args.seed)
+        for storage in args.storage:
+            workdir = tempfile.mkdtemp(prefix=f'bench-{size}-{storage}-')
+            try:
+                for name in DATA_FILES:
+                    shutil.copy(os.path.join(source, name), workdir)
+                if storage == 'sqlite':
+                    subprocess.run([sys.executable, os.path.join(REPO_DIR, 'server.py'), 'migrate'], cwd=workdir,
+                                   env=dict(os.environ, STORAGE_MODE='sqlite'), check=True, capture_output=True)
+                result = {'size': size, 'storage': storage, 'server': run_child('server', workdir, storage, args)}
+                if not args.skip_gui and storage != 'sqlite':
+                    # 服务器套件写入了测试记录，界面在原始数据的新副本上测量
+                    for name in DATA_FILES:
+                        shutil.copy(os.path.join(source, name), workdir)
+                    for name in os.listdir(workdir):
+                        if name.endswith('.journal'):
+                            os.unlink(os.path.join(workdir, name))
+                    result['gui'] = run_child('gui', workdir, storage, args)
+            finally:
+                shutil.rmtree(workdir, ignore_errors=True)
+            print_result(result)
+            results.append(result)
+    return results
+
+
+def print_result(result):
+    print(f"\n== {result['size']} 条分类，存储方式 {result['storage']} ==")
+    server = result['server']
+    if 'error' in server:
+        print(f"服务器测量失败: {server['error']}")
+    else:
+        cold = server['cold_start']
+        print(f"冷启动 {cold['total_seconds']}s (导入 {cold['import_seconds']}s，首次加载 {cold['first_request_seconds']}s)")
+        print(f"{'路由':<26} {'中位数(ms)':>12} {'最小(ms)':>10} {'缓存命中(ms)':>14} {'字节':>12}")
+        for name, route in server['routes'].items():
+            print(f"{name:<26} {route['median_ms']:>12} {route['min_ms']:>10} {route.get('warm_median_ms', '-'):>14} "
+                  f"{route['bytes']:>12}")
+        writes = server['writes']
+        print(f"单条写入 {writes['single_writes_per_sec']} 次/秒，批量导入 {writes['bulk_records_per_sec']} 条/秒")
+    gui = result.get('gui')
+    if gui is None:
+        return
+    if 'error' in gui or 'skipped' in gui:
+        print(f"界面测量未完成: {gui.get('error') or gui.get('skipped')}")
+        return
+    print(f"界面: 窗口显示 {gui['window_seconds']}s，加载完成 {gui['load_seconds']}s")
+    for name, refresh in gui['refresh'].items():
+        print(f"refresh_{name}_table: 无变化 {refresh['unchanged']['median_ms']}ms，"
+              f"重新加载 {refresh['reloaded']['median_ms']}ms")
+
+
+def flatten(results):
+    """把结果展开为 {指标名: (数值, 是否越大越好, 噪声阈值)}，用于与之前的结果比较"""
+    metrics = {}
+    for result in results:
+        prefix = f"{result['size']}/{result['storage']}"
+        server = result.get('server', {})
+        for key, value in server.get('cold_start', {}).items():
+            metrics[f'{prefix}/cold_start/{key}'] = (value, False, NOISE_FLOOR_MS / 1000)
+        for name, route in server.get('routes', {}).items():
+            metrics[f'{prefix}/route/{name}'] = (route['median_ms'], False, NOISE_FLOOR_MS)
+            if 'warm_median_ms' in route:
+                metrics[f'{prefix}/route_cached/{name}'] = (route['warm_median_ms'], False, NOISE_FLOOR_MS)
+        for key, value in server.get('writes', {}).items():
+            if key.endswith('_per_sec'):
+                metrics[f'{prefix}/writes/{key}'] = (value, True, 0)
+        gui = result.get('gui') or {}
+        for key in ('window_seconds', 'load_seconds'):
+            if key in gui:
+                metrics[f'{prefix}/gui/{key}'] = (gui[key], False, NOISE_FLOOR_MS / 1000)
+        for name, refresh in gui.get('refresh', {}).items():
+            for kind, timing in refresh.items():
+                metrics[f'{prefix}/gui/refresh_{name}/{kind}'] = (timing['median_ms'], False, NOISE_FLOOR_MS)
+    return metrics
+
+
+def compare(results, baseline_path, threshold):
+    """与之前保存的结果比较，返回性能回退的指标数"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = flatten(json.load(f)['results'])
+    current = flatten(results)
+    regressions = 0
+    print(f'\n== 与 {baseline_path} 比较（阈值 {threshold:.0%}） ==')
+    for key, (value, higher_is_better, noise) in sorted(current.items()):
+        if key not in baseline or not baseline[key][0] or abs(value - baseline[key][0]) < noise:
+            continue
+        change = value / baseline[key][0] - 1
+        worse = -change if higher_is_better else change
+        if worse > threshold:
+            regressions += 1
+            print(f'回退 {key}: {baseline[key][0]} -> {value} ({change:+.0%})')
+        elif -worse > threshold:
+            print(f'改进 {key}: {baseline[key][0]} -> {value} ({change:+.0%})')
+    print(f'共 {regressions} 项性能回退')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='10k', help='逗号分隔的分类记录数，例如 10k,100k,1m (默认 %(default)s)')
+    parser.add_argument('--seed', type=int, default=1, help='生成数据的随机种子 (默认 %(default)s)')
+    parser.add_argument('--storage', default='json', help='逗号分隔的存储方式: json,journal,sqlite (默认 %(default)s)')
+    parser.add_argument('--repeat', type=int, default=5, help='每个测量重复的次数 (默认 %(default)s)')
+    parser.add_argument('--writes', type=int, default=50, help='单条写入的次数 (默认 %(default)s)')
+    parser.add_argument('--batch', type=int, default=1000, help='批量导入的记录数 (默认 %(default)s)')
+    parser.add_argument('--timeout', type=float, default=1800, help='每个子进程的最长秒数 (默认 %(default)s)')
+    parser.add_argument('--skip-gui', action='store_true', help='不测量管理界面')
+    parser.add_argument('--json', help='把结果写入JSON文件')
+    parser.add_argument('--compare', help='与之前保存的JSON结果比较，有性能回退时以非零状态退出')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='判定为性能回退的变慢比例 (默认 %(default)s)')
+    parser.add_argument('--suite', choices=['server', 'gui'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.suite == 'server':
+        print(json.dumps(run_server_suite(args.repeat, args.writes, args.batch)))
+        return 0
+    if args.suite == 'gui':
+        print(json.dumps(run_gui_suite(args.repeat, args.timeout)))
+        return 0
+
+    args.sizes = [parse_size(size) for size in args.sizes.split(',')]
+    args.storage = [storage.strip() for storage in args.storage.split(',')]
+    results = run_benchmarks(args)
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR, capture_output=True,
+                                text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    report = {
+        'generated': int(time.time()),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cores': os.cpu_count(),
+        'seed': args.seed,
+        'repeat': args.repeat,
+        'results': results,
+    }
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.compare:
+        return 1 if compare(results, args.compare, args.threshold) else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+批量导入时的流式解析：逐条读取NDJSON或JSON数组请求体，不把整个请求体读入内存
+"""
+
+import codecs
+import json
+
+# 每次从请求流中读取的字节数
+READ_SIZE = 64 * 1024
+# JSON数组中单个元素最多缓冲的字符数，超过时不再等待更多数据
+MAX_ITEM_SIZE = 8 * 1024 * 1024
+# 截断的元素（例如 tru、\u12）只会在缓冲区末尾这么多个字符之内报错
+TRUNCATION_MARGIN = 16
+
+
+class RecordError(Exception):
+    """单条记录无法解析"""
+
+
+def iter_text(stream):
+    """把字节流按块解码为文本"""
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    while True:
+        data = stream.read(READ_SIZE)
+        if not data:
+            break
+        yield decoder.decode(data)
+    yield decoder.decode(b'', final=True)
+
+
+def iter_lines(chunks):
+    """把文本块重新切分为行"""
+    buffer = ''
+    for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split('\n')
+        yield from lines
+    if buffer:
+        yield buffer
+
+
+def iter_ndjson(chunks, head=''):
+    """逐行解析NDJSON，无法解析的行作为 RecordError 返回而不中断导入"""
+    buffer = head
+    for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split('\n')
+        for line in lines:
+            if line.strip():
+                yield _decode_line(line)
+    if buffer.strip():
+        yield _decode_line(buffer)
+
+
+def _decode_line(line):
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        return RecordError(f'JSON解析失败: {e}')
+
+
+def iter_json_array(chunks, head=''):
+    """增量解析JSON数组中的元素，数组本身格式错误时抛出 ValueError"""
+    decoder = json.JSONDecoder()
+    chunks = iter(chunks)
+    buffer = head.lstrip()
+    if not buffer.startswith('['):
+        raise ValueError('请求体必须是JSON数组')
+    position = 1
+    expect_item = True
+    empty = True
+
+    while True:
+        # 跳过空白和元素之间的逗号
+        while position < len(buffer) and buffer[position] in ' \t\r\n':
+            position += 1
+        if position < len(buffer):
+            char = buffer[position]
+            if char == ']' and (not expect_item or empty):
+                return
+            if char == ',' and not expect_item:
+                position += 1
+                expect_item = True
+                continue
+            if expect_item:
+                try:
+                    item, end = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError as e:
+                    # 错误离缓冲区末尾较远时不是截断造成的，继续读取只会把后面的请求体都拼进来反复解析
+                    if e.pos < len(buffer) - TRUNCATION_MARGIN and not e.msg.startswith('Unterminated string'):
+                        raise ValueError(f'JSON数组格式错误: {e}') from None
+                    end = None
+                # 元素恰好结束在缓冲区末尾时可能被截断（例如数字），等待更多数据再判断
+                if end is not None and end < len(buffer):
+                    yield item
+                    position = end
+                    expect_item = False
+                    empty = False
+                    continue
+            elif char != ']':
+                raise ValueError(f'JSON数组格式错误: 意外的字符 {char!r}')
+
+        # 当前缓冲区中没有完整的元素，丢弃已解析的部分后继续读取
+        chunk = next(chunks, None)
+        if chunk is None:
+            raise ValueError('JSON数组不完整或格式错误')
+        if len(buffer) - position > MAX_ITEM_SIZE:
+            raise ValueError(f'JSON数组中的单个元素超过 {MAX_ITEM_SIZE} 个字符')
+        buffer = buffer[position:] + chunk
+        position = 0
+
+
+def iter_request_records(stream):
+    """根据请求体的第一个非空白字符判断格式，逐条返回记录或 RecordError"""
+    chunks = iter_text(stream)
+    head = ''
+    for chunk in chunks:
+        head += chunk
+        if head.strip():
+            break
+    if head.lstrip().startswith('['):
+        return iter_json_array(chunks, head)
+    return iter_ndjson(chunks, head)
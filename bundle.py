@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+静态站点数据包：把各集合的记录、预先建好的全文索引倒排表以及ID和外键查找表写成紧凑的JSON，
+前端一次请求即可拿到可以直接查询的数据，可以按集合分片以便首屏只加载需要渲染的部分
+"""
+
+import gzip
+import hashlib
+import os
+import time
+
+from search_index import SearchIndex
+from storage import dumps_json
+
+BUNDLE_VERSION = 1
+# 不分片时所有集合写入同一个文件
+COMBINED_FILE = 'all.json'
+MANIFEST_FILE = 'manifest.json'
+
+
+def write_file(file_path, data):
+    """先写临时文件再替换，构建过程中前端不会读到一半的数据包"""
+    temp_path = f'{file_path}.{os.getpid()}.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, file_path)
+
+
+def build_shard(name, records, search_fields, key_fields):
+    """生成一个集合的数据：记录、ID表、倒排表和外键表，表中用记录在数组中的下标代替ID"""
+    ids = {}
+    for position, record in enumerate(records):
+        ids.setdefault(record.get('id'), position)
+
+    # 与服务器使用同一套分词和字段权重，倒排表按词项排序，前端可以二分查找做前缀匹配
+    index = SearchIndex(search_fields)
+    index.rebuild(records)
+    postings = []
+    for term in index.vocabulary:
+        # 每个词项的倒排表展开为 [下标, 权重, 下标, 权重, ...]
+        pairs = sorted((ids[doc_id], weight) for doc_id, weight in index.postings[term].items())
+        postings.append([value for pair in pairs for value in pair])
+
+    keys = {}
+    for field in key_fields:
+        groups = keys[field] = {}
+        for position, record in enumerate(records):
+            value = record.get(field)
+            if value:
+                groups.setdefault(value, []).append(position)
+
+    return {
+        'name': name,
+        'count': len(records),
+        'records': records,
+        'ids': ids,
+        'search': {'fields': search_fields, 'terms': index.vocabulary, 'postings': postings},
+        'keys': keys,
+    }
+
+
+def build_bundle(collections, output_dir, shard=True, compress=False):
+    """collections 为 {名称: (记录列表, 全文索引字段权重, 外键字段列表)}，返回写入的清单"""
+    os.makedirs(output_dir, exist_ok=True)
+    shards = {name: build_shard(name, *config) for name, config in collections.items()}
+
+    if shard:
+        files = {f'{name}.json': {'version': BUNDLE_VERSION, 'collections': {name: data}}
+                 for name, data in shards.items()}
+    else:
+        files = {COMBINED_FILE: {'version': BUNDLE_VERSION, 'collections': shards}}
+
+    manifest = {'version': BUNDLE_VERSION, 'generated': int(time.time()), 'sharded': shard, 'collections': {}}
+    for file_name, document in files.items():
+        data = dumps_json(document)
+        write_file(os.path.join(output_dir, file_name), data)
+        entry = {
+            'file': file_name,
+            # 与静态文件服务使用相同的内容版本号，带 ?v= 请求时可以被长期缓存
+            'hash': hashlib.sha256(data).hexdigest()[:16],
+            'bytes': len(data),
+        }
+        if compress:
+            compressed = gzip.compress(data, compresslevel=9, mtime=0)
+            write_file(os.path.join(output_dir, file_name + '.gz'), compressed)
+            entry['gzip'] = file_name + '.gz'
+            entry['gzip_bytes'] = len(compressed)
+        for name in document['collections']:
+            manifest['collections'][name] = dict(entry, count=shards[name]['count'])
+
+    write_file(os.path.join(output_dir, MANIFEST_FILE), dumps_json(manifest))
+    return manifest
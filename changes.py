@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+变更日志：每次写入都追加带全局序号的记录，镜像和客户端以序号为游标只拉取之后的增删改
+
+日志是所有进程共享的NDJSON文件，追加在进程间文件锁内完成，读取不加锁；
+只保留最近的若干条，游标早于保留范围时客户端需要重新下载全部数据
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from itertools import islice
+
+from storage import FileLock, dumps_json, file_signature, loads_json
+
+
+class ChangeLog:
+    """所有集合共用的变更日志，序号在所有进程中连续递增"""
+
+    def __init__(self, file_path, retain=10000):
+        self.file_path = file_path
+        self.retain = retain
+        self.entries = deque(maxlen=retain)
+        self.last_seq = 0
+        self._lock = threading.RLock()
+        self._write_lock = FileLock(file_path + '.lock')
+        self._offset = 0
+        self._inode = None
+        # 当前日志文件中的行数，超过保留条数的两倍时重写文件
+        self._lines = 0
+
+    def refresh(self):
+        """读取其他进程追加的变更，日志被重写后从头读取"""
+        signature = file_signature(self.file_path)
+        if signature is not None and signature[0] == self._inode and signature[2] == self._offset:
+            return
+        with self._lock:
+            try:
+                f = open(self.file_path, 'rb')
+            except FileNotFoundError:
+                return
+            with f:
+                stat = os.fstat(f.fileno())
+                if stat.st_ino != self._inode or stat.st_size < self._offset:
+                    self.entries.clear()
+                    self._offset = 0
+                    self._lines = 0
+                    self._inode = stat.st_ino
+                f.seek(self._offset)
+                data = f.read()
+
+            # 崩溃时写了一半的最后一行不完整，留到下次再读
+            end = data.rfind(b'\n') + 1
+            self._offset += end
+            for line in data[:end].splitlines():
+                if line.strip():
+                    entry = loads_json(line)
+                    self.entries.append(entry)
+                    self.last_seq = max(self.last_seq, entry['seq'])
+                    self._lines += 1
+
+    def append(self, collection, operations):
+        """为一次写入的 upsert/delete 操作分配序号并追加到日志，返回最后一个序号"""
+        with self._lock, self._write_lock:
+            self.refresh()
+            now = time.time()
+            entries = []
+            for op, payload in operations:
+                self.last_seq += 1
+                entry = {'seq': self.last_seq, 'time': now, 'collection': collection, 'op': op}
+                if op == 'upsert':
+                    entry['record'] = payload
+                else:
+                    entry['id'] = payload
+                entries.append(entry)
+            if not entries:
+                return self.last_seq
+
+            data = b''.join(dumps_json(entry) + b'\n' for entry in entries)
+            with open(self.file_path, 'ab') as f:
+                # 持有写入锁并已读到日志末尾，超出部分只可能是崩溃的写入者留下的半行
+                if f.tell() != self._offset:
+                    f.truncate(self._offset)
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+                self._inode = os.fstat(f.fileno()).st_ino
+            self._offset += len(data)
+            self._lines += len(entries)
+            self.entries.extend(entries)
+
+            if self._lines > 2 * self.retain:
+                self._rewrite()
+            return self.last_seq
+
+    def _rewrite(self):
+        """只保留内存中最近的变更，用新文件替换日志，其他进程发现inode变化后重新读取"""
+        data = b''.join(dumps_json(entry) + b'\n' for entry in self.entries)
+        temp_path = f'{self.file_path}.{os.getpid()}.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.file_path)
+        self._inode = file_signature(self.file_path)[0]
+        self._offset = len(data)
+        self._lines = len(self.entries)
+
+    def since(self, seq, limit, collection=None):
+        """返回 (序号大于 seq 的最多 limit 条变更, 下一次请求使用的游标, 是否需要重新下载全部数据)
+
+        seq 早于保留范围或大于当前序号（例如日志被删除后重新开始编号）时需要重新下载，
+        此时游标为当前序号，客户端应先记下游标再下载，之后重放的变更都是幂等的
+        """
+        with self._lock:
+            self.refresh()
+            oldest = self.entries[0]['seq'] if self.entries else self.last_seq + 1
+            if seq > self.last_seq or seq < oldest - 1:
+                return [], self.last_seq, True
+            entries = islice(self.entries, seq - oldest + 1, None)
+            if collection:
+                entries = (entry for entry in entries if entry['collection'] == collection)
+            entries = list(islice(entries, limit))
+            cursor = entries[-1]['seq'] if len(entries) == limit else self.last_seq
+            return entries, cursor, False
+
+    def wait(self, seq, timeout, interval=0.5):
+        """等待出现序号大于 seq 的变更，超时返回False；其他进程的写入通过轮询文件发现"""
+        deadline = time.monotonic() + timeout
+        while True:
+            self.refresh()
+            if self.last_seq != seq:
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(interval, remaining))
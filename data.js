@@ -1,105 +1,288 @@
-// 从JSON文件加载数据的函数
-async function loadData() {
-    try {
-        // 加载文献数据
-        const literatureResponse = await fetch('literature.json');
-        const literatureData = await literatureResponse.json();
-
-        // 加载分类数据
-        const taxonomyResponse = await fetch('taxonomy.json');
-        const taxonomyData = await taxonomyResponse.json();
-
-        // 加载样本数据
-        const sampleResponse = await fetch('sample.json');
-        const sampleData = await sampleResponse.json();
-
-        // 将数据存储在全局变量中
-        window.sampleData = {
-            literature: literatureData,
-            taxonomy: taxonomyData,
-            samples: sampleData
-        };
-
-        console.log('数据加载成功');
-        return window.sampleData;
-    } catch (error) {
-        console.error('加载数据时出错:', error);
-        // 如果无法加载真实数据，则使用示例数据
-        window.sampleData = {
-            literature: [
-                {
-                    "id": "LIT001",
-                    "title": "A new species of butterfly from Amazon rainforest",
-                    "authors": "Smith, J.; Johnson, A.",
-                    "journal": "Journal of Insect Taxonomy",
-                    "year": "2023",
-                    "doi": "10.1234/jit.2023.001",
-                    "url": "https://example.com/papers/LIT001",
-                    "abstract": "This paper describes a new species of butterfly discovered in the Amazon rainforest. The species belongs to the family Nymphalidae and is characterized by its distinctive wing coloration.",
-                    "is_oa": true
-                },
-                {
-                    "id": "LIT002",
-                    "title": "Revision of the genus Panthera in Asia",
-                    "authors": "Brown, T.; Davis, M.",
-                    "journal": "Mammalian Biology",
-                    "year": "2022",
-                    "doi": "10.5678/mb.2022.002",
-                    "url": "https://example.com/papers/LIT002",
-                    "abstract": "A comprehensive revision of the genus Panthera in Asia, including morphological analysis and phylogenetic relationships of various subspecies."
-                }
-            ],
-            taxonomy: [
-                {
-                    "id": "TAX001",
-                    "name": "Amazonia papilionis",
-                    "level": "Species",
-                    "type": "new taxon",
-                    "lit_id": "LIT001",
-                    "parent_tax_id": "",
-                    "description": "A newly discovered butterfly species from the Amazon basin. Distinguished by iridescent blue wings with orange borders."
-                },
-                {
-                    "id": "TAX002",
-                    "name": "Panthera tigris altaica",
-                    "level": "Species",
-                    "type": "new combination",
-                    "lit_id": "LIT002",
-                    "parent_tax_id": "TAX003",
-                    "description": "The Siberian tiger, also known as the Amur tiger, is a tiger population in the Russian Far East and Northeast China."
-                },
-                {
-                    "id": "TAX003",
-                    "name": "Panthera tigris",
-                    "level": "Species",
-                    "type": "new taxon",
-                    "lit_id": "LIT002",
-                    "parent_tax_id": "",
-                    "description": "The tiger is the largest extant cat species and a member of the genus Panthera."
+// 静态站点数据包的目录，由 python server.py bundle 生成
+const BUNDLE_DIR = 'bundle';
+
+// 没有数据包时直接读取的原始数据文件
+const RAW_FILES = {
+    literature: 'literature.json',
+    taxonomy: 'taxonomy.json',
+    samples: 'sample.json'
+};
+
+// 与服务器 search_index.py 相同的分词规则：拉丁单词整体保留，中日韩文本按单字和双字切分
+const CJK_RANGES = '\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af';
+const TOKEN_PATTERN = new RegExp(`([${CJK_RANGES}]+)|((?:(?![${CJK_RANGES}])[\\p{L}\\p{N}])+)`, 'gu');
+// 前缀扩展时最多展开的词项数量
+const MAX_PREFIX_EXPANSION = 64;
+
+// 无法加载任何数据时使用的示例数据
+const FALLBACK_DATA = {
+    literature: [
+        {
+            "id": "LIT001",
+            "title": "A new species of butterfly from Amazon rainforest",
+            "authors": "Smith, J.; Johnson, A.",
+            "journal": "Journal of Insect Taxonomy",
+            "year": "2023",
+            "doi": "10.1234/jit.2023.001",
+            "url": "https://example.com/papers/LIT001",
+            "abstract": "This paper describes a new species of butterfly discovered in the Amazon rainforest. The species belongs to the family Nymphalidae and is characterized by its distinctive wing coloration.",
+            "is_oa": true
+        },
+        {
+            "id": "LIT002",
+            "title": "Revision of the genus Panthera in Asia",
+            "authors": "Brown, T.; Davis, M.",
+            "journal": "Mammalian Biology",
+            "year": "2022",
+            "doi": "10.5678/mb.2022.002",
+            "url": "https://example.com/papers/LIT002",
+            "abstract": "A comprehensive revision of the genus Panthera in Asia, including morphological analysis and phylogenetic relationships of various subspecies."
+        }
+    ],
+    taxonomy: [
+        {
+            "id": "TAX001",
+            "name": "Amazonia papilionis",
+            "level": "Species",
+            "type": "new taxon",
+            "lit_id": "LIT001",
+            "parent_tax_id": "",
+            "description": "A newly discovered butterfly species from the Amazon basin. Distinguished by iridescent blue wings with orange borders."
+        },
+        {
+            "id": "TAX002",
+            "name": "Panthera tigris altaica",
+            "level": "Species",
+            "type": "new combination",
+            "lit_id": "LIT002",
+            "parent_tax_id": "TAX003",
+            "description": "The Siberian tiger, also known as the Amur tiger, is a tiger population in the Russian Far East and Northeast China."
+        },
+        {
+            "id": "TAX003",
+            "name": "Panthera tigris",
+            "level": "Species",
+            "type": "new taxon",
+            "lit_id": "LIT002",
+            "parent_tax_id": "",
+            "description": "The tiger is the largest extant cat species and a member of the genus Panthera."
+        }
+    ],
+    samples: [
+        {
+            "id": "SMP001",
+            "tax_id": "TAX001",
+            "collector": "Dr. Smith",
+            "latitude": 3.456789,
+            "longitude": -60.123456,
+            "description": "Collected from the canopy of primary rainforest at the type locality."
+        },
+        {
+            "id": "SMP002",
+            "tax_id": "TAX002",
+            "collector": "Dr. Brown",
+            "latitude": 45.678912,
+            "longitude": 120.345678,
+            "description": "Specimen collected during winter tracking expedition in the Sikhote-Alin mountain range."
+        }
+    ]
+};
+
+let manifestPromise = null;
+const filePromises = {};
+const collectionPromises = {};
+
+// 读取数据包清单，没有数据包时返回null
+function loadManifest() {
+    if (!manifestPromise) {
+        manifestPromise = fetch(`${BUNDLE_DIR}/manifest.json`, { cache: 'no-cache' })
+            .then(response => response.ok ? response.json() : null)
+            .catch(() => null);
+    }
+    return manifestPromise;
+}
+
+// 读取一个数据包文件，浏览器支持时优先下载gzip版本，同一文件只请求一次
+function loadBundleFile(entry) {
+    if (!filePromises[entry.file]) {
+        filePromises[entry.file] = (async () => {
+            if (entry.gzip && 'DecompressionStream' in window) {
+                try {
+                    const response = await fetch(`${BUNDLE_DIR}/${entry.gzip}?v=${entry.hash}`);
+                    if (response.ok) {
+                        const stream = response.body.pipeThrough(new DecompressionStream('gzip'));
+                        return await new Response(stream).json();
+                    }
+                } catch (error) {
+                    console.warn('读取压缩数据包失败，改为读取未压缩版本:', error);
                 }
-            ],
-            samples: [
-                {
-                    "id": "SMP001",
-                    "tax_id": "TAX001",
-                    "collector": "Dr. Smith",
-                    "latitude": 3.456789,
-                    "longitude": -60.123456,
-                    "description": "Collected from the canopy of primary rainforest at the type locality."
-                },
-                {
-                    "id": "SMP002",
-                    "tax_id": "TAX002",
-                    "collector": "Dr. Brown",
-                    "latitude": 45.678912,
-                    "longitude": 120.345678,
-                    "description": "Specimen collected during winter tracking expedition in the Sikhote-Alin mountain range."
+            }
+            const response = await fetch(`${BUNDLE_DIR}/${entry.file}?v=${entry.hash}`);
+            if (!response.ok) {
+                throw new Error(`无法读取数据包 ${entry.file}`);
+            }
+            return response.json();
+        })();
+    }
+    return filePromises[entry.file];
+}
+
+// 用原始记录生成与数据包相同结构的集合数据，没有倒排表时搜索退回逐条扫描
+function makeCollection(name, records) {
+    const ids = {};
+    records.forEach((record, position) => {
+        if (!(record.id in ids)) ids[record.id] = position;
+    });
+    return { name, count: records.length, records, ids, search: null, keys: {} };
+}
+
+// 按需加载一个集合：优先使用数据包，其次是原始JSON文件，最后是示例数据
+function loadCollection(name) {
+    if (!collectionPromises[name]) {
+        collectionPromises[name] = (async () => {
+            const manifest = await loadManifest();
+            const entry = manifest && manifest.collections[name];
+            if (entry) {
+                try {
+                    const bundle = await loadBundleFile(entry);
+                    return bundle.collections[name];
+                } catch (error) {
+                    console.error('加载数据包时出错:', error);
                 }
-            ]
-        };
-        return window.sampleData;
+            }
+            try {
+                const response = await fetch(RAW_FILES[name]);
+                return makeCollection(name, await response.json());
+            } catch (error) {
+                console.error('加载数据时出错:', error);
+                return makeCollection(name, FALLBACK_DATA[name] || []);
+            }
+        })();
+    }
+    return collectionPromises[name];
+}
+
+// 通过ID查找表获取记录
+function findById(collection, id) {
+    const position = collection.ids[id];
+    return position === undefined ? null : collection.records[position];
+}
+
+// 通过外键查找表获取引用了某个值的全部记录，例如某个分类的全部样本
+function findByKey(collection, field, value) {
+    const groups = collection.keys[field];
+    if (groups) {
+        return (groups[value] || []).map(position => collection.records[position]);
     }
+    return collection.records.filter(record => record[field] === value);
 }
 
-// 初始化数据加载
-loadData();
\ No newline at end of file
+// 把查询切分为词项，返回 [词项列表, 最后一个词项是否按前缀匹配]
+function queryTerms(text) {
+    const terms = [];
+    let lastIsWord = false;
+    for (const match of text.toLowerCase().matchAll(TOKEN_PATTERN)) {
+        if (match[1] === undefined) {
+            terms.push(match[2]);
+            lastIsWord = true;
+            continue;
+        }
+        const run = Array.from(match[1]);
+        if (run.length === 1) {
+            terms.push(run[0]);
+        } else {
+            for (let i = 0; i < run.length - 1; i++) terms.push(run[i] + run[i + 1]);
+        }
+        lastIsWord = false;
+    }
+    // 只有在用户还在输入最后一个单词时才做前缀匹配
+    return [terms, lastIsWord && !/\s$/.test(text)];
+}
+
+// 在有序词表中二分查找第一个不小于 term 的位置
+function lowerBound(terms, term) {
+    let low = 0;
+    let high = terms.length;
+    while (low < high) {
+        const middle = (low + high) >> 1;
+        if (terms[middle] < term) low = middle + 1;
+        else high = middle;
+    }
+    return low;
+}
+
+// 把展开的倒排表 [下标, 权重, ...] 转换为 Map
+function postingAt(search, index) {
+    const posting = new Map();
+    const flat = search.postings[index];
+    for (let i = 0; i < flat.length; i += 2) posting.set(flat[i], flat[i + 1]);
+    return posting;
+}
+
+function lookupTerm(search, term) {
+    const index = lowerBound(search.terms, term);
+    return search.terms[index] === term ? postingAt(search, index) : new Map();
+}
+
+// 合并所有以指定前缀开头的词项的倒排表
+function expandPrefix(search, prefix) {
+    const merged = new Map();
+    const start = lowerBound(search.terms, prefix);
+    const end = Math.min(start + MAX_PREFIX_EXPANSION, search.terms.length);
+    for (let index = start; index < end && search.terms[index].startsWith(prefix); index++) {
+        for (const [position, weight] of postingAt(search, index)) {
+            if (weight > (merged.get(position) || 0)) merged.set(position, weight);
+        }
+    }
+    return merged;
+}
+
+// 逐条扫描所有字段的子串匹配，用于没有预建倒排表的数据
+function scanCollection(collection, text, fields) {
+    const term = text.toLowerCase();
+    return collection.records.filter(item => fields.some(field => {
+        const value = item[field];
+        if (value === undefined || value === null) return false;
+        return value.toString().toLowerCase().includes(term);
+    }));
+}
+
+// 用预建的倒排表搜索：所有词项取交集，按 TF-IDF 排序，与服务器的排序一致
+function searchCollection(collection, text, fields) {
+    if (!text.trim()) return collection.records;
+    // 查询恰好是某条记录的ID时直接返回该记录，与服务器一致
+    const exact = findById(collection, text.trim());
+    if (exact) return [exact];
+    const search = collection.search;
+    if (!search) return scanCollection(collection, text.trim(), fields);
+
+    const [terms, prefix] = queryTerms(text);
+    if (!terms.length) return [];
+    const last = terms[terms.length - 1];
+    const leading = [...new Set(terms.slice(0, -1))];
+    const postings = leading.map(term => lookupTerm(search, term));
+    if (prefix) {
+        postings.push(expandPrefix(search, last));
+    } else if (!leading.includes(last)) {
+        postings.push(lookupTerm(search, last));
+    }
+    postings.sort((a, b) => a.size - b.size);
+    if (!postings[0].size) return [];
+
+    // 从最短的倒排表开始求交集
+    let candidates = [...postings[0].keys()];
+    for (const posting of postings.slice(1)) {
+        candidates = candidates.filter(position => posting.has(position));
+        if (!candidates.length) return [];
+    }
+
+    const scores = new Map(candidates.map(position => [position, 0]));
+    for (const posting of postings) {
+        const idf = Math.log(1 + collection.count / posting.size);
+        for (const position of candidates) {
+            scores.set(position, scores.get(position) + (1 + Math.log(posting.get(position))) * idf);
+        }
+    }
+    candidates.sort((a, b) => (scores.get(b) - scores.get(a)) || (a - b));
+    return candidates.map(position => collection.records[position]);
+}
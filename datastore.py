@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""
+内存数据仓库，集合只在首次访问或磁盘文件发生变化时加载，所有请求直接从内存读取
+
+重新加载和写入磁盘由 _sync_lock 串行化，只在换入新数据或修改内存时短暂持有集合锁 _lock，
+因此只读取内存数据的线程（例如管理界面的界面线程）不会等待大文件的解析和写入
+"""
+
+import copy
+import inspect
+import os
+import threading
+from contextlib import contextmanager
+
+from storage import write_temp_json
+
+
+class OwnedLock:
+    """可重入锁，并能查询当前线程是否已经持有它"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._local = threading.local()
+
+    def __enter__(self):
+        self._lock.acquire()
+        self._local.depth = getattr(self._local, 'depth', 0) + 1
+        return self
+
+    def __exit__(self, *exc_info):
+        self._local.depth -= 1
+        self._lock.release()
+
+    def held(self):
+        return getattr(self._local, 'depth', 0) > 0
+
+
+class Collection:
+    """单个数据集合的内存副本，带单调递增的版本号"""
+
+    def __init__(self, name, storage, change_log=None):
+        self.name = name
+        self.storage = storage
+        # 每次持久化的修改同时追加到变更日志，供增量同步使用
+        self.change_log = change_log
+        self.records = []
+        self.positions = {}
+        self.version = 0
+        self._loaded = False
+        self._lock = OwnedLock()
+        # 串行化重新加载和写入，先于 _lock 获取
+        self._sync_lock = threading.RLock()
+        self.indexes = []
+        self.search_index = None
+        # 已在内存中生效、尚未持久化的修改，由 flush() 合并为一次写入
+        self.pending = []
+        # 已从 pending 取出、正在提交或写入的修改，重新加载时同样要覆盖在磁盘数据之上
+        self.flushing = []
+        # 只让多次 flush() 依次进行，不阻塞读取、暂存和其他写入
+        self._flush_lock = threading.Lock()
+
+    def add_index(self, index):
+        """注册一个随数据增量更新的索引
+
+        重新加载时索引在浅拷贝上重建后再换入，因此 rebuild 必须为内部容器创建新对象，而不是原地清空
+        """
+        with self._sync_lock, self._lock:
+            self.indexes.append(index)
+            if self._loaded:
+                index.rebuild(self.records)
+        return index
+
+    def set_search_index(self, index):
+        """设置用于全文搜索的索引"""
+        self.search_index = self.add_index(index)
+
+    def refresh(self, progress=None):
+        """磁盘数据发生变化时重新加载或应用增量，返回是否发生了变化
+
+        progress 在整体加载时传给存储层，用于报告大文件的加载进度
+        """
+        # 已持有集合锁时使用获取锁时的数据，在锁内等待 _sync_lock 会与正要换入数据的线程互相等待
+        if self._lock.held() or (self._loaded and not self.storage.changed()):
+            return False
+
+        with self._sync_lock:
+            if self._loaded and not self.storage.changed():
+                return False
+
+            operations = self.storage.read_changes() if self._loaded else None
+            if operations is None:
+                # 解析文件和重建索引都在新的列表和索引副本上进行，不持有集合锁
+                records = self.storage.load(progress)
+                positions = {record.get('id'): i for i, record in enumerate(records)}
+                indexes = list(self.indexes)
+                rebuilt = [copy.copy(index) for index in indexes]
+                for index in rebuilt:
+                    index.rebuild(records)
+                with self._lock:
+                    # 旧的数据留到释放锁之后再回收，释放大量对象同样需要时间
+                    replaced = [self.records, self.positions] + [vars(inspect.unwrap(index)).copy() for index in indexes]
+                    self.records = records
+                    self.positions = positions
+                    for index, new in zip(indexes, rebuilt):
+                        # 就地换入重建后的状态，其他模块持有的索引对象（或它的计时包装）保持有效
+                        vars(inspect.unwrap(index)).update(vars(inspect.unwrap(new)))
+                    self._loaded = True
+                    self._apply_pending()
+                del replaced
+            else:
+                with self._lock:
+                    # 换成新的列表后再应用增量，已经拿到旧列表的读者（例如界面的表格模型）不会看到它在背后变化
+                    self.records = list(self.records)
+                    self._apply_operations(operations)
+                    self._apply_pending()
+            return True
+
+    def _apply_pending(self):
+        """本进程暂存的修改覆盖在其他进程的修改之上，调用方持有集合锁"""
+        self._apply_operations(self.flushing)
+        self._apply_operations(self.pending)
+        self._bump()
+
+    def all(self):
+        """获取集合中的全部记录"""
+        self.refresh()
+        return self.records
+
+    def locked(self, refresh=True):
+        """刷新数据后返回集合锁，用于在一致的数据上查询索引
+
+        界面线程传入 refresh=False，只读取内存中已有的数据，重新加载由后台线程完成
+        """
+        if refresh:
+            self.refresh()
+        return self._lock
+
+    def get(self, record_id, refresh=True):
+        """通过ID索引在常数时间内获取一条记录，不存在时返回None"""
+        if refresh:
+            self.refresh()
+        with self._lock:
+            position = self.positions.get(record_id)
+            return None if position is None else self.records[position]
+
+    def search(self, text):
+        """通过全文索引搜索记录，按相关度排序；查询恰好是某条记录的ID时直接返回该记录"""
+        self.refresh()
+        with self._lock:
+            position = self.positions.get(text.strip())
+            if position is not None:
+                return [self.records[position]]
+            return self.search_index.search(text)
+
+    @contextmanager
+    def writing(self):
+        """持有进程内和进程间的写入锁并刷新到最新数据，锁内的校验和写入不会与其他写入者交错"""
+        with self._sync_lock, self.storage.lock():
+            self.refresh()
+            with self._lock:
+                yield self
+
+    def upsert(self, record):
+        """按ID插入或替换一条记录并持久化，返回记录是否为新增"""
+        with self.writing():
+            created = self._apply_upsert(record)
+            self._persist([('upsert', record)])
+            self._bump()
+            return created
+
+    def upsert_many(self, records):
+        """批量插入或替换记录，只持久化一次，返回 (新增数, 更新数)"""
+        with self.writing():
+            created = sum(self._apply_upsert(record) for record in records)
+            if records:
+                self._persist([('upsert', record) for record in records])
+                self._bump()
+            return created, len(records) - created
+
+    def delete(self, record_id):
+        """按ID删除一条记录并持久化，返回被删除的记录，不存在时返回None"""
+        with self.writing():
+            item = self._apply_delete(record_id)
+            if item is not None:
+                self._persist([('delete', record_id)])
+                self._bump()
+            return item
+
+    def apply_changes(self, operations):
+        """应用一批来自其他来源（例如服务器的变更流）的 upsert/delete 操作并持久化"""
+        with self.writing():
+            self._apply_operations(operations)
+            if operations:
+                self._persist(operations)
+                self._bump()
+
+    def stage_upsert(self, record):
+        """只在内存中插入或替换一条记录，持久化留给之后的 flush()，返回记录是否为新增
+
+        供界面线程调用，不刷新数据；其他进程的修改在 flush() 时合并
+        """
+        with self._lock:
+            created = self._apply_upsert(record)
+            self.pending.append(('upsert', record))
+            self._bump()
+            return created
+
+    def stage_delete(self, record_id):
+        """只在内存中删除一条记录，持久化留给之后的 flush()，返回被删除的记录"""
+        with self._lock:
+            item = self._apply_delete(record_id)
+            if item is not None:
+                self.pending.append(('delete', record_id))
+                self._bump()
+            return item
+
+    def flush(self, publish=None):
+        """把暂存的修改合并为一次写入，返回写入的操作数，写入失败时修改留待下次重试
+
+        publish(操作列表) 在写入本地存储之前调用，例如先提交到服务器，抛出异常时同样留待重试；
+        它可能要等待网络，调用时不持有集合锁和写入锁，界面线程和其他进程的写入都不受影响
+        """
+        with self._flush_lock:
+            return self._flush(publish)
+
+    def _flush(self, publish):
+        with self._lock:
+            operations, self.pending = self.pending, []
+            self.flushing = operations
+        if not operations:
+            return 0
+        try:
+            if publish is not None:
+                publish(operations)
+            with self._sync_lock, self.storage.lock():
+                self.refresh()
+                # 取出要写入的记录快照后即释放集合锁，写入期间界面线程可以继续修改
+                with self._lock:
+                    records = list(self.records)
+                self._persist(operations, records)
+        except BaseException:
+            with self._lock:
+                self.pending[:0] = operations
+                self.flushing = []
+            raise
+        with self._lock:
+            self.flushing = []
+        return len(operations)
+
+    def _persist(self, operations, records=None):
+        """写入存储后追加到变更日志，调用方持有写入锁，因此日志中的顺序与写入顺序一致
+
+        records 为整体写入时使用的记录快照，默认为当前的内存列表
+        """
+        self.storage.write(self.records if records is None else records, operations)
+        if self.change_log is not None:
+            self.change_log.append(self.name, operations)
+
+    def _bump(self):
+        """数据发生变化后递增版本号"""
+        self.version += 1
+
+    def state(self):
+        """磁盘数据的标识，与进程内的版本号不同，它在多个工作进程之间一致"""
+        self.refresh()
+        return self.storage.state()
+
+    def _apply_upsert(self, record):
+        """在内存中插入或替换一条记录，并同步更新索引"""
+        # 通过ID索引检查是否已存在相同ID的记录
+        position = self.positions.get(record.get('id'))
+        if position is None:
+            item = None
+            self.records.append(record)
+            self.positions[record.get('id')] = len(self.records) - 1
+        else:
+            item = self.records[position]
+            self.records[position] = record
+
+        for index in self.indexes:
+            if item is not None:
+                index.remove(item)
+            index.add(record)
+        return item is None
+
+    def _apply_operations(self, operations):
+        """在内存中依次应用 upsert/delete 操作"""
+        for op, payload in operations:
+            if op == 'upsert':
+                self._apply_upsert(payload)
+            else:
+                self._apply_delete(payload)
+
+    def _apply_delete(self, record_id):
+        """在内存中删除一条记录，并同步更新索引"""
+        position = self.positions.pop(record_id, None)
+        if position is None:
+            return None
+        item = self.records.pop(position)
+        for i in range(position, len(self.records)):
+            self.positions[self.records[i].get('id')] = i
+        for index in self.indexes:
+            index.remove(item)
+        return item
+
+    def compact(self):
+        """把日志折叠回JSON文件，序列化过程不阻塞写入"""
+        with self._sync_lock:
+            self.refresh()
+            with self._lock:
+                offset = self.storage.pending()
+                if not offset:
+                    return False
+                state = self.storage.state()
+                snapshot = list(self.records)
+
+        temp_path = write_temp_json(self.storage.file_path, snapshot)
+        with self._sync_lock, self.storage.lock():
+            return self.storage.compact(temp_path, offset, state)
+
+
+class DataStore:
+    """进程内共享的数据仓库，按名称管理各个集合"""
+
+    def __init__(self, storages, change_log=None):
+        self.collections = {name: Collection(name, storage, change_log) for name, storage in storages.items()}
+        self.change_log = change_log
+        self._compactor = None
+
+    def __getitem__(self, name):
+        return self.collections[name]
+
+    def versions(self):
+        """获取各集合当前的版本号"""
+        for collection in self.collections.values():
+            collection.refresh()
+        return {name: collection.version for name, collection in self.collections.items()}
+
+    def flush(self):
+        """持久化所有集合中暂存的修改"""
+        for collection in self.collections.values():
+            collection.flush()
+
+    def compact(self):
+        """压缩所有集合的日志"""
+        for collection in self.collections.values():
+            collection.compact()
+
+    def start_compaction(self, interval):
+        """启动后台线程，定期把日志折叠回JSON文件"""
+        # fork出的工作进程继承了父进程的状态，但不会继承线程
+        if self._compactor is not None and self._compactor[2] == os.getpid():
+            return
+        stop = threading.Event()
+
+        def run():
+            while not stop.wait(interval):
+                self.compact()
+
+        self._compactor = (threading.Thread(target=run, name='compactor', daemon=True), stop, os.getpid())
+        self._compactor[0].start()
+
+    def stop_compaction(self):
+        """停止后台压缩线程并做最后一次压缩"""
+        if self._compactor is not None and self._compactor[2] == os.getpid():
+            thread, stop, _ = self._compactor
+            stop.set()
+            thread.join()
+            self._compactor = None
+        self.compact()
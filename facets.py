@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+统计索引：随每次写入增量维护记录总数和各字段取值的分布（facet直方图）
+"""
+
+import bisect
+from collections import Counter
+
+
+def facet_value(value):
+    """把字段值转换为直方图的键，空值返回None"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return str(value).strip() or None
+
+
+class FacetIndex:
+    """各字段取值的计数器，并按数量把取值分桶，读取前 limit 个取值的代价与记录总数和不同取值的数量无关"""
+
+    def __init__(self, fields):
+        self.fields = list(fields)
+        self.counts = {field: Counter() for field in self.fields}
+        # 字段 -> {数量: 排好序的取值}
+        self.buckets = {field: {} for field in self.fields}
+        # 字段 -> 排好序的不同数量，从后往前依次是取值最多的桶
+        self.levels = {field: [] for field in self.fields}
+        self.missing = Counter()
+        self.records = {}
+
+    def rebuild(self, records):
+        self.counts = {field: Counter() for field in self.fields}
+        self.missing = Counter()
+        self.records = {}
+        for record in records:
+            record_id = record.get('id')
+            if record_id in self.records:
+                self._count(self.records[record_id], -1)
+            self.records[record_id] = record
+            self._count(record, 1)
+        # 计数完成后统一分桶，避免逐个插入有序列表的平方代价
+        self.buckets = {field: {} for field in self.fields}
+        for field, counts in self.counts.items():
+            buckets = self.buckets[field]
+            for value, count in counts.items():
+                buckets.setdefault(count, []).append(value)
+            for values in buckets.values():
+                values.sort()
+            self.levels[field] = sorted(buckets)
+
+    def _count(self, record, delta):
+        """只更新计数，用于重建"""
+        for field in self.fields:
+            value = facet_value(record.get(field))
+            counts = self.missing if value is None else self.counts[field]
+            key = field if value is None else value
+            counts[key] += delta
+            if not counts[key]:
+                del counts[key]
+
+    def _move(self, field, value, old, new):
+        """把取值从数量为 old 的桶移到数量为 new 的桶，数量为0表示不在任何桶中"""
+        buckets = self.buckets[field]
+        levels = self.levels[field]
+        if old:
+            values = buckets[old]
+            del values[bisect.bisect_left(values, value)]
+            if not values:
+                del buckets[old]
+                del levels[bisect.bisect_left(levels, old)]
+        if new:
+            values = buckets.get(new)
+            if values is None:
+                buckets[new] = [value]
+                bisect.insort(levels, new)
+            else:
+                bisect.insort(values, value)
+
+    def add(self, record):
+        record_id = record.get('id')
+        if record_id in self.records:
+            self.remove(self.records[record_id])
+        self.records[record_id] = record
+        for field in self.fields:
+            value = facet_value(record.get(field))
+            if value is None:
+                self.missing[field] += 1
+            else:
+                counts = self.counts[field]
+                counts[value] += 1
+                self._move(field, value, counts[value] - 1, counts[value])
+
+    def remove(self, record):
+        record_id = record.get('id')
+        if self.records.get(record_id) is not record:
+            return
+        del self.records[record_id]
+        for field in self.fields:
+            value = facet_value(record.get(field))
+            counts = self.missing if value is None else self.counts[field]
+            key = field if value is None else value
+            counts[key] -= 1
+            if value is not None:
+                self._move(field, value, counts[key] + 1, counts[key])
+            if not counts[key]:
+                del counts[key]
+
+    @property
+    def total(self):
+        return len(self.records)
+
+    def facet(self, field, limit=None):
+        """字段的取值分布，按数量从多到少排列（数量相同时按取值排列），limit 限制返回的取值数"""
+        counts = self.counts[field]
+        buckets = self.buckets[field]
+        values = []
+        for count in reversed(self.levels[field]):
+            if limit is not None and len(values) >= limit:
+                break
+            bucket = buckets[count]
+            take = bucket if limit is None else bucket[:limit - len(values)]
+            values.extend({'value': value, 'count': count} for value in take)
+        return {
+            'distinct': len(counts),
+            'missing': self.missing[field],
+            'values': values,
+        }
+
+    def summary(self, limit=None):
+        """所有字段的取值分布"""
+        return {field: self.facet(field, limit) for field in self.fields}
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+合成测试数据：按给定规模和随机种子生成文献、分类和样本数据文件，用于测量系统在大数据量下的表现
+
+分类按 门→纲→目→科→属→种 逐级生成 parent_tax_id 链，描述混合中文、日文和英文，
+样本坐标围绕若干采集地点聚集；相同的规模和种子总是生成相同的数据
+
+    python generate_data.py --size 100k --seed 1 --output data-100k
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+import uuid
+from itertools import accumulate
+
+from storage import save_json_data
+
+# 文献和样本数量相对于分类数量的比例
+LITERATURE_RATIO = 0.2
+SAMPLE_RATIO = 1.0
+# 各级分类占分类总数的比例，剩余的都是种
+LEVEL_RATIOS = [('Phylum', 0.00002), ('Class', 0.0001), ('Order', 0.001), ('Family', 0.01), ('Genus', 0.1)]
+TAXON_TYPES = ['new taxon'] * 87 + ['new combination'] * 10 + ['taxon swap [new synonym]'] * 3
+# 没有坐标的样本比例（与现有数据一样记为 0.0, 0.0）
+MISSING_COORDINATE_RATIO = 0.03
+
+SYLLABLES = ['ar', 'ba', 'cla', 'den', 'el', 'fi', 'gra', 'hel', 'in', 'lo', 'ma', 'ne', 'nia', 'or', 'pla',
+             'qua', 'ri', 'sta', 'te', 'tor', 'u', 'vi', 'xe', 'zo']
+EPITHETS = ['mirifica', 'sinensis', 'yunnanensis', 'guangxiensis', 'minor', 'major', 'elegans', 'gracilis',
+            'robusta', 'obesa', 'tortuosa', 'alba', 'fusca', 'nitida', 'striata', 'costata', 'montana', 'sylvatica']
+SURNAMES = ['陈', '高', '王', '李', '张', '刘', '杨', '黄', '赵', '周', '吴', '徐', '孙', '朱', '胡', '郭']
+GIVEN_NAMES = ['德牛', '家祥', '卫东', '晓明', '建国', '丽华', '志强', '海燕', '文彬', '雪梅', '国庆', '敏']
+LATIN_AUTHORS = ['Smith, J.', 'Johnson, A.', 'Brown, T.', 'Davis, M.', 'Minato, H.', 'Nordsieck, H.',
+                 'Páll-Gergely, B.', 'Hunyadi, A.', 'Grego, J.', 'Szekeres, M.']
+JOURNALS = ['动物分类学报', '四川动物', '动物学研究', 'Venus', 'Zootaxa', 'ZooKeys', 'Journal of Molluscan Studies',
+            'Molluscan Research', 'The Nautilus', 'Archiv für Molluskenkunde']
+PLACES = [('广西', 'Guangxi'), ('云南', 'Yunnan'), ('四川', 'Sichuan'), ('贵州', 'Guizhou'), ('湖南', 'Hunan'),
+          ('海南', 'Hainan'), ('台湾', 'Taiwan'), ('西藏', 'Tibet'), ('越南北部', 'northern Vietnam'),
+          ('老挝', 'Laos')]
+CJK_PHRASES = ['贝壳中等大小', '壳质厚、坚实', '呈肥胖的纺锤形', '壳高约为壳宽的2倍', '有7个螺层', '前几个螺层增长缓慢',
+               '倒数第二个螺层非常膨大', '体螺层急骤收缩、扭斜', '形成一个狭长的管状颈部', '壳面呈黄褐色或栗褐色',
+               '无光泽', '其上有无数斜行排列的生长线', '壳顶为乳白色', '缝合线深', '壳口呈椭圆形', '口缘外折',
+               '翻卷而增厚', '可见较大的上板', '螺旋板隐约可见', '颚片为新月形', '齿舌为角质', '生殖系统未知']
+EN_PHRASES = ['Shell thick, obesely fusiform', 'with about 8 whorls', 'penultimate whorl widest',
+              'body whorl abruptly constricted', 'forming a narrow neck with coarse wrinkles',
+              'principal plica and lunella well developed', 'clausilium narrow, tapering toward an acute end',
+              'aperture nearly circular in outline', 'peristome continuous, well expanded',
+              'surface with faint traces of fine striation', 'genitalia are unknown']
+INSTITUTIONS = ['IZ CAS', 'NHMUK', 'SMF', 'HNHM', 'KIZ CAS', 'GXNU']
+TYPE_STATUSES = ['正模标本', '副模标本', 'holotype', 'paratype', '一般标本']
+
+
+class Generator:
+    """带固定随机种子的数据生成器"""
+
+    def __init__(self, seed):
+        self.rng = random.Random(seed)
+
+    def make_id(self, prefix):
+        return f'{prefix}-{uuid.UUID(int=self.rng.getrandbits(128), version=4)}'
+
+    def latin_word(self, parts):
+        return ''.join(self.rng.choice(SYLLABLES) for _ in range(parts))
+
+    def chinese_name(self):
+        return self.rng.choice(SURNAMES) + self.rng.choice(GIVEN_NAMES)
+
+    def authors(self, chinese):
+        count = self.rng.randint(1, 3)
+        if chinese:
+            return '; '.join(self.chinese_name() for _ in range(count))
+        return '; '.join(self.rng.sample(LATIN_AUTHORS, count))
+
+    def cjk_text(self, sentences):
+        return '。'.join('，'.join(self.rng.sample(CJK_PHRASES, 3)) for _ in range(sentences)) + '。'
+
+    def en_text(self, sentences):
+        return ' '.join(', '.join(self.rng.sample(EN_PHRASES, 3)).capitalize() + '.' for _ in range(sentences))
+
+    def literature(self, count):
+        records = []
+        for _ in range(count):
+            place_cn, place_en = self.rng.choice(PLACES)
+            genus = self.latin_word(3).capitalize()
+            style = self.rng.random()
+            if style < 0.45:
+                title = self.rng.choice([f'{place_cn}陆生贝类一新种——{genus} {self.rng.choice(EPITHETS)}',
+                                         f'{place_cn}{genus}属的分类研究', f'中国{genus}属新记录'])
+                abstract = self.cjk_text(self.rng.randint(1, 3))
+            elif style < 0.55:
+                title = f'{place_cn}産{genus}属の1新種'
+                abstract = self.en_text(self.rng.randint(1, 3))
+            else:
+                title = self.rng.choice([f'A new species of {genus} from {place_en}',
+                                         f'Revision of the genus {genus} in {place_en}',
+                                         f'Taxonomic notes on {genus} ({self.latin_word(3).capitalize()}idae)'])
+                abstract = self.en_text(self.rng.randint(2, 5))
+            year = self.rng.randint(1950, 2024)
+            record = {
+                'id': self.make_id('LIT'),
+                'title': title,
+                'authors': self.authors(style < 0.55),
+                'journal': self.rng.choice(JOURNALS),
+                'year': str(year) if self.rng.random() < 0.9 else f'{year} ({self.rng.randint(1, 4)})',
+                'doi': f'https://doi.org/10.{self.rng.randint(1000, 99999)}/{self.latin_word(2)}.{year}.{self.rng.randint(1, 999)}'
+                if self.rng.random() < 0.6 else '',
+                'url': '',
+                'abstract': abstract,
+            }
+            if self.rng.random() < 0.8:
+                record['is_oa'] = self.rng.random() < 0.4
+            records.append(record)
+        return records
+
+    def taxonomy(self, count, literature_ids):
+        """逐级生成分类，每一级的父分类从上一级中随机选择，因此父分类总是排在子分类之前"""
+        # 少数文献描述了大量分类
+        weights = list(accumulate(1 / (rank + 1) for rank in range(len(literature_ids))))
+        lit_ids = self.rng.choices(literature_ids, cum_weights=weights, k=count) if literature_ids else [''] * count
+
+        records = []
+        parents = []
+        remaining = count
+        for level, ratio in LEVEL_RATIOS + [('Species', None)]:
+            level_count = remaining if ratio is None else min(max(1, round(count * ratio)), remaining)
+            remaining -= level_count
+            current = []
+            for _ in range(level_count):
+                parent = self.rng.choice(parents) if parents else None
+                if level == 'Species':
+                    name = f"{parent['name'].split()[0]} {self.rng.choice(EPITHETS)}{self.latin_word(1)}"
+                else:
+                    suffix = {'Family': 'idae', 'Order': 'ida', 'Class': 'opoda', 'Phylum': 'ca'}.get(level, '')
+                    name = self.latin_word(3).capitalize() + suffix
+                cjk = self.rng.random() < 0.5
+                record = {
+                    'id': self.make_id('TAX'),
+                    'name': name,
+                    'level': level,
+                    'type': self.rng.choice(TAXON_TYPES),
+                    'lit_id': lit_ids[len(records)],
+                    'parent_tax_id': parent['id'] if parent else None,
+                    'description': self.cjk_text(self.rng.randint(1, 4)) if cjk else self.en_text(self.rng.randint(1, 4)),
+                }
+                records.append(record)
+                current.append(record)
+            if current:
+                parents = current
+        return records
+
+    def samples(self, count, taxa):
+        """样本只属于种和属，坐标围绕若干采集地点正态分布"""
+        candidates = [taxon['id'] for taxon in taxa if taxon['level'] in ('Species', 'Genus')] or \
+            [taxon['id'] for taxon in taxa]
+        if not candidates:
+            return []
+        sites = [(self.rng.uniform(18, 32), self.rng.uniform(97, 122), self.rng.uniform(0.05, 0.5))
+                 for _ in range(max(20, count // 1000))]
+        records = []
+        for _ in range(count):
+            if self.rng.random() < MISSING_COORDINATE_RATIO:
+                latitude = longitude = 0.0
+            else:
+                lat, lon, spread = self.rng.choice(sites)
+                latitude = round(min(max(self.rng.gauss(lat, spread), -90), 90), 6)
+                longitude = round(min(max(self.rng.gauss(lon, spread), -180), 180), 6)
+            records.append({
+                'id': self.make_id('SMP'),
+                'tax_id': self.rng.choice(candidates),
+                'collector': self.authors(self.rng.random() < 0.7),
+                'latitude': latitude,
+                'longitude': longitude,
+                'description': f'{self.rng.choice(INSTITUTIONS)} / {self.rng.choice(TYPE_STATUSES)}',
+            })
+        return records
+
+
+def parse_size(value):
+    """解析 10k、100k、1m 这样的规模"""
+    value = value.strip().lower()
+    multiplier = {'k': 1000, 'm': 1000000}.get(value[-1:], 1)
+    number = value[:-1] if multiplier > 1 else value
+    try:
+        return int(float(number) * multiplier)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'无法识别的规模: {value}') from None
+
+
+def generate(size, seed, output_dir):
+    """生成 size 条分类及按比例的文献和样本，写入 output_dir，返回各文件的记录数"""
+    os.makedirs(output_dir, exist_ok=True)
+    generator = Generator(seed)
+    literature = generator.literature(max(1, round(size * LITERATURE_RATIO)))
+    taxonomy = generator.taxonomy(size, [record['id'] for record in literature])
+    samples = generator.samples(round(size * SAMPLE_RATIO), taxonomy)
+
+    counts = {}
+    for file_name, records in [('literature.json', literature), ('taxonomy.json', taxonomy), ('sample.json', samples)]:
+        save_json_data(os.path.join(output_dir, file_name), records)
+        counts[file_name] = len(records)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', type=parse_size, default='10k', help='分类记录数，例如 10k、100k、1m (默认 %(default)s)')
+    parser.add_argument('--seed', type=int, default=1, help='随机种子 (默认 %(default)s)')
+    parser.add_argument('--output', default='.', help='输出目录 (默认当前目录，会覆盖现有数据文件)')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    counts = generate(args.size, args.seed, args.output)
+    for file_name, count in counts.items():
+        path = os.path.join(args.output, file_name)
+        print(f'{path}: {count} 条记录，{os.path.getsize(path)} 字节')
+    print(f'用时 {time.perf_counter() - started:.1f} 秒')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+分类关系索引：根据 parent_tax_id 维护父子关系，支持祖先、后代和同义名查询
+"""
+
+from collections import deque
+
+# 与父分类是同一分类单元的不同名称（组合或同义词）的类型
+SYNONYM_TYPES = ('new combination', 'synonym')
+
+
+def is_synonym_type(tax_type):
+    """是否为新组合或同义词类型"""
+    tax_type = (tax_type or '').lower()
+    return any(name in tax_type for name in SYNONYM_TYPES)
+
+
+class HierarchyIndex:
+    """父子关系的邻接表，查询代价只与链长或结果数量相关"""
+
+    def __init__(self, parent_field='parent_tax_id'):
+        self.parent_field = parent_field
+        self.parents = {}
+        self.children = {}
+        self.records = {}
+
+    def rebuild(self, records):
+        self.parents = {}
+        self.children = {}
+        self.records = {}
+        for record in records:
+            self.add(record)
+
+    def add(self, record):
+        record_id = record.get('id')
+        if record_id is None:
+            return
+        if record_id in self.records:
+            self.remove(self.records[record_id])
+        self.records[record_id] = record
+        parent_id = record.get(self.parent_field)
+        if parent_id:
+            self.parents[record_id] = parent_id
+            self.children.setdefault(parent_id, {})[record_id] = None
+
+    def remove(self, record):
+        record_id = record.get('id')
+        if self.records.get(record_id) is not record:
+            return
+        del self.records[record_id]
+        parent_id = self.parents.pop(record_id, None)
+        if parent_id is not None:
+            siblings = self.children[parent_id]
+            del siblings[record_id]
+            if not siblings:
+                del self.children[parent_id]
+
+    def ancestor_ids(self, record_id, pending=None):
+        """从直接父分类一直到根的ID链，返回 (ID列表, 是否遇到循环)"""
+        pending = pending or {}
+        chain = []
+        seen = {record_id}
+        current = pending.get(record_id, self.parents.get(record_id))
+        while current:
+            if current in seen:
+                return chain, True
+            seen.add(current)
+            chain.append(current)
+            current = pending.get(current, self.parents.get(current))
+        return chain, False
+
+    def would_create_cycle(self, record_id, parent_id, pending=None):
+        """把 record_id 的父分类设为 parent_id 后是否会形成循环，pending 为尚未写入的父子关系"""
+        if not parent_id:
+            return False
+        if parent_id == record_id:
+            return True
+        pending = dict(pending or {})
+        pending[record_id] = parent_id
+        return self.ancestor_ids(record_id, pending)[1]
+
+    def ancestors(self, record_id):
+        """按从近到远的顺序返回祖先记录"""
+        chain, _ = self.ancestor_ids(record_id)
+        return [self.records[ancestor_id] for ancestor_id in chain if ancestor_id in self.records]
+
+    def children_of(self, record_id):
+        """返回直接子分类记录"""
+        return [self.records[child_id] for child_id in self.children.get(record_id, ())]
+
+    def descendants(self, record_id):
+        """按广度优先顺序返回所有后代记录"""
+        result = []
+        seen = {record_id}
+        queue = deque(self.children.get(record_id, ()))
+        while queue:
+            child_id = queue.popleft()
+            if child_id in seen:
+                continue
+            seen.add(child_id)
+            result.append(self.records[child_id])
+            queue.extend(self.children.get(child_id, ()))
+        return result
+
+    def synonyms(self, record_id):
+        """返回通过新组合或同义词关系与该分类相连的所有名称"""
+        result = []
+        seen = {record_id}
+        queue = deque([record_id])
+        while queue:
+            current = queue.popleft()
+            neighbours = []
+            # 组合或同义词指向其原始名称
+            record = self.records.get(current)
+            if record is not None and is_synonym_type(record.get('type')) and current in self.parents:
+                neighbours.append(self.parents[current])
+            for child_id in self.children.get(current, ()):
+                if is_synonym_type(self.records[child_id].get('type')):
+                    neighbours.append(child_id)
+            for neighbour in neighbours:
+                if neighbour not in seen and neighbour in self.records:
+                    seen.add(neighbour)
+                    result.append(self.records[neighbour])
+                    queue.append(neighbour)
+        return result
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+HTTP条件请求与压缩：ETag 校验、gzip/brotli 内容协商以及编码和压缩后的响应体缓存
+"""
+
+import gzip
+import hashlib
+import threading
+import zlib
+from collections import OrderedDict
+
+try:
+    import brotli
+except ImportError:  # brotli 是可选依赖，未安装时只提供gzip
+    brotli = None
+
+
+def make_etag(*parts):
+    """根据数据状态和请求参数生成强ETag的值（不含引号）"""
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+
+
+def etag_matches(if_none_match, etag):
+    """If-None-Match 中是否包含该ETag或它的压缩变体"""
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(','):
+        tag = tag.strip()
+        if tag == '*':
+            return True
+        # If-None-Match 使用弱比较
+        if tag.startswith('W/'):
+            tag = tag[2:]
+        tag = tag.strip('"')
+        if tag == etag or tag.startswith(etag + '-'):
+            return True
+    return False
+
+
+def negotiate_encoding(accept_encoding):
+    """根据 Accept-Encoding 选择压缩方式，优先brotli，都不接受时返回None"""
+    accepted = {}
+    for item in (accept_encoding or '').split(','):
+        coding, _, params = item.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if coding:
+            accepted[coding.strip().lower()] = quality
+
+    def allowed(coding):
+        return accepted.get(coding, accepted.get('*', 0.0)) > 0
+
+    if brotli is not None and allowed('br'):
+        return 'br'
+    if allowed('gzip'):
+        return 'gzip'
+    return None
+
+
+def compress(data, encoding):
+    """按指定方式压缩响应体"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=5)
+    return gzip.compress(data, compresslevel=6, mtime=0)
+
+
+def compressor(encoding):
+    """增量压缩器，返回 (压缩一块, 结束) 两个函数，用于不能整体放入内存的流式响应体"""
+    if encoding == 'br':
+        state = brotli.Compressor(quality=5)
+        return state.process, state.finish
+    # wbits=31 输出带gzip头的数据，与 compress() 使用相同的压缩级别
+    state = zlib.compressobj(6, zlib.DEFLATED, 31)
+    return state.compress, state.flush
+
+
+class ResponseCache:
+    """缓存编码或压缩后的响应体，总字节数超过预算时淘汰最久未使用的条目
+
+    条目带有所依赖的集合名称，集合的数据状态变化后立即丢弃相关条目；
+    带查询参数的响应（搜索、过滤结果）只有在短时间内被第二次请求时才缓存，一次性的查询不会挤掉常用条目
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024, admission_entries=4096):
+        self.max_bytes = max_bytes
+        # 单个条目最多占预算的一半
+        self.max_entry_bytes = max_bytes // 2
+        self.admission_entries = admission_entries
+        self.size = 0
+        self._entries = OrderedDict()
+        self._seen = OrderedDict()
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def track(self, name, state):
+        """记下集合当前的数据状态，与上次不同时丢弃依赖该集合的条目"""
+        if self._states.get(name, state) == state:
+            self._states[name] = state
+            return
+        with self._lock:
+            self._states[name] = state
+            for key in [key for key, (_, _, names) in self._entries.items() if name in names]:
+                self.size -= self._entries.pop(key)[1]
+
+    def admit(self, key):
+        """查询结果是否值得缓存：最近已经请求过一次时返回True"""
+        with self._lock:
+            if key in self._seen:
+                del self._seen[key]
+                return True
+            self._seen[key] = None
+            while len(self._seen) > self.admission_entries:
+                self._seen.popitem(last=False)
+            return False
+
+    def clear(self):
+        """丢弃所有条目和准入记录"""
+        with self._lock:
+            self._entries.clear()
+            self._seen.clear()
+            self.size = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, entry, size, names=()):
+        """缓存一个条目，size 为它占用的字节数，names 为它依赖的集合"""
+        if size > self.max_entry_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= previous[1]
+            self._entries[key] = (entry, size, names)
+            self.size += size
+            while self.size > self.max_bytes:
+                self.size -= self._entries.popitem(last=False)[1][1]
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+生产模式负载测试：依次用不同的工作进程数启动 server.py serve，测量各API路由的每秒请求数
+
+    python loadtest.py --workers 1,2,4 --duration 10 --concurrency 64
+"""
+
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+DEFAULT_PATHS = [
+    '/api/literature',
+    '/api/taxonomy?limit=50',
+    '/api/samples?limit=50',
+    '/api/taxonomy?search=mirifica',
+    '/api/stats',
+]
+
+
+def free_port():
+    """获取一个空闲端口"""
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_until_ready(port, timeout=30):
+    """等待服务器开始接受连接"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            conn.request('GET', '/api/stats')
+            conn.getresponse().read()
+            return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def client_process(port, paths, threads, duration, results):
+    """一个客户端进程，内部用多个线程以keep-alive连接循环发送请求"""
+    counts = []
+    deadline = time.time() + duration
+
+    def worker(offset):
+        done = errors = 0
+        latency = 0.0
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+        i = offset
+        while time.time() < deadline:
+            path = paths[i % len(paths)]
+            i += 1
+            started = time.perf_counter()
+            try:
+                conn.request('GET', path)
+                response = conn.getresponse()
+                response.read()
+                if response.status == 200:
+                    done += 1
+                else:
+                    errors += 1
+            except OSError:
+                errors += 1
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+            latency += time.perf_counter() - started
+        conn.close()
+        counts.append((done, errors, latency))
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    results.put(tuple(map(sum, zip(*counts))))
+
+
+def run_load(port, paths, concurrency, duration):
+    """用多个客户端进程施加负载，返回 (成功数, 失败数, 总延迟)"""
+    processes = max(1, min(concurrency, os.cpu_count() or 1))
+    threads = max(1, concurrency // processes)
+    results = multiprocessing.Queue()
+    clients = [
+        multiprocessing.Process(target=client_process, args=(port, paths, threads, duration, results))
+        for _ in range(processes)
+    ]
+    for client in clients:
+        client.start()
+    totals = [results.get() for _ in clients]
+    for client in clients:
+        client.join()
+    return tuple(map(sum, zip(*totals)))
+
+
+def benchmark(workers, threads, paths, concurrency, duration, warmup):
+    """启动指定工作进程数的服务器并测量吞吐量"""
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, 'server.py', 'serve', '--bind', f'127.0.0.1:{port}',
+         '--workers', str(workers), '--threads', str(threads)],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        if not wait_until_ready(port):
+            raise RuntimeError(f'{workers} 个工作进程的服务器未能启动')
+        run_load(port, paths, concurrency, warmup)
+        done, errors, latency = run_load(port, paths, concurrency, duration)
+    finally:
+        server.terminate()
+        server.wait()
+
+    return {
+        'workers': workers,
+        'requests': done,
+        'errors': errors,
+        'requests_per_sec': round(done / duration, 1),
+        'mean_latency_ms': round(latency / max(done + errors, 1) * 1000, 2),
+    }
+
+
+def main():
+    cores = os.cpu_count() or 1
+    default_workers = sorted({1, 2, 4, 8, cores} & set(range(1, cores + 1)) | {cores})
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', default=','.join(map(str, default_workers)),
+                        help='逗号分隔的工作进程数列表 (默认 %(default)s)')
+    parser.add_argument('--threads', type=int, default=4, help='每个工作进程的线程数 (默认 %(default)s)')
+    parser.add_argument('--concurrency', type=int, default=64, help='并发连接数 (默认 %(default)s)')
+    parser.add_argument('--duration', type=float, default=10, help='每轮测试的秒数 (默认 %(default)s)')
+    parser.add_argument('--warmup', type=float, default=2, help='每轮测试前的预热秒数 (默认 %(default)s)')
+    parser.add_argument('--path', action='append', dest='paths', help='要请求的路径，可以重复指定')
+    parser.add_argument('--json', help='把结果写入JSON文件')
+    args = parser.parse_args()
+
+    paths = args.paths or DEFAULT_PATHS
+    results = []
+    print(f"{'工作进程':>8} {'请求数':>10} {'失败':>6} {'请求/秒':>10} {'平均延迟(ms)':>14} {'加速比':>8}")
+    for workers in [int(n) for n in args.workers.split(',')]:
+        result = benchmark(workers, args.threads, paths, args.concurrency, args.duration, args.warmup)
+        result['speedup'] = round(result['requests_per_sec'] / max(results[0]['requests_per_sec'], 1e-9), 2) \
+            if results else 1.0
+        results.append(result)
+        print(f"{workers:>8} {result['requests']:>10} {result['errors']:>6} {result['requests_per_sec']:>10} "
+              f"{result['mean_latency_ms']:>14} {result['speedup']:>8}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'cores': cores, 'paths': paths, 'results': results}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
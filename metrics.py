@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+运行指标：按路由统计请求数、延迟和请求/响应大小，按处理阶段（加载、建索引、过滤、序列化、压缩、持久化）统计耗时，
+并以Prometheus文本格式输出；可选的采样分析器为慢请求保存折叠格式的调用栈，可直接用 flamegraph.pl 或 speedscope 生成火焰图
+
+多进程运行时各进程把自己的计数定期写入共享目录，任一进程输出指标时合并所有进程的数据
+"""
+
+import copy
+import glob
+import json
+import math
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+
+# 指标名称 -> (类型, 说明, 直方图的桶上界)
+FAMILIES = {
+    'http_requests_total': ('counter', '按路由、方法和状态码统计的请求数', None),
+    'http_request_duration_seconds': ('histogram', '从开始处理请求到响应体发送完毕的耗时', LATENCY_BUCKETS),
+    'http_request_size_bytes': ('histogram', '请求体的字节数', SIZE_BUCKETS),
+    'http_response_size_bytes': ('histogram', '实际发送的响应体字节数（压缩后）', SIZE_BUCKETS),
+    'app_phase_duration_seconds': ('histogram', '各处理阶段的耗时，嵌套阶段的时间只计入最内层', LATENCY_BUCKETS),
+    'app_slow_request_profiles_total': ('counter', '保存的慢请求调用栈文件数', None),
+    'app_response_cache_total': ('counter', '可缓存的GET请求命中和未命中响应体缓存的次数', None),
+}
+
+# 不在请求中执行的阶段（例如后台压缩）使用的路由标签
+BACKGROUND_ROUTE = 'background'
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + '}'
+
+
+def format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Metrics:
+    """进程内的计数器和直方图，所有方法都是线程安全的"""
+
+    def __init__(self, directory=None, sync_interval=1.0):
+        # 多进程共享的快照目录，为None时只输出本进程的数据
+        self.directory = directory
+        self.sync_interval = sync_interval
+        self._series = {name: {} for name in FAMILIES}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._changed = False
+        self._saver = None
+
+    def inc(self, name, labels=(), value=1):
+        with self._lock:
+            series = self._series[name]
+            series[labels] = series.get(labels, 0) + value
+            self._changed = True
+
+    def observe(self, name, value, labels=()):
+        buckets = FAMILIES[name][2]
+        index = next((i for i, bound in enumerate(buckets) if value <= bound), len(buckets))
+        with self._lock:
+            entry = self._series[name].get(labels)
+            if entry is None:
+                entry = self._series[name][labels] = [[0] * (len(buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+            self._changed = True
+
+    # 阶段计时
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def phase(self, name):
+        """计时一个处理阶段，嵌套在其中的其他阶段的耗时会从外层扣除"""
+        return _Phase(self, name)
+
+    def record_phase(self, name, seconds):
+        """直接记录一段已经测量好的阶段耗时，用于分散在生成器各次迭代中的工作"""
+        stack = self._stack()
+        if stack:
+            stack[-1].nested += seconds
+        route = getattr(self._local, 'route', None) or BACKGROUND_ROUTE
+        self.observe('app_phase_duration_seconds', seconds, (('phase', name), ('route', route)))
+
+    def instrument(self, target, **phases):
+        """包装对象，调用指定的方法时计入对应的阶段，例如 instrument(storage, load='load', write='persist')"""
+        return Instrumented(self, target, phases)
+
+    # 请求
+
+    def begin_request(self, route):
+        """请求开始时记下路由，之后本线程中的阶段都计入该路由"""
+        self._local.route = route
+
+    def end_request(self, route, method, status, seconds, request_size, response_size):
+        self._local.route = None
+        labels = (('route', route), ('method', method))
+        self.inc('http_requests_total', labels + (('status', str(status)),))
+        self.observe('http_request_duration_seconds', seconds, labels)
+        if request_size is not None:
+            self.observe('http_request_size_bytes', request_size, labels)
+        if response_size is not None:
+            self.observe('http_response_size_bytes', response_size, labels)
+        if self.directory:
+            self._start_saver()
+
+    # 多进程合并
+
+    def _start_saver(self):
+        """启动定期保存本进程计数的后台线程，fork出的工作进程各自启动一个"""
+        with self._lock:
+            if self._saver == os.getpid():
+                return
+            self._saver = os.getpid()
+
+        def run():
+            while True:
+                time.sleep(self.sync_interval)
+                if self._changed:
+                    self.save()
+
+        threading.Thread(target=run, name='metrics', daemon=True).start()
+
+    def snapshot(self):
+        with self._lock:
+            return {name: [[list(labels), value if not isinstance(value, list) else [list(value[0]), value[1]]]
+                           for labels, value in series.items()]
+                    for name, series in self._series.items()}
+
+    def save(self):
+        """把本进程的计数写入共享目录"""
+        self._changed = False
+        path = os.path.join(self.directory, f'{os.getpid()}.json')
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False)
+        os.replace(temp_path, path)
+
+    def clear_directory(self):
+        """删除上一次运行留下的快照，服务器重新启动时计数从零开始"""
+        for path in glob.glob(os.path.join(self.directory, '*.json')):
+            os.remove(path)
+
+    def _merged(self):
+        """本进程的实时数据加上其他进程（包括已退出的进程）最近一次保存的快照"""
+        snapshots = [self.snapshot()]
+        if self.directory:
+            own = os.path.join(self.directory, f'{os.getpid()}.json')
+            for path in glob.glob(os.path.join(self.directory, '*.json')):
+                if path == own:
+                    continue
+                try:
+                    with open(path, 'r', encoding='utf-8') as f:
+                        snapshots.append(json.load(f))
+                except (OSError, ValueError):
+                    continue
+
+        merged = {name: {} for name in FAMILIES}
+        for snapshot in snapshots:
+            for name, series in snapshot.items():
+                if name not in merged:
+                    continue
+                for labels, value in series:
+                    labels = tuple(tuple(pair) for pair in labels)
+                    current = merged[name].get(labels)
+                    if not isinstance(value, list):
+                        merged[name][labels] = (current or 0) + value
+                    elif current is None:
+                        merged[name][labels] = [list(value[0]), value[1]]
+                    else:
+                        current[0] = [a + b for a, b in zip(current[0], value[0])]
+                        current[1] += value[1]
+        return merged
+
+    def render(self, gauges=()):
+        """输出Prometheus文本格式，gauges 为 (名称, 说明, [(标签, 值)]) 形式的当前状态"""
+        lines = []
+        for name, series in self._merged().items():
+            kind, help_text, buckets = FAMILIES[name]
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+            for labels, value in sorted(series.items()):
+                if kind != 'histogram':
+                    lines.append(f'{name}{format_labels(labels)} {format_value(value)}')
+                    continue
+                counts, total = value
+                cumulative = 0
+                for bound, count in zip(buckets + (math.inf,), counts):
+                    cumulative += count
+                    bucket_labels = labels + (('le', format_value(bound)),)
+                    lines.append(f'{name}_bucket{format_labels(bucket_labels)} {cumulative}')
+                lines.append(f'{name}_sum{format_labels(labels)} {format_value(total)}')
+                lines.append(f'{name}_count{format_labels(labels)} {cumulative}')
+        for name, help_text, values in gauges:
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} gauge']
+            lines += [f'{name}{format_labels(labels)} {format_value(value)}' for labels, value in values]
+        return '\n'.join(lines) + '\n'
+
+
+class _Phase:
+    """Metrics.phase() 返回的计时上下文"""
+
+    __slots__ = ('metrics', 'name', 'started', 'nested')
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.nested = 0.0
+        self.metrics._stack().append(self)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.started
+        stack = self.metrics._stack()
+        stack.pop()
+        self.metrics.record_phase(self.name, elapsed - self.nested)
+
+
+class Instrumented:
+    """把调用转发给被包装的对象，指定方法的耗时计入对应阶段，其他属性原样访问"""
+
+    def __init__(self, metrics, target, phases):
+        self._metrics = metrics
+        self._target = target
+        self._phases = phases
+        # inspect.unwrap() 据此取得被包装的对象
+        self.__wrapped__ = target
+
+    def __copy__(self):
+        """复制被包装的对象，副本的方法同样计时"""
+        return Instrumented(self._metrics, copy.copy(self._target), self._phases)
+
+    def __getattr__(self, name):
+        value = getattr(self._target, name)
+        phase = self._phases.get(name)
+        if phase is None:
+            return value
+
+        def timed(*args, **kwargs):
+            with self._metrics.phase(phase):
+                return value(*args, **kwargs)
+        return timed
+
+
+def frame_stack(frame):
+    """把调用栈转换为折叠格式的一行：由外到内、以分号分隔的函数名"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class SamplingProfiler:
+    """后台线程定期采样正在处理请求的线程的调用栈，只在有请求注册时工作
+
+    slow_ms 为0时关闭；开启后耗时达到 slow_ms 的请求的调用栈写入 directory，最多保留 keep 个文件
+    """
+
+    def __init__(self, directory, slow_ms=0, interval=0.005, keep=100):
+        self.directory = directory
+        self.slow_ms = slow_ms
+        self.interval = interval
+        self.keep = keep
+        self._samples = {}
+        self._lock = threading.Lock()
+        self._active = threading.Event()
+        self._thread = None
+
+    @property
+    def enabled(self):
+        return self.slow_ms > 0
+
+    def start(self, ident):
+        """开始采样指定线程"""
+        with self._lock:
+            self._samples[ident] = Counter()
+            self._active.set()
+            # fork出的工作进程不会继承父进程的采样线程
+            if self._thread is None or self._thread[1] != os.getpid():
+                self._thread = (threading.Thread(target=self._run, name='profiler', daemon=True), os.getpid())
+                self._thread[0].start()
+
+    def stop(self, ident):
+        """停止采样指定线程，返回 {折叠调用栈: 采样次数}"""
+        with self._lock:
+            samples = self._samples.pop(ident, None)
+            if not self._samples:
+                self._active.clear()
+        return samples or Counter()
+
+    def _run(self):
+        while True:
+            self._active.wait()
+            frames = sys._current_frames()
+            with self._lock:
+                for ident, samples in self._samples.items():
+                    frame = frames.get(ident)
+                    if frame is not None:
+                        samples[frame_stack(frame)] += 1
+            del frames
+            time.sleep(self.interval)
+
+    def dump(self, label, seconds, samples):
+        """把一次慢请求的采样写成折叠格式文件，返回文件路径"""
+        os.makedirs(self.directory, exist_ok=True)
+        slug = re.sub(r'[^A-Za-z0-9]+', '_', label).strip('_')[:80]
+        path = os.path.join(self.directory, f'{time.strftime("%Y%m%d-%H%M%S")}-{os.getpid()}-'
+                                            f'{seconds * 1000:.0f}ms-{slug}.folded')
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in samples.most_common():
+                f.write(f'{stack} {count}\n')
+
+        profiles = sorted(glob.glob(os.path.join(self.directory, '*.folded')), key=os.path.getmtime)
+        for old in profiles[:-self.keep]:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+        return path
+
+    def recent(self, count=20):
+        """最近保存的调用栈文件名"""
+        profiles = sorted(glob.glob(os.path.join(self.directory, '*.folded')), key=os.path.getmtime, reverse=True)
+        return [os.path.basename(path) for path in profiles[:count]]
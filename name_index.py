@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""
+学名自动补全索引：按单词前缀查找名称，并用三元组（trigram）索引找出拼写相近的名称，结果按编辑距离和分类等级排序
+
+前缀查找使用排好序的词表和二分查找，模糊匹配只在去重后的单词上进行，查询代价与记录总数基本无关
+"""
+
+import bisect
+import heapq
+import re
+import unicodedata
+from collections import Counter
+from itertools import chain
+
+# 分类等级从高到低，距离相同时高等级的名称排在前面，未知等级排在最后
+LEVEL_ORDER = ['kingdom', 'phylum', 'subphylum', 'class', 'subclass', 'superorder', 'order', 'suborder',
+               'superfamily', 'family', 'subfamily', 'tribe', 'genus', 'subgenus', 'species', 'subspecies',
+               'variety', 'form']
+LEVEL_RANKS = {level: rank for rank, level in enumerate(LEVEL_ORDER)}
+
+WORD_PATTERN = re.compile(r'[^\W_]+')
+# 最后一个单词按前缀匹配时最多展开的单词数
+MAX_PREFIX_WORDS = 256
+# 模糊匹配允许的最大编辑距离
+MAX_EDITS = 2
+# 每个查询单词最多计算编辑距离的候选单词数
+MAX_FUZZY_CANDIDATES = 128
+# 每个查询单词最多统计的三元组倒排表长度之和
+MAX_GRAM_POSTINGS = 4096
+# 缓存的模糊匹配结果数，输入过程中前面已经输完的单词不必重复匹配
+SIMILAR_CACHE_SIZE = 1024
+
+
+def normalize(text):
+    """把名称切分为小写单词，去掉变音符号（Páll → pall）"""
+    text = unicodedata.normalize('NFKD', str(text))
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return WORD_PATTERN.findall(text.lower())
+
+
+def max_edits(length):
+    """按单词长度允许的最大编辑距离，很短的单词只做精确匹配"""
+    if length <= 3:
+        return 0
+    if length <= 5:
+        return 1
+    return MAX_EDITS
+
+
+def allowed_edits(word, prefix):
+    """查询单词允许的最大编辑距离，前缀越短能匹配的单词越多，仍在输入的单词少算一个字符"""
+    return max_edits(len(word) - 1 if prefix else len(word))
+
+
+def trigrams(word, prefix=False):
+    """单词的三元组集合，两端补空格使开头和结尾的字符也有自己的三元组；前缀查询不补结尾"""
+    padded = '  ' + word + ('' if prefix else ' ')
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a, b, limit, prefix=False):
+    """a 与 b 的编辑距离（prefix 为真时取 b 的所有前缀中最接近的一个），超过 limit 时返回 limit + 1
+
+    用位并行算法（Myers/Hyyrö）逐个字符处理 b，a 的每一行压缩在一个整数的各个位中
+    """
+    if not prefix and abs(len(a) - len(b)) > limit:
+        return limit + 1
+    full = (1 << len(a)) - 1
+    last = 1 << (len(a) - 1)
+    peq = {}
+    for i, char in enumerate(a):
+        peq[char] = peq.get(char, 0) | 1 << i
+    # 当前列中向下递增和递减1的位置
+    positive, negative = full, 0
+    score = best = len(a)
+    remaining = len(b)
+    for char in b:
+        eq = peq.get(char, 0)
+        xv = eq | negative
+        xh = (((eq & positive) + positive) ^ positive) | eq
+        ph = negative | ~(xh | positive)
+        mh = positive & xh
+        if ph & last:
+            score += 1
+        elif mh & last:
+            score -= 1
+        remaining -= 1
+        if score < best:
+            best = score
+        elif score - remaining > limit and (not prefix or best > limit):
+            # 剩下的字符再也不能把距离降到 limit 以内
+            break
+        ph = (ph << 1) | 1
+        mh <<= 1
+        positive = (mh | ~(xv | ph)) & full
+        negative = ph & xv
+    distance = best if prefix else score
+    return distance if distance <= limit else limit + 1
+
+
+class NameIndex:
+    """名称字段的自动补全索引，与其他索引一样随集合增量更新"""
+
+    def __init__(self, field='name', level_field='level'):
+        self.field = field
+        self.level_field = level_field
+        self.records = {}
+        # 记录ID -> 名称的单词
+        self.names = {}
+        # 单词 -> 包含它的记录的排序键，保持有序
+        self.postings = {}
+        # 记录ID -> [(单词, 排序键)]，用于移除
+        self.keys = {}
+        # 排好序的单词表，用于前缀查找
+        self.vocabulary = []
+        # 三元组 -> 包含它的单词
+        self.grams = {}
+        # 排好序的 (小写ID, 记录ID)，用于按ID前缀查找
+        self.ids = []
+        # (单词, 是否前缀, 最大距离) -> 模糊匹配结果，词表变化后清空
+        self._similar = {}
+
+    def rebuild(self, records):
+        self.records = {}
+        self.names = {}
+        self.postings = {}
+        self.keys = {}
+        self.grams = {}
+        self._similar = {}
+        self.vocabulary = []
+        self.ids = []
+        for record in records:
+            self._add(record, False)
+        # 建立索引时先追加，最后统一排序
+        for keys in self.postings.values():
+            keys.sort()
+        self.vocabulary = sorted(self.postings)
+        self.ids.sort()
+
+    def add(self, record):
+        self._add(record, True)
+
+    def _add(self, record, ordered):
+        """把记录加入索引，ordered 为真时按顺序插入排序键和新单词"""
+        record_id = record.get('id')
+        if record_id is None:
+            return
+        if record_id in self.records:
+            self.remove(self.records[record_id])
+        name = record.get(self.field) or ''
+        words = normalize(name)
+        if not words:
+            return
+        self.records[record_id] = record
+        self.names[record_id] = tuple(words)
+        if ordered:
+            bisect.insort(self.ids, (str(record_id).lower(), record_id))
+        else:
+            self.ids.append((str(record_id).lower(), record_id))
+        level = LEVEL_RANKS.get(str(record.get(self.level_field) or '').lower(), len(LEVEL_ORDER))
+
+        added = self.keys[record_id] = []
+        for position, word in enumerate(words):
+            if word in words[:position]:
+                continue
+            # 距离相同时名称以该单词开头的在前，其次分类等级从高到低、单词少的、按名称字母顺序
+            key = (position > 0, level, len(words), str(name).lower(), record_id, position)
+            keys = self.postings.get(word)
+            if keys is None:
+                keys = self.postings[word] = []
+                self._similar.clear()
+                for gram in trigrams(word):
+                    self.grams.setdefault(gram, set()).add(word)
+                if ordered:
+                    bisect.insort(self.vocabulary, word)
+            if ordered:
+                bisect.insort(keys, key)
+            else:
+                keys.append(key)
+            added.append((word, key))
+
+    def remove(self, record):
+        record_id = record.get('id')
+        if self.records.get(record_id) is not record:
+            return
+        del self.records[record_id]
+        del self.names[record_id]
+        del self.ids[bisect.bisect_left(self.ids, (str(record_id).lower(), record_id))]
+        for word, key in self.keys.pop(record_id):
+            keys = self.postings[word]
+            del keys[bisect.bisect_left(keys, key)]
+            if keys:
+                continue
+            del self.postings[word]
+            self._similar.clear()
+            del self.vocabulary[bisect.bisect_left(self.vocabulary, word)]
+            for gram in trigrams(word):
+                words = self.grams[gram]
+                words.discard(word)
+                if not words:
+                    del self.grams[gram]
+
+    def clear_cache(self):
+        """清空模糊匹配结果的缓存"""
+        self._similar = {}
+
+    def _exact_words(self, word, prefix):
+        """返回 {与 word 相同（prefix 为真时以 word 开头）的单词: 0}"""
+        if not prefix:
+            return {word: 0} if word in self.postings else {}
+        matches = {}
+        start = bisect.bisect_left(self.vocabulary, word)
+        for candidate in self.vocabulary[start:start + MAX_PREFIX_WORDS]:
+            if not candidate.startswith(word):
+                break
+            matches[candidate] = 0
+        return matches
+
+    def _similar_words(self, word, prefix, distance):
+        """返回 {与 word 拼写相近的单词: 编辑距离}，距离不超过 distance 和按单词长度允许的最大编辑距离
+
+        prefix 为真时单词只需以与 word 相近的字符串开头
+        """
+        key = (word, prefix, distance)
+        cached = self._similar.get(key)
+        if cached is not None:
+            return cached
+        limit = min(distance, allowed_edits(word, prefix))
+        matches = {}
+        if limit:
+            # 每次编辑最多破坏3个三元组，距离不超过 limit 的单词至少包含 needed 个查询的三元组，
+            # 因此一定出现在最稀有的 len(grams) - needed + 1 个三元组之中，更常见的三元组不必统计
+            grams = sorted((self.grams.get(gram, ()) for gram in trigrams(word, prefix)), key=len)
+            needed = max(len(grams) - 3 * limit, 1)
+            used = len(grams) - needed + 1
+            # 在预算之内多统计一些三元组，共有的三元组数越准确，排在前面的候选单词越可能是真正相近的单词
+            total = sum(map(len, grams[:used]))
+            while used < len(grams) and total + len(grams[used]) <= MAX_GRAM_POSTINGS:
+                total += len(grams[used])
+                used += 1
+            counts = Counter(chain.from_iterable(grams[:used]))
+            low, high = len(word) - limit, len(word) + limit
+            # 没有统计的三元组最多缺 len(grams) - used 个
+            least = needed - len(grams) + used
+            candidates = [candidate for candidate, count in counts.items() if count >= least and
+                          low <= len(candidate) and (prefix or len(candidate) <= high)]
+            # 只验证在这些三元组中出现最多的一部分单词，编辑距离的计算量不随词表增长
+            if len(candidates) > MAX_FUZZY_CANDIDATES:
+                candidates = heapq.nlargest(MAX_FUZZY_CANDIDATES, candidates, key=counts.__getitem__)
+
+            # 前缀匹配的距离只取决于单词的前 len(word) + limit 个字符，相同开头的单词只算一次
+            distances = {}
+            for candidate in candidates:
+                head = candidate[:high] if prefix else candidate
+                found = distances.get(head)
+                if found is None:
+                    found = distances[head] = edit_distance(word, head, limit, prefix)
+                if found <= limit:
+                    matches[candidate] = found
+
+        if len(self._similar) >= SIMILAR_CACHE_SIZE:
+            self._similar.clear()
+        self._similar[key] = matches
+        return matches
+
+    def _id_matches(self, text, limit):
+        """返回 [(记录, 0)]：ID与输入相同的记录，输入像ID一样不含空白且带有分隔符时再加上ID以它开头的记录"""
+        key = str(text).strip().lower()
+        if not key:
+            return []
+        start = bisect.bisect_left(self.ids, (key,))
+        if key.isalnum() or any(char.isspace() for char in key):
+            exact = start < len(self.ids) and self.ids[start][0] == key
+            return [(self.records[self.ids[start][1]], 0)] if exact else []
+        results = []
+        for lowered, record_id in self.ids[start:start + limit]:
+            if not lowered.startswith(key):
+                break
+            results.append((self.records[record_id], 0))
+        return results
+
+    def suggest(self, text, limit=10):
+        """返回 [(记录, 编辑距离)]，ID匹配输入的记录排在最前，其余按距离、名称是否以查询开头、分类等级排序
+
+        查询的单词依次与名称中连续的单词匹配，仍在输入的最后一个单词按前缀匹配；
+        先做精确匹配，不够 limit 条时依次放宽到1次、2次编辑，
+        因为放宽后新增的结果距离总是更大，已经足够 limit 条时不再继续放宽
+        """
+        if limit <= 0:
+            return []
+        by_id = self._id_matches(text, limit)
+        if by_id:
+            found = {record.get('id') for record, _ in by_id}
+            rest = [match for match in self._suggest_names(text, limit) if match[0].get('id') not in found]
+            return (by_id + rest)[:limit]
+        return self._suggest_names(text, limit)
+
+    def _suggest_names(self, text, limit):
+        """按名称匹配，返回 [(记录, 编辑距离)]"""
+        query = normalize(text)
+        if not query:
+            return []
+        prefixes = [i == len(query) - 1 and not str(text)[-1:].isspace() for i in range(len(query))]
+        matches = [self._exact_words(word, prefix) for word, prefix in zip(query, prefixes)]
+        results = self._collect(query, matches, limit) if all(matches) else []
+
+        # 多个单词的查询中每个单词最多1次编辑，否则各个单词大量的相近单词组合起来，得到的多是相差很远的名称
+        for distance in range(1, (MAX_EDITS if len(query) == 1 else 1) + 1):
+            if len(results) >= limit and results[-1][1] < distance:
+                break
+            for word_matches, word, prefix in zip(matches, query, prefixes):
+                for similar, found in self._similar_words(word, prefix, distance).items():
+                    word_matches.setdefault(similar, found)
+            if all(matches):
+                results = self._collect(query, matches, limit)
+        return results
+
+    def _collect(self, query, matches, limit):
+        """按 [{单词: 距离}] 找出名称中连续单词依次匹配的记录，返回排在前面的 limit 条"""
+        results = []
+        seen = set()
+        if len(query) == 1:
+            # 按距离分层，每层合并各单词已排好序的记录，取够 limit 条即可停止
+            tiers = {}
+            for word, distance in matches[0].items():
+                tiers.setdefault(distance, []).append(self.postings[word])
+            for distance in sorted(tiers):
+                for key in heapq.merge(*tiers[distance]):
+                    record_id = key[4]
+                    if record_id not in seen:
+                        seen.add(record_id)
+                        results.append((self.records[record_id], distance))
+                        if len(results) == limit:
+                            return results
+            return results
+
+        # 从候选记录最少的查询单词出发，检查名称中相邻位置的其他单词
+        pivot = min(range(len(query)), key=lambda i: sum(len(self.postings[word]) for word in matches[i]))
+        scored = []
+        for word, distance in matches[pivot].items():
+            for key in self.postings[word]:
+                record_id, position = key[4], key[5]
+                words = self.names[record_id]
+                start = position - pivot
+                if start < 0 or start + len(query) > len(words):
+                    continue
+                total = distance
+                for i, word_matches in enumerate(matches):
+                    if i != pivot:
+                        found = word_matches.get(words[start + i])
+                        if found is None:
+                            break
+                        total += found
+                else:
+                    scored.append((total, start > 0) + key[1:5])
+        scored.sort()
+        for key in scored:
+            if key[5] not in seen:
+                seen.add(key[5])
+                results.append((self.records[key[5]], key[0]))
+                if len(results) == limit:
+                    break
+        return results
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+管理界面的后台持久化：在单独的线程中加载数据文件、合并写入暂存的修改，
+客户端模式下还负责把修改提交到服务器并通过变更流增量同步本地缓存，
+界面线程只通过信号收到进度和结果，大文件的解析、写入和网络请求不会冻结窗口
+"""
+
+import uuid
+
+from PyQt5.QtCore import QObject, QThread, pyqtSignal, pyqtSlot
+
+from ris import read_ris_file
+
+# 从RIS文件导入时每批交给界面线程暂存的记录数
+RIS_BATCH_SIZE = 1000
+
+
+class PersistenceWorker(QObject):
+    """移动到后台线程后使用，load 和 flush 通过排队的信号调用，按调用顺序依次执行"""
+
+    # 集合名称, 新解析出的记录, 已完成量, 总量
+    progress = pyqtSignal(str, object, int, int)
+    loaded = pyqtSignal(str)
+    loadFinished = pyqtSignal()
+    # 集合名称, 写入的操作数
+    saved = pyqtSignal(str, int)
+    failed = pyqtSignal(str, str)
+    # 增量同步后发生变化的集合名称；同步失败时为空列表并另外发出 syncFailed
+    synced = pyqtSignal(list)
+    syncFailed = pyqtSignal(str)
+    # 从RIS文件解析出的一批文献记录
+    risBatch = pyqtSignal(list)
+    # 导入的记录数, 跳过的缺少标题的记录数, 错误信息（成功时为空）
+    risImported = pyqtSignal(int, int, str)
+
+    def __init__(self, store, client=None):
+        super().__init__()
+        self.store = store
+        self.client = client
+
+    def _reporter(self, name):
+        def report(records, done, total):
+            # 窗口关闭时中断尚未完成的加载
+            if QThread.currentThread().isInterruptionRequested():
+                raise InterruptedError('加载已取消')
+            self.progress.emit(name, records, done, total)
+        return report
+
+    @pyqtSlot(list)
+    def load(self, names):
+        """依次加载各集合，每个集合加载完成后立即通知界面"""
+        for name in names:
+            try:
+                self.store[name].refresh(self._reporter(name))
+            except InterruptedError:
+                return
+            except (OSError, ValueError) as e:
+                self.failed.emit(name, f'加载失败: {e}')
+                continue
+            self.loaded.emit(name)
+        self.loadFinished.emit()
+
+    @pyqtSlot(list)
+    def flush(self, names):
+        """把各集合暂存的修改各自合并为一次写入"""
+        for name in names:
+            rejected = []
+            publish = None
+            if self.client is not None:
+                publish = lambda operations, name=name: rejected.extend(self.client.push(name, operations))
+            try:
+                count = self.store[name].flush(publish)
+            except (OSError, ValueError) as e:
+                self.failed.emit(name, f'保存失败: {e}')
+                continue
+            if rejected:
+                details = '\n'.join(f'{op} {payload.get("id") if op == "upsert" else payload}: {message}'
+                                    for op, payload, message in rejected)
+                self.failed.emit(name, f'服务器拒绝了 {len(rejected)} 项修改，将重新同步全部数据:\n{details}')
+            self.saved.emit(name, count)
+
+    @pyqtSlot()
+    def pull(self):
+        """从服务器拉取游标之后的变更；本地模式下重新读取被其他进程修改过的数据文件"""
+        try:
+            if self.client is None:
+                changed = [name for name, collection in self.store.collections.items() if collection.refresh()]
+            else:
+                changed = self.client.pull()
+        except (OSError, ValueError) as e:
+            self.syncFailed.emit(str(e))
+            changed = []
+        self.synced.emit(changed)
+
+    @pyqtSlot(str)
+    def import_ris(self, file_path):
+        """流式解析RIS文件，缺少标题的记录跳过，其余生成ID后分批交给界面线程暂存"""
+        batch = []
+        imported = skipped = 0
+        try:
+            for lit_data in read_ris_file(file_path):
+                if not lit_data["title"]:
+                    skipped += 1
+                    continue
+                lit_data["id"] = f"LIT-{str(uuid.uuid4())}"
+                batch.append(lit_data)
+                if len(batch) == RIS_BATCH_SIZE:
+                    if QThread.currentThread().isInterruptionRequested():
+                        return
+                    self.risBatch.emit(batch)
+                    imported += len(batch)
+                    batch = []
+        except (OSError, ValueError) as e:
+            self.risImported.emit(imported, skipped, str(e))
+            return
+        if batch:
+            self.risBatch.emit(batch)
+            imported += len(batch)
+        self.risImported.emit(imported, skipped, '')
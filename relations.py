@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+外键反向索引：按引用字段的值分组记录，例如 tax_id → 样本、lit_id → 分类
+"""
+
+
+class ForeignKeyIndex:
+    """引用字段值到记录的反向索引，查询代价只与结果数量相关"""
+
+    def __init__(self, field):
+        self.field = field
+        self.groups = {}
+        self.keys = {}
+        self.records = {}
+
+    def rebuild(self, records):
+        self.groups = {}
+        self.keys = {}
+        self.records = {}
+        for record in records:
+            self.add(record)
+
+    def add(self, record):
+        record_id = record.get('id')
+        if record_id is None:
+            return
+        if record_id in self.records:
+            self.remove(self.records[record_id])
+        self.records[record_id] = record
+        key = record.get(self.field)
+        if key:
+            self.keys[record_id] = key
+            self.groups.setdefault(key, {})[record_id] = record
+
+    def remove(self, record):
+        record_id = record.get('id')
+        if self.records.get(record_id) is not record:
+            return
+        del self.records[record_id]
+        key = self.keys.pop(record_id, None)
+        if key is not None:
+            group = self.groups[key]
+            del group[record_id]
+            if not group:
+                del self.groups[key]
+
+    def lookup(self, key):
+        """引用了 key 的全部记录"""
+        return list(self.groups.get(key, {}).values())
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+流式RIS/EndNote解析，逐条读取以 "ER  -" 结尾的记录并映射为文献字段
+"""
+
+import re
+
+# 标签行格式为 "TY  - JOUR"，容忍缺少空格的不规范导出
+TAG_PATTERN = re.compile(r'^([A-Z][A-Z0-9])\s{0,2}-(?:\s(.*))?$')
+
+# 标签到文献字段的映射，同一字段按列表顺序决定优先级
+FIELD_TAGS = {
+    'title': ['TI', 'T1', 'CT', 'BT'],
+    'journal': ['JF', 'JO', 'T2', 'JA', 'J2'],
+    'year': ['PY', 'Y1', 'DA'],
+    'doi': ['DO'],
+    'url': ['UR', 'L2'],
+    'abstract': ['AB', 'N2'],
+}
+AUTHOR_TAGS = ('AU', 'A1')
+
+TAG_FIELDS = {tag: (field, priority) for field, tags in FIELD_TAGS.items() for priority, tag in enumerate(tags)}
+
+
+def _build_record(tags):
+    """把一条记录收集到的标签值转换为文献字段"""
+    record = {field: '' for field in ('title', 'authors', 'journal', 'year', 'doi', 'url', 'abstract')}
+    best = {}
+    for tag, value in tags:
+        if tag in AUTHOR_TAGS:
+            record['authors'] = record['authors'] + '; ' + value if record['authors'] else value
+            continue
+        field, priority = TAG_FIELDS.get(tag, (None, None))
+        if field is None or priority >= best.get(field, len(FIELD_TAGS[field])):
+            continue
+        if field == 'year':
+            year_match = re.search(r'\d{4}', value)
+            if not year_match:
+                continue
+            value = year_match.group()
+        best[field] = priority
+        record[field] = value
+    return record
+
+
+def iter_ris_records(lines):
+    """逐条解析RIS记录，lines 可以是文件对象或任意行迭代器"""
+    tags = []
+    for line in lines:
+        line = line.rstrip('\r\n')
+        match = TAG_PATTERN.match(line)
+        if match is None:
+            # 没有标签的行是上一个字段的续行
+            if tags and line.strip():
+                tag, value = tags[-1]
+                tags[-1] = (tag, f'{value} {line.strip()}' if value else line.strip())
+            continue
+
+        tag, value = match.group(1), (match.group(2) or '').strip()
+        if tag == 'ER':
+            if tags:
+                yield _build_record(tags)
+            tags = []
+        elif tag == 'TY':
+            # 上一条记录缺少 ER 时，在新记录开始前把它返回
+            if tags:
+                yield _build_record(tags)
+            tags = []
+        else:
+            tags.append((tag, value))
+
+    # 最后一条记录缺少 ER 时也照常返回
+    if tags:
+        yield _build_record(tags)
+
+
+def read_ris_file(file_path):
+    """流式读取RIS文件中的所有记录"""
+    with open(file_path, 'r', encoding='utf-8-sig', errors='replace') as f:
+        yield from iter_ris_records(f)
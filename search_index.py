@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+倒排全文索引，拉丁文本按单词切分，中日韩文本按单字和双字切分
+"""
+
+import bisect
+import math
+import re
+from collections import Counter
+
+# 中日韩字符范围（假名、汉字、扩展A、兼容汉字、谚文）
+CJK_RANGES = '぀-ヿ㐀-䶿一-鿿豈-﫿가-힯'
+TOKEN_PATTERN = re.compile(
+    r'(?P<cjk>[%s]+)|(?P<word>(?:(?![%s])[^\W_])+)' % (CJK_RANGES, CJK_RANGES)
+)
+
+# 前缀扩展时最多展开的词项数量
+MAX_PREFIX_EXPANSION = 64
+
+
+def tokenize(text):
+    """把文本切分为词项：拉丁单词整体保留，中日韩文本生成单字和双字"""
+    terms = []
+    for match in TOKEN_PATTERN.finditer(str(text).lower()):
+        run = match.group('cjk')
+        if run is None:
+            terms.append(match.group('word'))
+            continue
+        terms.extend(run)
+        terms.extend(map(''.join, zip(run, run[1:])))
+    return terms
+
+
+def field_terms(field, value):
+    """切分字段值：记录ID只保留开头的类型前缀（如 lit、smp），其中的UUID片段不进入索引"""
+    terms = tokenize(value)
+    return terms[:1] if field == 'id' else terms
+
+
+def query_terms(text):
+    """把查询切分为词项，返回 (词项列表, 最后一个词项是否按前缀匹配)"""
+    terms = []
+    last_is_word = False
+    for match in TOKEN_PATTERN.finditer(str(text).lower()):
+        run = match.group('cjk')
+        if run is None:
+            terms.append(match.group('word'))
+            last_is_word = True
+        elif len(run) == 1:
+            terms.append(run)
+            last_is_word = False
+        else:
+            terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+            last_is_word = False
+    # 只有在用户还在输入最后一个单词时才做前缀匹配
+    prefix = last_is_word and not text[-1:].isspace()
+    return terms, prefix
+
+
+class SearchIndex:
+    """带字段权重的倒排索引，支持增量更新、AND 查询和 TF-IDF 排序"""
+
+    def __init__(self, fields):
+        self.fields = fields
+        self.postings = {}
+        self.vocabulary = []
+        self._doc_terms = {}
+        self._docs = {}
+        self._order = {}
+        self._sequence = 0
+
+    def rebuild(self, records):
+        """根据全部记录重新建立索引"""
+        self.postings = {}
+        self.vocabulary = []
+        self._doc_terms = {}
+        self._docs = {}
+        self._order = {}
+        self._sequence = 0
+        for record in records:
+            self._add(record, False)
+        # 建立索引时先追加新词项，最后统一排序，避免逐个插入有序列表的平方代价
+        self.vocabulary = sorted(self.postings)
+
+    def add(self, record):
+        """把一条记录加入索引"""
+        self._add(record, True)
+
+    def _add(self, record, ordered):
+        """把记录加入索引，ordered 为真时把新词项按顺序插入词表"""
+        doc_id = record.get('id')
+        if doc_id is None:
+            return
+        if doc_id in self._docs:
+            self.remove(self._docs[doc_id])
+
+        weights = {}
+        for field, weight in self.fields.items():
+            value = record.get(field)
+            if value is None or value == '':
+                continue
+            # 先在C实现的 Counter 中计数，再按字段权重累加
+            for term, count in Counter(field_terms(field, value)).items():
+                weights[term] = weights.get(term, 0) + count * weight
+
+        for term, weight in weights.items():
+            posting = self.postings.get(term)
+            if posting is None:
+                posting = self.postings[term] = {}
+                if ordered:
+                    bisect.insort(self.vocabulary, term)
+            posting[doc_id] = weight
+
+        self._doc_terms[doc_id] = list(weights)
+        self._docs[doc_id] = record
+        self._order[doc_id] = self._sequence
+        self._sequence += 1
+
+    def remove(self, record):
+        """把一条记录从索引中移除"""
+        doc_id = record.get('id')
+        if self._docs.get(doc_id) is not record:
+            return
+        for term in self._doc_terms.pop(doc_id):
+            posting = self.postings[term]
+            del posting[doc_id]
+            if not posting:
+                del self.postings[term]
+                del self.vocabulary[bisect.bisect_left(self.vocabulary, term)]
+        del self._docs[doc_id]
+        del self._order[doc_id]
+
+    def _expand_prefix(self, prefix):
+        """合并所有以指定前缀开头的词项的倒排表"""
+        merged = {}
+        start = bisect.bisect_left(self.vocabulary, prefix)
+        for term in self.vocabulary[start:start + MAX_PREFIX_EXPANSION]:
+            if not term.startswith(prefix):
+                break
+            for doc_id, weight in self.postings[term].items():
+                if weight > merged.get(doc_id, 0):
+                    merged[doc_id] = weight
+        return merged
+
+    def search(self, text):
+        """返回同时匹配所有查询词项的记录，按相关度从高到低排序"""
+        terms, prefix = query_terms(text)
+        if not terms:
+            return []
+
+        postings = [self.postings.get(term, {}) for term in dict.fromkeys(terms[:-1])]
+        if prefix:
+            postings.append(self._expand_prefix(terms[-1]))
+        elif terms[-1] not in terms[:-1]:
+            postings.append(self.postings.get(terms[-1], {}))
+        postings.sort(key=len)
+        if not postings[0]:
+            return []
+
+        # 从最短的倒排表开始求交集，代价只与匹配数量相关
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates.intersection_update(posting)
+            if not candidates:
+                return []
+
+        total = len(self._docs)
+        scores = dict.fromkeys(candidates, 0.0)
+        for posting in postings:
+            idf = math.log(1 + total / len(posting))
+            for doc_id in candidates:
+                scores[doc_id] += (1 + math.log(posting[doc_id])) * idf
+
+        ranked = sorted(candidates, key=lambda doc_id: (-scores[doc_id], self._order[doc_id]))
+        return [self._docs[doc_id] for doc_id in ranked]
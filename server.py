@@ -1,59 +1,514 @@
 #!/usr/bin/env python3
 """
 统一服务器，同时提供前端静态文件和后端API服务
+
+开发模式:  python server.py
+生产模式:  python server.py serve --workers 4 --bind 0.0.0.0:8000
+          （需要安装 gunicorn，也可以直接运行 gunicorn -w 4 -b 0.0.0.0:8000 server:app）
 """
 
-from flask import Flask, jsonify, request, send_from_directory
+from flask import Flask, Response, g, jsonify, request, send_file, send_from_directory
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
+from itertools import islice
+import argparse
+import atexit
+import contextlib
+import functools
+import hmac
 import json
 import os
+import shutil
+import tempfile
+import threading
+import time
 import uuid
 
+from bundle import build_bundle
+from bulk import RecordError, iter_lines, iter_request_records, iter_text
+from changes import ChangeLog
+from datastore import DataStore
+from facets import FacetIndex
+from hierarchy import HierarchyIndex
+from http_cache import ResponseCache, compress, compressor, etag_matches, make_etag, negotiate_encoding
+from metrics import Metrics, SamplingProfiler
+from name_index import NameIndex
+from relations import ForeignKeyIndex
+from ris import iter_ris_records
+from search_index import SearchIndex
+from spatial import GridIndex
+from static_assets import StaticAssets
+from sqlite_storage import SqliteSearch, SqliteStorage, export_json, migrate_json
+from storage import JournalStorage, JsonFileStorage, dumps_json
+
 # 创建Flask应用
 app = Flask(__name__)
-CORS(app)  # 允许跨域请求
+CORS(app, expose_headers=['X-Total-Count', 'X-Data-Version', 'ETag'])  # 允许跨域请求
+
+# 流式输出时每个数据块包含的记录数
+STREAM_CHUNK_SIZE = 200
+# /api/stats 中每个统计字段返回的取值数
+STATS_FACET_LIMIT = 10
+# /api/facets 未指定 limit 时每个字段返回的取值数
+FACET_LIMIT = 100
 
 # 数据文件路径
 LITERATURE_FILE = 'literature.json'
 TAXONOMY_FILE = 'taxonomy.json'
 SAMPLE_FILE = 'sample.json'
 
+# 存储方式：json 每次写入重写整个文件，journal 只追加日志并在后台压缩，sqlite 使用SQLite数据库
+STORAGE_MODE = os.environ.get('STORAGE_MODE', 'json')
+# 日志压缩的间隔（秒）
+COMPACT_INTERVAL = float(os.environ.get('COMPACT_INTERVAL', '30'))
+# SQLite数据库路径
+SQLITE_PATH = os.environ.get('SQLITE_PATH', 'data.sqlite3')
+# 静态文件压缩版本的缓存目录
+STATIC_CACHE_DIR = os.environ.get('STATIC_CACHE_DIR', '.static_cache')
+# 静态站点数据包的输出目录，前端从这里读取 manifest.json
+BUNDLE_DIR = os.environ.get('BUNDLE_DIR', 'bundle')
+# 生产模式的监听地址、工作进程数和每个进程的线程数
+WEB_BIND = os.environ.get('WEB_BIND', '0.0.0.0:8000')
+WEB_WORKERS = int(os.environ.get('WEB_WORKERS', str(os.cpu_count() or 1)))
+WEB_THREADS = int(os.environ.get('WEB_THREADS', '4'))
+# 变更日志文件及保留的变更条数，管理界面直接写数据文件时也追加到同一个日志
+CHANGES_FILE = os.environ.get('CHANGES_FILE', 'changes.log')
+CHANGE_LOG_RETAIN = int(os.environ.get('CHANGE_LOG_RETAIN', '10000'))
+# /api/changes 每页默认和最多返回的变更数
+CHANGES_PAGE_SIZE = 1000
+CHANGES_MAX_PAGE_SIZE = 10000
+# 学名自动补全默认和最多返回的条数
+SUGGEST_LIMIT = 10
+SUGGEST_MAX_LIMIT = 50
+# 事件流连接保持的最长秒数（之后客户端带着 Last-Event-ID 自动重连，不会长期占用工作线程）和心跳间隔
+CHANGE_STREAM_TIMEOUT = float(os.environ.get('CHANGE_STREAM_TIMEOUT', '300'))
+CHANGE_STREAM_KEEPALIVE = 15
+# 事件流断开后浏览器重连前等待的毫秒数
+CHANGE_STREAM_RETRY_MS = 3000
+# 多个工作进程共享指标的目录，未设置时生产模式使用临时目录，开发模式只统计本进程
+METRICS_DIR = os.environ.get('METRICS_DIR', '')
+# 耗时达到这个毫秒数的请求保存采样调用栈，0表示关闭采样分析器；也可以通过 /metrics/profile 随时开关
+PROFILE_SLOW_MS = float(os.environ.get('PROFILE_SLOW_MS', '0'))
+PROFILE_DIR = os.environ.get('PROFILE_DIR', 'profiles')
+PROFILE_INTERVAL_MS = float(os.environ.get('PROFILE_INTERVAL_MS', '5'))
+# 修改采样设置时 Authorization: Bearer 需要提供的令牌；未设置时只接受来自本机的修改
+PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN', '')
+# 响应体缓存的字节预算（MB），每个工作进程各有一份
+RESPONSE_CACHE_MB = float(os.environ.get('RESPONSE_CACHE_MB', '256'))
+
+# 按 (ETag, 压缩方式) 缓存编码和压缩后的响应体，总大小不超过字节预算
+response_cache = ResponseCache(int(RESPONSE_CACHE_MB * 1024 * 1024))
+
+# 请求和各处理阶段的指标，以及慢请求的采样分析器
+metrics = Metrics(METRICS_DIR or None)
+profiler = SamplingProfiler(PROFILE_DIR, PROFILE_SLOW_MS, PROFILE_INTERVAL_MS / 1000)
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """jsonify 使用与数据文件相同的编码器（安装了 orjson 时更快），序列化耗时计入 serialize 阶段"""
+
+    def dumps(self, obj, **kwargs):
+        with metrics.phase('serialize'):
+            if kwargs.get('indent'):
+                return super().dumps(obj, **kwargs)
+            return dumps_json(obj, sort_keys=self.sort_keys).decode('utf-8')
+
+
+app.json = TimedJSONProvider(app)
+
+
+STORAGE_CLASSES = {
+    'json': JsonFileStorage,
+    'journal': JournalStorage,
+}
+
+# 各集合的数据文件、ID前缀、必需字段、全文索引字段权重（标题和名称的匹配排在前面）、需要建索引的外键字段以及统计取值分布的字段
+# 完整的ID在搜索时按ID索引精确匹配，全文索引只收录ID的类型前缀，其中的UUID片段不进入词表
+COLLECTIONS = {
+    'literature': {
+        'file': LITERATURE_FILE,
+        'id_prefix': 'LIT',
+        'required': ('title', '标题不能为空'),
+        'search': {'id': 1, 'title': 4, 'authors': 2, 'journal': 2, 'year': 1, 'doi': 1, 'abstract': 1},
+        'keys': [],
+        'facets': ['year', 'is_oa'],
+    },
+    'taxonomy': {
+        'file': TAXONOMY_FILE,
+        'id_prefix': 'TAX',
+        'required': ('name', '分类名称不能为空'),
+        'search': {'id': 1, 'name': 4, 'level': 2, 'type': 2, 'lit_id': 1, 'description': 1},
+        'keys': ['lit_id', 'parent_tax_id'],
+        'facets': ['level', 'type'],
+    },
+    'samples': {
+        'file': SAMPLE_FILE,
+        'id_prefix': 'SMP',
+        'required': ('tax_id', '分类ID不能为空'),
+        'search': {'id': 1, 'tax_id': 2, 'collector': 3, 'latitude': 1, 'longitude': 1, 'description': 1},
+        'keys': ['tax_id'],
+        'facets': ['tax_id', 'collector'],
+    },
+}
+
+
+def create_storage(name):
+    """按当前存储方式创建集合的存储后端，读取和写入的耗时分别计入 load 和 persist 阶段"""
+    config = COLLECTIONS[name]
+    if STORAGE_MODE == 'sqlite':
+        storage = SqliteStorage(SQLITE_PATH, name, config['search'])
+    else:
+        storage = STORAGE_CLASSES[STORAGE_MODE](config['file'])
+    return metrics.instrument(storage, load='load', read_changes='load', write='persist', compact='persist')
+
+
+# 所有写入按顺序编号的变更日志，供镜像和客户端增量同步
+change_log = metrics.instrument(ChangeLog(CHANGES_FILE, CHANGE_LOG_RETAIN), append='persist')
+
+# 进程内共享的数据仓库，文件只在变化时重新加载
+store = DataStore({name: create_storage(name) for name in COLLECTIONS}, change_log)
+
+for name, config in COLLECTIONS.items():
+    collection = store[name]
+    if STORAGE_MODE == 'sqlite':
+        collection.set_search_index(SqliteSearch(collection.storage))
+    else:
+        collection.set_search_index(SearchIndex(config['search']))
+
+# 静态文件清单，提供预压缩版本和按内容哈希的长期缓存
+# 集合的数据文件和数据包随写入和导出变化，不预先压缩
+static_assets = StaticAssets('.', STATIC_CACHE_DIR,
+                             [config['file'] for config in COLLECTIONS.values()] + [BUNDLE_DIR])
+
+# 分类之间通过 parent_tax_id 形成的关系索引
+taxonomy_hierarchy = store['taxonomy'].add_index(HierarchyIndex())
+# 学名自动补全的前缀和三元组索引
+taxon_names = store['taxonomy'].add_index(NameIndex())
+# 外键反向索引：文献 → 引用它的分类，分类 → 它的样本
+taxa_by_literature = store['taxonomy'].add_index(ForeignKeyIndex('lit_id'))
+samples_by_taxon = store['samples'].add_index(ForeignKeyIndex('tax_id'))
+# 样本坐标的网格空间索引
+sample_locations = store['samples'].add_index(GridIndex())
+# 各集合的记录数和取值分布，随写入增量维护
+facet_indexes = {name: store[name].add_index(FacetIndex(config['facets'])) for name, config in COLLECTIONS.items()}
+# 加载后重建索引的耗时计入 index 阶段，查询仍直接使用上面的索引对象
+for collection in store.collections.values():
+    collection.indexes = [metrics.instrument(index, rebuild='index') for index in collection.indexes]
+
+if STORAGE_MODE == 'journal':
+    atexit.register(store.stop_compaction)
+
+
+@app.before_request
+def start_background_tasks():
+    """每个工作进程在处理请求时确保自己的后台压缩线程已经启动"""
+    if STORAGE_MODE == 'journal':
+        store.start_compaction(COMPACT_INTERVAL)
+
+
+@app.before_request
+def begin_request_metrics():
+    """记下请求的开始时间和路由，采样分析器开启时开始采样当前线程"""
+    g.metrics_started = time.perf_counter()
+    metrics.begin_request(request.url_rule.rule if request.url_rule else 'unmatched')
+    g.profiling = profiler.enabled
+    if g.profiling:
+        profiler.start(threading.get_ident())
+
+
+def count_bytes(chunks, sizes):
+    """统计流式响应实际发送的字节数"""
+    for chunk in chunks:
+        sizes[0] += len(chunk)
+        yield chunk
+
+
+@app.after_request
+def track_response(response):
+    """响应体发送完毕后记录延迟和大小，流式响应的耗时包含逐块序列化和发送的时间"""
+    started = g.get('metrics_started')
+    if started is None:
+        return response
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    method = request.method
+    request_size = request.content_length
+    profiling = g.get('profiling')
+    ident = threading.get_ident()
+
+    sizes = None
+    if response.is_streamed and not response.direct_passthrough:
+        sizes = [0]
+        response.response = count_bytes(response.response, sizes)
+
+    def finish():
+        seconds = time.perf_counter() - started
+        response_size = sizes[0] if sizes is not None else response.content_length
+        metrics.end_request(route, method, response.status_code, seconds, request_size, response_size)
+        if not profiling:
+            return
+        samples = profiler.stop(ident)
+        # 事件流连接总是持续很久，不属于慢请求
+        if samples and seconds * 1000 >= profiler.slow_ms and response.mimetype != 'text/event-stream':
+            profiler.dump(f'{method} {route}', seconds, samples)
+            metrics.inc('app_slow_request_profiles_total', (('route', route),))
+
+    response.call_on_close(finish)
+    return response
+
+
+def prepare_record(name, data):
+    """如果没有提供ID则生成新的UUID，并验证必需字段，返回错误信息，验证通过时返回None"""
+    if not isinstance(data, dict):
+        return '记录必须是JSON对象'
+
+    config = COLLECTIONS[name]
+    if not data.get('id'):
+        data['id'] = f"{config['id_prefix']}-{str(uuid.uuid4())}"
+
+    field, message = config['required']
+    if not data.get(field):
+        return message
+    return None
 
-def load_json_data(file_path):
-    """加载JSON数据文件"""
-    if os.path.exists(file_path):
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    return []
 
+def check_parent(data, pending=None):
+    """检查分类的 parent_tax_id 是否会形成循环引用，pending 记录同一批次中尚未写入的父子关系"""
+    if taxonomy_hierarchy.would_create_cycle(data['id'], data.get('parent_tax_id'), pending):
+        return '继承的TAXid会形成循环引用'
+    if pending is not None:
+        pending[data['id']] = data.get('parent_tax_id')
+    return None
 
-def save_json_data(file_path, data):
-    """保存数据到JSON文件"""
-    with open(file_path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+
+def parse_floats(value, count, name):
+    """解析逗号分隔的数字参数"""
+    try:
+        numbers = [float(part) for part in value.split(',')]
+    except ValueError:
+        numbers = []
+    if len(numbers) != count:
+        raise ValueError(f'{name}参数必须是{count}个逗号分隔的数字')
+    return numbers
+
+
+def spatial_query(args):
+    """根据 bbox=最小经度,最小纬度,最大经度,最大纬度 或 near=纬度,经度&radius_km= 生成空间查询，返回 (查询函数, 是否按距离排序)"""
+    if args.get('bbox'):
+        min_lon, min_lat, max_lon, max_lat = parse_floats(args['bbox'], 4, 'bbox')
+        if min_lat > max_lat:
+            raise ValueError('bbox的最小纬度不能大于最大纬度')
+        return (lambda: sample_locations.within_bbox(min_lon, min_lat, max_lon, max_lat)), False
+    if args.get('near'):
+        lat, lon = parse_floats(args['near'], 2, 'near')
+        try:
+            radius_km = float(args.get('radius_km', ''))
+        except ValueError:
+            raise ValueError('near查询需要数字类型的radius_km参数') from None
+        if radius_km < 0:
+            raise ValueError('radius_km不能为负数')
+        return (lambda: sample_locations.near(lat, lon, radius_km)), True
+    return None, False
+
+
+def in_collection_order(collection, records):
+    """把索引查询出的记录按集合中的原有顺序排列"""
+    return sorted(records, key=lambda item: collection.positions.get(item.get('id'), 0))
+
+
+def versioned(response, collection):
+    """在响应头中附带集合的版本号"""
+    response.headers['X-Data-Version'] = str(collection.version)
+    return response
+
+
+def tee_into_cache(chunks, key, kept, names):
+    """边发送边收集流式响应体，发送完毕且没有超过单个条目的上限时放入缓存"""
+    collected = []
+    size = 0
+    for chunk in chunks:
+        if collected is not None:
+            size += len(chunk)
+            if size > response_cache.max_entry_bytes:
+                collected = None
+            else:
+                collected.append(chunk)
+        yield chunk
+    if collected is not None:
+        response_cache.put(key, (b''.join(collected), kept), size, names)
+
+
+def iter_compressed(chunks, encoding):
+    """逐块压缩流式响应体，不需要先在内存中拼出完整的响应体；只有压缩的时间计入 compress 阶段"""
+    process, finish = compressor(encoding)
+    spent = 0.0
+    for chunk in chunks:
+        started = time.perf_counter()
+        data = process(chunk)
+        spent += time.perf_counter() - started
+        if data:
+            yield data
+    started = time.perf_counter()
+    data = finish()
+    metrics.record_phase('compress', spent + time.perf_counter() - started)
+    if data:
+        yield data
+
+
+def cached_get(*names):
+    """为只读GET路由提供ETag条件请求和响应体缓存，names 为响应所依赖的集合
+
+    缓存以ETag（包含各集合的数据状态）为键，保存编码后的响应体及其压缩版本，数据变化后相关条目立即失效；
+    ETag 来自磁盘数据的状态，在多个工作进程之间一致，因此不再提供按进程内修改时间生成、精度只有1秒的 Last-Modified
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            collections = [store[name] for name in names]
+            states = [(collection.name, collection.state()) for collection in collections]
+            etag = make_etag(request.path, sorted(request.args.items(multi=True)), states)
+            headers = {'ETag': f'"{etag}"', 'Vary': 'Accept-Encoding'}
+
+            # 数据没有变化时直接返回304，不执行查询也不序列化
+            if etag_matches(request.headers.get('If-None-Match'), etag):
+                return Response(status=304, headers=headers)
+
+            for collection, (_, state) in zip(collections, states):
+                response_cache.track(collection.name, state)
+            encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+            cached = response_cache.get((etag, encoding))
+            metrics.inc('app_response_cache_total', (('result', 'miss' if cached is None else 'hit'),))
+            if cached is None:
+                # 整个集合和单条记录总是缓存，带查询参数的结果第二次请求时（或未压缩的版本已在缓存中时）才缓存
+                identity = response_cache.get((etag, None)) if encoding else None
+                keep = not request.args or identity is not None or response_cache.admit(etag)
+                if identity is None:
+                    response = app.make_response(view(*args, **kwargs))
+                    if response.status_code != 200:
+                        return response
+                    kept = [(key, value) for key, value in response.headers.items()
+                            if key not in ('Content-Length', 'ETag')]
+                    if encoding is None:
+                        response.headers.update(headers)
+                        if keep and response.is_streamed:
+                            response.response = tee_into_cache(response.response, (etag, None), kept, names)
+                        elif keep:
+                            data = response.get_data()
+                            response_cache.put((etag, None), (data, kept), len(data), names)
+                        return response
+                    if response.is_streamed:
+                        # 流式响应边生成边压缩，发送完毕且不超过单个条目的上限时才放入缓存
+                        chunks = response.response
+                        if keep:
+                            chunks = tee_into_cache(chunks, (etag, None), kept, names)
+                        chunks = iter_compressed(chunks, encoding)
+                        if keep:
+                            chunks = tee_into_cache(chunks, (etag, encoding), kept, names)
+                        response.response = chunks
+                        response.headers.update(headers)
+                        response.headers['Content-Encoding'] = encoding
+                        response.headers['ETag'] = f'"{etag}-{encoding}"'
+                        return response
+                    identity = (response.get_data(), kept)
+                    if keep:
+                        response_cache.put((etag, None), identity, len(identity[0]), names)
+
+                data, kept = identity
+                with metrics.phase('compress'):
+                    body = compress(data, encoding)
+                cached = (body, kept)
+                if keep:
+                    response_cache.put((etag, encoding), cached, len(body), names)
+
+            body, kept = cached
+            response = Response(body, headers=kept)
+            response.headers.update(headers)
+            if encoding:
+                response.headers['Content-Encoding'] = encoding
+                response.headers['ETag'] = f'"{etag}-{encoding}"'
+            return response
+        return wrapper
+    return decorator
+
+
+def iter_json_array(records, fields=None):
+    """把记录逐块编码为JSON数组，内存占用与集合大小无关；只有编码的时间计入 serialize 阶段，不含等待发送的时间"""
+    yield b'['
+    chunk = []
+    separator = b''
+    spent = 0.0
+    started = time.perf_counter()
+    for record in records:
+        if fields:
+            record = {field: record[field] for field in fields if field in record}
+        chunk.append(record)
+        if len(chunk) >= STREAM_CHUNK_SIZE:
+            # 整块编码后去掉外层的方括号，比逐条编码少很多次函数调用
+            data = separator + dumps_json(chunk)[1:-1]
+            separator = b','
+            spent += time.perf_counter() - started
+            yield data
+            started = time.perf_counter()
+            chunk = []
+    if chunk:
+        data = separator + dumps_json(chunk)[1:-1]
+        spent += time.perf_counter() - started
+        yield data
+    else:
+        spent += time.perf_counter() - started
+    metrics.record_phase('serialize', spent)
+    yield b']'
+
+
+def collection_response(collection, records):
+    """按 limit/offset 分页、按 fields 投影字段，并以流式JSON数组返回"""
+    try:
+        offset = max(int(request.args.get('offset') or 0), 0)
+        limit = request.args.get('limit')
+        limit = max(int(limit), 0) if limit else None
+    except ValueError:
+        return jsonify({'error': 'limit和offset必须是整数'}), 400
+
+    fields = [field.strip() for field in request.args.get('fields', '').split(',') if field.strip()]
+    # records 可能就是集合的内存列表，在锁内复制出这一页，之后的写入不会让流式输出跳过或重复记录
+    with collection.locked():
+        page = list(islice(records, offset, None if limit is None else offset + limit))
+        total = len(records)
+        version = collection.version
+
+    # 生成器不依赖请求上下文，参数已在此之前解析完毕
+    response = Response(iter_json_array(page, fields), mimetype='application/json')
+    response.headers['X-Total-Count'] = str(total)
+    response.headers['X-Data-Version'] = str(version)
+    return response
 
 
 # API路由
 @app.route('/api/literature', methods=['GET'])
+@cached_get('literature')
 def get_literature():
     """获取所有文献数据"""
-    literature_data = load_json_data(LITERATURE_FILE)
+    collection = store['literature']
     
-    # 处理搜索查询参数
-    search_term = request.args.get('search', '').lower()
-    if search_term:
-        literature_data = [
-            item for item in literature_data
-            if search_term in item.get('id', '').lower() or
-               search_term in item.get('title', '').lower() or
-               search_term in item.get('authors', '').lower() or
-               search_term in item.get('journal', '').lower() or
-               search_term in item.get('year', '').lower() or
-               search_term in item.get('doi', '').lower() or
-               search_term in item.get('abstract', '').lower()
-        ]
+    # 处理搜索查询参数，通过倒排索引按相关度返回结果
+    search_term = request.args.get('search', '')
+    with metrics.phase('filter'):
+        if search_term.strip():
+            literature_data = collection.search(search_term)
+        else:
+            literature_data = collection.all()
     
-    return jsonify(literature_data)
+    return collection_response(collection, literature_data)
+
+
+@app.route('/api/literature/<record_id>', methods=['GET'])
+@cached_get('literature')
+def get_literature_item(record_id):
+    """按ID获取单条文献"""
+    collection = store['literature']
+    item = collection.get(record_id)
+    if item is None:
+        return jsonify({'error': '文献不存在'}), 404
+    return versioned(jsonify(item), collection)
 
 
 @app.route('/api/literature', methods=['POST'])
@@ -61,47 +516,107 @@ def add_literature():
     """添加新的文献"""
     data = request.get_json()
     
-    # 如果没有提供ID，则生成一个新的UUID
-    if not data.get('id'):
-        data['id'] = f"LIT-{str(uuid.uuid4())}"
-    
-    # 验证必需字段
-    if not data.get('title'):
-        return jsonify({'error': '标题不能为空'}), 400
-    
-    literature_data = load_json_data(LITERATURE_FILE)
+    # 生成缺失的ID并验证必需字段
+    error = prepare_record('literature', data)
+    if error:
+        return jsonify({'error': error}), 400
     
-    # 检查是否已存在相同ID的文献
-    for i, lit in enumerate(literature_data):
-        if lit.get('id') == data.get('id'):
-            literature_data[i] = data
-            break
-    else:
-        literature_data.append(data)
-    
-    save_json_data(LITERATURE_FILE, literature_data)
-    return jsonify(data), 201
+    collection = store['literature']
+    collection.upsert(data)
+    return versioned(jsonify(data), collection), 201
 
 
 @app.route('/api/taxonomy', methods=['GET'])
+@cached_get('taxonomy')
 def get_taxonomy():
     """获取所有分类数据"""
-    taxonomy_data = load_json_data(TAXONOMY_FILE)
+    collection = store['taxonomy']
     
-    # 处理搜索查询参数
-    search_term = request.args.get('search', '').lower()
-    if search_term:
-        taxonomy_data = [
-            item for item in taxonomy_data
-            if search_term in item.get('id', '').lower() or
-               search_term in item.get('name', '').lower() or
-               search_term in item.get('level', '').lower() or
-               search_term in item.get('type', '').lower() or
-               search_term in item.get('lit_id', '').lower() or
-               search_term in item.get('description', '').lower()
-        ]
+    with collection.locked(), metrics.phase('filter'):
+        # 处理搜索查询参数，通过倒排索引按相关度返回结果
+        search_term = request.args.get('search', '')
+        lit_id = request.args.get('lit_id')
+        if search_term.strip():
+            taxonomy_data = collection.search(search_term)
+            if lit_id:
+                taxonomy_data = [item for item in taxonomy_data if item.get('lit_id') == lit_id]
+        elif lit_id:
+            # 按文献过滤时直接使用外键索引
+            taxonomy_data = in_collection_order(collection, taxa_by_literature.lookup(lit_id))
+        else:
+            taxonomy_data = collection.all()
     
-    return jsonify(taxonomy_data)
+    return collection_response(collection, taxonomy_data)
+
+
+@app.route('/api/taxonomy/suggest', methods=['GET'])
+@cached_get('taxonomy')
+def suggest_taxonomy():
+    """按学名自动补全，容忍拼写错误，结果按编辑距离和分类等级排序"""
+    collection = store['taxonomy']
+    try:
+        limit = min(max(int(request.args.get('limit') or SUGGEST_LIMIT), 1), SUGGEST_MAX_LIMIT)
+    except ValueError:
+        return jsonify({'error': 'limit必须是整数'}), 400
+
+    with collection.locked(), metrics.phase('filter'):
+        suggestions = [{'id': record.get('id'), 'name': record.get('name'), 'level': record.get('level'),
+                        'distance': distance}
+                       for record, distance in taxon_names.suggest(request.args.get('q', ''), limit)]
+    return versioned(jsonify(suggestions), collection)
+
+
+@app.route('/api/taxonomy/<record_id>', methods=['GET'])
+@cached_get('taxonomy')
+def get_taxonomy_item(record_id):
+    """按ID获取单条分类"""
+    collection = store['taxonomy']
+    item = collection.get(record_id)
+    if item is None:
+        return jsonify({'error': '分类不存在'}), 404
+    return versioned(jsonify(item), collection)
+
+
+@app.route('/api/taxonomy/<record_id>/<any(ancestors, descendants, synonyms):relation>', methods=['GET'])
+@cached_get('taxonomy')
+def get_taxonomy_relation(record_id, relation):
+    """获取分类的祖先链（由近及远）、全部后代或同义名"""
+    collection = store['taxonomy']
+    with collection.locked(), metrics.phase('filter'):
+        if collection.get(record_id) is None:
+            return jsonify({'error': '分类不存在'}), 404
+        related = getattr(taxonomy_hierarchy, relation)(record_id)
+    return collection_response(collection, related)
+
+
+@app.route('/api/taxonomy/<record_id>/full', methods=['GET'])
+@cached_get('taxonomy', 'literature', 'samples')
+def get_taxonomy_full(record_id):
+    """一次返回分类及其描述文献、父分类链、子分类、同义名和全部样本，代价只与结果大小相关"""
+    taxonomy = store['taxonomy']
+    with taxonomy.locked(), metrics.phase('filter'):
+        taxon = taxonomy.get(record_id)
+        if taxon is None:
+            return jsonify({'error': '分类不存在'}), 404
+        ancestors = taxonomy_hierarchy.ancestors(record_id)
+        children = taxonomy_hierarchy.children_of(record_id)
+        synonyms = taxonomy_hierarchy.synonyms(record_id)
+
+    literature = store['literature'].get(taxon['lit_id']) if taxon.get('lit_id') else None
+
+    samples = store['samples']
+    with samples.locked(), metrics.phase('filter'):
+        sample_data = in_collection_order(samples, samples_by_taxon.lookup(record_id))
+
+    return versioned(jsonify({
+        'taxon': taxon,
+        'literature': literature,
+        'parent': ancestors[0] if ancestors else None,
+        'ancestors': ancestors,
+        'children': children,
+        'synonyms': synonyms,
+        'samples': sample_data,
+    }), taxonomy)
 
 
 @app.route('/api/taxonomy', methods=['POST'])
@@ -109,47 +624,67 @@ def add_taxonomy():
     """添加新的分类"""
     data = request.get_json()
     
-    # 如果没有提供ID，则生成一个新的UUID
-    if not data.get('id'):
-        data['id'] = f"TAX-{str(uuid.uuid4())}"
-    
-    # 验证必需字段
-    if not data.get('name'):
-        return jsonify({'error': '分类名称不能为空'}), 400
-    
-    taxonomy_data = load_json_data(TAXONOMY_FILE)
-    
-    # 检查是否已存在相同ID的分类
-    for i, tax in enumerate(taxonomy_data):
-        if tax.get('id') == data.get('id'):
-            taxonomy_data[i] = data
-            break
-    else:
-        taxonomy_data.append(data)
-    
-    save_json_data(TAXONOMY_FILE, taxonomy_data)
-    return jsonify(data), 201
+    # 生成缺失的ID并验证必需字段，循环引用检查与写入在同一把写入锁内完成
+    collection = store['taxonomy']
+    with collection.writing():
+        error = prepare_record('taxonomy', data) or check_parent(data)
+        if error:
+            return jsonify({'error': error}), 400
+        collection.upsert(data)
+    return versioned(jsonify(data), collection), 201
 
 
 @app.route('/api/samples', methods=['GET'])
+@cached_get('samples')
 def get_samples():
     """获取所有样本数据"""
-    sample_data = load_json_data(SAMPLE_FILE)
+    collection = store['samples']
+    try:
+        spatial, by_distance = spatial_query(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    # 处理搜索查询参数
-    search_term = request.args.get('search', '').lower()
-    if search_term:
-        sample_data = [
-            item for item in sample_data
-            if search_term in item.get('id', '').lower() or
-               search_term in item.get('tax_id', '').lower() or
-               search_term in item.get('collector', '').lower() or
-               search_term in str(item.get('latitude', '')).lower() or
-               search_term in str(item.get('longitude', '')).lower() or
-               search_term in item.get('description', '').lower()
-        ]
+    with collection.locked(), metrics.phase('filter'):
+        # 处理搜索查询参数，通过倒排索引按相关度返回结果
+        search_term = request.args.get('search', '')
+        if search_term.strip():
+            sample_data = collection.search(search_term)
+        else:
+            sample_data = collection.all()
+        
+        # 处理空间查询参数，半径查询按距离排序，矩形查询保持相关度或原有顺序
+        if spatial is not None:
+            nearby = spatial()
+            if search_term.strip() and by_distance:
+                matched = {id(item) for item in sample_data}
+                sample_data = [item for item in nearby if id(item) in matched]
+            elif search_term.strip():
+                matched = {id(item) for item in nearby}
+                sample_data = [item for item in sample_data if id(item) in matched]
+            elif by_distance:
+                sample_data = nearby
+            else:
+                sample_data = in_collection_order(collection, nearby)
+        
+        # 只按分类过滤时直接使用外键索引，与搜索或空间查询组合时在其结果上过滤
+        tax_id = request.args.get('tax_id')
+        if tax_id and not search_term.strip() and spatial is None:
+            sample_data = in_collection_order(collection, samples_by_taxon.lookup(tax_id))
+        elif tax_id:
+            sample_data = [item for item in sample_data if item.get('tax_id') == tax_id]
     
-    return jsonify(sample_data)
+    return collection_response(collection, sample_data)
+
+
+@app.route('/api/samples/<record_id>', methods=['GET'])
+@cached_get('samples')
+def get_sample_item(record_id):
+    """按ID获取单条样本"""
+    collection = store['samples']
+    item = collection.get(record_id)
+    if item is None:
+        return jsonify({'error': '样本不存在'}), 404
+    return versioned(jsonify(item), collection)
 
 
 @app.route('/api/samples', methods=['POST'])
@@ -157,26 +692,82 @@ def add_sample():
     """添加新的样本"""
     data = request.get_json()
     
-    # 如果没有提供ID，则生成一个新的UUID
-    if not data.get('id'):
-        data['id'] = f"SMP-{str(uuid.uuid4())}"
-    
-    # 验证必需字段
-    if not data.get('tax_id'):
-        return jsonify({'error': '分类ID不能为空'}), 400
-    
-    sample_data = load_json_data(SAMPLE_FILE)
+    # 生成缺失的ID并验证必需字段
+    error = prepare_record('samples', data)
+    if error:
+        return jsonify({'error': error}), 400
     
-    # 检查是否已存在相同ID的样本
-    for i, sample in enumerate(sample_data):
-        if sample.get('id') == data.get('id'):
-            sample_data[i] = data
-            break
-    else:
-        sample_data.append(data)
-    
-    save_json_data(SAMPLE_FILE, sample_data)
-    return jsonify(data), 201
+    collection = store['samples']
+    collection.upsert(data)
+    return versioned(jsonify(data), collection), 201
+
+
+@app.route('/api/<any(literature, taxonomy, samples):name>/<record_id>', methods=['DELETE'])
+def delete_record(name, record_id):
+    """按ID删除一条记录，返回被删除的记录"""
+    collection = store[name]
+    item = collection.delete(record_id)
+    if item is None:
+        return jsonify({'error': '记录不存在'}), 404
+    return versioned(jsonify(item), collection)
+
+
+def import_records(name, items):
+    """逐条校验流式解析出的记录后一次性写入，返回导入报告"""
+    started = time.perf_counter()
+    valid = []
+    errors = []
+    received = 0
+    pending_parents = {}
+    collection = store[name]
+
+    # 读取请求体和逐条校验期间不持有任何锁，上传再慢也不会阻塞其他请求和其他进程的写入
+    try:
+        for index, data in enumerate(items):
+            received += 1
+            error = str(data) if isinstance(data, RecordError) else prepare_record(name, data)
+            if error:
+                errors.append({'index': index, 'error': error})
+            else:
+                valid.append((index, data))
+    except ValueError as e:
+        return jsonify({'error': str(e), 'received': received}), 400
+
+    # 分类的循环引用检查依赖已有数据，和写入一起在写入锁内进行
+    with collection.writing() if name == 'taxonomy' else contextlib.nullcontext():
+        if name == 'taxonomy':
+            checked = []
+            for index, data in valid:
+                error = check_parent(data, pending_parents)
+                if error:
+                    errors.append({'index': index, 'error': error})
+                else:
+                    checked.append((index, data))
+            valid = checked
+            errors.sort(key=lambda error: error['index'])
+        valid = [data for _, data in valid]
+        created, updated = collection.upsert_many(valid)
+    elapsed = time.perf_counter() - started
+    return versioned(jsonify({
+        'received': received,
+        'created': created,
+        'updated': updated,
+        'errors': errors,
+        'seconds': round(elapsed, 3),
+        'rows_per_sec': round(len(valid) / elapsed, 1) if elapsed > 0 else None,
+    }), collection)
+
+
+@app.route('/api/<any(literature, taxonomy, samples):name>/bulk', methods=['POST'])
+def bulk_import(name):
+    """批量导入NDJSON或JSON数组，逐条校验后一次性写入"""
+    return import_records(name, iter_request_records(request.stream))
+
+
+@app.route('/api/literature/ris', methods=['POST'])
+def import_literature_ris():
+    """流式导入RIS/EndNote导出文件中的全部文献"""
+    return import_records('literature', iter_ris_records(iter_lines(iter_text(request.stream))))
 
 
 @app.route('/api/generate-id/<item_type>', methods=['GET'])
@@ -193,31 +784,323 @@ def generate_id(item_type):
 
 
 @app.route('/api/stats', methods=['GET'])
+@cached_get('literature', 'taxonomy', 'samples')
 def get_stats():
-    """获取统计数据"""
-    literature_count = len(load_json_data(LITERATURE_FILE))
-    taxonomy_count = len(load_json_data(TAXONOMY_FILE))
-    sample_count = len(load_json_data(SAMPLE_FILE))
-    
+    """获取统计数据，计数和取值分布都来自增量维护的统计索引"""
+    counts = {}
+    facets = {}
+    for name in COLLECTIONS:
+        with store[name].locked():
+            counts[name] = facet_indexes[name].total
+            facets[name] = facet_indexes[name].summary(STATS_FACET_LIMIT)
+
     return jsonify({
-        'literature_count': literature_count,
-        'taxonomy_count': taxonomy_count,
-        'sample_count': sample_count
+        'literature_count': counts['literature'],
+        'taxonomy_count': counts['taxonomy'],
+        'sample_count': counts['samples'],
+        'facets': facets,
+    })
+
+
+@app.route('/api/facets', methods=['GET'])
+@app.route('/api/facets/<any(literature, taxonomy, samples):name>', methods=['GET'])
+@cached_get('literature', 'taxonomy', 'samples')
+def get_facets(name=None):
+    """获取取值分布，可以用 field 指定字段、limit 指定每个字段返回的取值数（默认 FACET_LIMIT）"""
+    try:
+        limit = request.args.get('limit')
+        limit = max(int(limit), 0) if limit else FACET_LIMIT
+    except ValueError:
+        return jsonify({'error': 'limit必须是整数'}), 400
+
+    names = [name] if name else list(COLLECTIONS)
+    field = request.args.get('field')
+    if field and not all(field in COLLECTIONS[item]['facets'] for item in names):
+        return jsonify({'error': f'不支持统计的字段: {field}'}), 400
+
+    result = {}
+    for item in names:
+        index = facet_indexes[item]
+        with store[item].locked():
+            facets = {field: index.facet(field, limit)} if field else index.summary(limit)
+            result[item] = {'count': index.total, 'facets': facets}
+    return jsonify(result[name] if name else result)
+
+
+def parse_changes_args(since, name, default_since):
+    """解析变更查询的游标和集合名称"""
+    try:
+        since = int(since or default_since)
+    except ValueError:
+        raise ValueError('since必须是整数') from None
+    if name and name not in COLLECTIONS:
+        raise ValueError('不支持的集合')
+    return since, name or None
+
+
+@app.route('/api/changes', methods=['GET'])
+def get_changes():
+    """返回游标 since 之后的增删改，下一次请求使用响应中的 cursor
+
+    reset 为 true 表示游标已过期（或属于另一份日志），客户端应先记下 cursor 再重新下载全部数据
+    """
+    try:
+        since, name = parse_changes_args(request.args.get('since'), request.args.get('collection'), 0)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        limit = min(max(int(request.args.get('limit') or CHANGES_PAGE_SIZE), 1), CHANGES_MAX_PAGE_SIZE)
+    except ValueError:
+        return jsonify({'error': 'limit必须是整数'}), 400
+
+    changes, cursor, reset = change_log.since(since, limit, name)
+    return jsonify({
+        'since': since,
+        'cursor': cursor,
+        'latest': change_log.last_seq,
+        'reset': reset,
+        'more': cursor < change_log.last_seq,
+        'changes': changes,
+    })
+
+
+def format_event(event, event_id, data):
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.route('/api/changes/stream', methods=['GET'])
+def stream_changes():
+    """以 server-sent events 推送变更，断线重连时浏览器通过 Last-Event-ID 从上次的位置继续
+
+    没有指定 since 时只推送连接之后的变更；游标过期时先推送 reset 事件，其 id 为新的游标
+    """
+    change_log.refresh()
+    try:
+        since, name = parse_changes_args(request.headers.get('Last-Event-ID') or request.args.get('since'),
+                                         request.args.get('collection'), change_log.last_seq)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    def events():
+        cursor = since
+        deadline = time.monotonic() + CHANGE_STREAM_TIMEOUT
+        yield f'retry: {CHANGE_STREAM_RETRY_MS}\n\n'
+        while True:
+            changes, cursor_after, reset = change_log.since(cursor, CHANGES_PAGE_SIZE, name)
+            if reset:
+                yield format_event('reset', cursor_after, {'cursor': cursor_after})
+            for entry in changes:
+                yield format_event('change', entry['seq'], entry)
+            cursor = cursor_after
+            if cursor < change_log.last_seq:
+                continue
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            if not change_log.wait(cursor, min(CHANGE_STREAM_KEEPALIVE, remaining)):
+                yield ': keepalive\n\n'
+
+    return Response(events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """以Prometheus文本格式输出请求、阶段耗时和数据规模指标"""
+    if metrics.directory:
+        metrics.save()
+    # 只报告已经加载的数据，抓取指标不会触发加载
+    gauges = [
+        ('app_collection_records', '集合在本进程中的记录数',
+         [((('collection', name),), len(store[name].records)) for name in COLLECTIONS]),
+        ('app_collection_version', '集合在本进程中的版本号',
+         [((('collection', name),), store[name].version) for name in COLLECTIONS]),
+        ('app_change_log_sequence', '变更日志的最新序号', [((), change_log.last_seq)]),
+        ('app_response_cache_bytes', '本进程响应体缓存占用的字节数', [((), response_cache.size)]),
+        ('app_response_cache_entries', '本进程响应体缓存的条目数', [((), len(response_cache))]),
+    ]
+    return Response(metrics.render(gauges), mimetype='text/plain; version=0.0.4')
+
+
+def profile_authorized():
+    """设置了 PROFILE_TOKEN 时校验请求携带的令牌，否则只允许本机请求"""
+    if PROFILE_TOKEN:
+        scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+        return scheme.lower() == 'bearer' and hmac.compare_digest(token.encode(), PROFILE_TOKEN.encode())
+    return request.remote_addr in ('127.0.0.1', '::1')
+
+
+@app.route('/metrics/profile', methods=['GET', 'POST'])
+def profile_settings():
+    """查看或修改采样分析器的设置，POST {"slow_ms": 200} 开启，{"slow_ms": 0} 关闭
+
+    多进程运行时只修改处理该请求的进程，需要所有进程生效时使用 PROFILE_SLOW_MS 环境变量；
+    修改需要 PROFILE_TOKEN 令牌，未设置令牌时只能从本机修改
+    """
+    if request.method == 'POST':
+        if not profile_authorized():
+            return jsonify({'error': '没有修改采样分析器设置的权限'}), 403
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'error': '请求体必须是JSON对象'}), 400
+        try:
+            slow_ms = float(data.get('slow_ms', profiler.slow_ms))
+            interval_ms = float(data.get('interval_ms', profiler.interval * 1000))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'slow_ms和interval_ms必须是数字'}), 400
+        if slow_ms < 0 or interval_ms <= 0:
+            return jsonify({'error': 'slow_ms不能为负数，interval_ms必须大于0'}), 400
+        profiler.slow_ms = slow_ms
+        profiler.interval = interval_ms / 1000
+    return jsonify({
+        'enabled': profiler.enabled,
+        'slow_ms': profiler.slow_ms,
+        'interval_ms': profiler.interval * 1000,
+        'recent': profiler.recent(),
     })
 
 
 # 静态文件路由
 @app.route('/')
 def index():
-    return send_from_directory('.', 'index.html')
+    return serve_static('index.html')
 
 
 @app.route('/<path:path>')
 def serve_static(path):
-    return send_from_directory('.', path)
+    asset = static_assets.get(path)
+    if asset is None:
+        return send_from_directory('.', path)
+
+    # 按 Accept-Encoding 选择预先生成的压缩版本，支持Range和条件请求
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+    if encoding and asset.compressible and not asset.variants and not request.range:
+        return static_response(asset, encoding, compressed_static(asset, encoding))
+    if encoding not in asset.variants:
+        encoding = None
+    return static_response(asset, encoding, send_file(
+        asset.variants[encoding] if encoding else asset.identity,
+        mimetype=asset.mimetype,
+        conditional=True,
+        etag=f'{asset.digest}-{encoding}' if encoding else asset.digest,
+        last_modified=asset.signature[1] / 1e9,
+    ))
+
+
+def compressed_static(asset, encoding):
+    """流式压缩没有预先压缩的文件，例如运行时被写入的数据文件"""
+    etag = f'{asset.digest}-{encoding}'
+    if etag_matches(request.headers.get('If-None-Match'), etag):
+        response = Response(status=304)
+    else:
+        def chunks():
+            with open(asset.identity, 'rb') as f:
+                yield from iter(lambda: f.read(64 * 1024), b'')
+
+        response = Response(iter_compressed(chunks(), encoding), mimetype=asset.mimetype)
+    response.headers['ETag'] = f'"{etag}"'
+    return response
+
+
+def static_response(asset, encoding, response):
+    """设置静态文件响应的编码和缓存头"""
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+
+    # 带正确内容版本号的地址永远不会变化，其余地址每次都需要用ETag重新验证
+    if request.args.get('v') == static_assets.version(asset):
+        response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    else:
+        response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def migrate_to_sqlite():
+    """把当前的JSON文件一次性导入SQLite数据库"""
+    for name, config in COLLECTIONS.items():
+        storage = SqliteStorage(SQLITE_PATH, name, config['search'])
+        count = migrate_json(config['file'], storage)
+        print(f"{config['file']} -> {SQLITE_PATH}:{name}，共 {count} 条记录")
+
+
+def export_from_sqlite():
+    """把SQLite数据库导出为JSON文件，供静态前端读取"""
+    for name, config in COLLECTIONS.items():
+        storage = SqliteStorage(SQLITE_PATH, name, config['search'])
+        count = export_json(storage, config['file'])
+        print(f"{SQLITE_PATH}:{name} -> {config['file']}，共 {count} 条记录")
+
+
+def export_bundle(output_dir, shard, compress):
+    """为静态站点生成带全文索引和外键查找表的数据包"""
+    collections = {
+        name: (store[name].all(), config['search'], config['keys'])
+        for name, config in COLLECTIONS.items()
+    }
+    manifest = build_bundle(collections, output_dir, shard=shard, compress=compress)
+    for name, entry in manifest['collections'].items():
+        size = f"，压缩后 {entry['gzip_bytes']} 字节" if 'gzip' in entry else ''
+        print(f"{name}: {entry['count']} 条记录 -> {os.path.join(output_dir, entry['file'])} ({entry['bytes']} 字节{size})")
+
+
+def serve_production(bind, workers, threads):
+    """用gunicorn的多个工作进程运行同一个app，各进程通过磁盘上的数据状态感知其他进程的写入"""
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        raise SystemExit('生产模式需要安装 gunicorn: pip install gunicorn')
+
+    class ProductionServer(BaseApplication):
+        def load_config(self):
+            self.cfg.set('bind', bind)
+            self.cfg.set('workers', workers)
+            self.cfg.set('threads', threads)
+            self.cfg.set('worker_class', 'gthread')
+            self.cfg.set('accesslog', '-')
+
+        def load(self):
+            return app
+
+    # 在fork工作进程之前生成静态文件的压缩版本，避免每个进程重复生成
+    static_assets.build_all()
+    # 各工作进程的指标通过共享目录合并，重新启动时从零开始计数
+    if metrics.directory is None:
+        metrics.directory = tempfile.mkdtemp(prefix='metrics-')
+        atexit.register(shutil.rmtree, metrics.directory, True)
+    os.makedirs(metrics.directory, exist_ok=True)
+    metrics.clear_directory()
+    print(f"生产模式: {workers} 个工作进程 x {threads} 个线程，监听 {bind}")
+    ProductionServer().run()
 
 
 if __name__ == '__main__':
-    print("服务器启动在 http://localhost:8000")
-    print("按 Ctrl+C 停止服务器")
-    app.run(host='0.0.0.0', port=8000, debug=True)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', nargs='?', default='run',
+                        choices=['run', 'serve', 'migrate', 'export', 'build-static', 'bundle'],
+                        help='run 启动开发服务器，serve 以多进程生产模式启动，migrate 把JSON导入SQLite，'
+                             'export 把SQLite导出为JSON，build-static 预先生成静态文件的压缩版本，'
+                             'bundle 为静态站点生成数据包')
+    parser.add_argument('--bind', default=WEB_BIND, help='生产模式的监听地址 (默认 %(default)s)')
+    parser.add_argument('--workers', type=int, default=WEB_WORKERS, help='生产模式的工作进程数 (默认 %(default)s)')
+    parser.add_argument('--threads', type=int, default=WEB_THREADS, help='每个工作进程的线程数 (默认 %(default)s)')
+    parser.add_argument('--output', default=BUNDLE_DIR, help='数据包的输出目录 (默认 %(default)s)')
+    parser.add_argument('--single', action='store_true', help='所有集合写入同一个数据包，而不是按集合分片')
+    parser.add_argument('--compress', action='store_true', help='同时生成gzip压缩的数据包')
+    args = parser.parse_args()
+
+    if args.command == 'migrate':
+        migrate_to_sqlite()
+    elif args.command == 'export':
+        export_from_sqlite()
+    elif args.command == 'serve':
+        serve_production(args.bind, args.workers, args.threads)
+    elif args.command == 'bundle':
+        export_bundle(args.output, not args.single, args.compress)
+    elif args.command == 'build-static':
+        print(f"已处理 {static_assets.build_all()} 个静态文件，压缩版本保存在 {STATIC_CACHE_DIR}")
+    else:
+        static_assets.build_all()
+        print("服务器启动在 http://localhost:8000")
+        print("按 Ctrl+C 停止服务器")
+        app.run(host='0.0.0.0', port=8000, debug=True)
\ No newline at end of file
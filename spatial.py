@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+样本坐标的网格空间索引，支持矩形范围和半径查询
+"""
+
+import math
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.32
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """两点之间的大圆距离（公里）"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def record_coordinates(record):
+    """读取记录的经纬度，缺失或越界时返回None"""
+    try:
+        lat = float(record.get('latitude'))
+        lon = float(record.get('longitude'))
+    except (TypeError, ValueError):
+        return None
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180) or math.isnan(lat) or math.isnan(lon):
+        return None
+    return lat, lon
+
+
+class GridIndex:
+    """把坐标按固定经纬度间隔划分到网格中，查询只扫描与范围相交的非空网格"""
+
+    def __init__(self, cell_size=0.5):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.points = {}
+
+    def _cell(self, lat, lon):
+        return (int(math.floor(lon / self.cell_size)), int(math.floor(lat / self.cell_size)))
+
+    def rebuild(self, records):
+        self.cells = {}
+        self.points = {}
+        for record in records:
+            self.add(record)
+
+    def add(self, record):
+        record_id = record.get('id')
+        if record_id in self.points:
+            self.remove(self.points[record_id][2])
+        coordinates = record_coordinates(record)
+        if record_id is None or coordinates is None:
+            return
+        lat, lon = coordinates
+        cell = self._cell(lat, lon)
+        self.cells.setdefault(cell, {})[record_id] = (lat, lon, record)
+        self.points[record_id] = (cell, coordinates, record)
+
+    def remove(self, record):
+        record_id = record.get('id')
+        entry = self.points.get(record_id)
+        if entry is None or entry[2] is not record:
+            return
+        cell = entry[0]
+        del self.points[record_id]
+        del self.cells[cell][record_id]
+        if not self.cells[cell]:
+            del self.cells[cell]
+
+    def _cells_in_range(self, min_lon, min_lat, max_lon, max_lat):
+        """与矩形相交的非空网格；矩形覆盖的网格比非空网格还多时直接遍历非空网格"""
+        x0, y0 = self._cell(min_lat, min_lon)
+        x1, y1 = self._cell(max_lat, max_lon)
+        if (x1 - x0 + 1) * (y1 - y0 + 1) > len(self.cells):
+            return [points for (x, y), points in self.cells.items() if x0 <= x <= x1 and y0 <= y <= y1]
+        cells = []
+        for x in range(x0, x1 + 1):
+            for y in range(y0, y1 + 1):
+                points = self.cells.get((x, y))
+                if points:
+                    cells.append(points)
+        return cells
+
+    def _bbox_points(self, min_lon, min_lat, max_lon, max_lat):
+        """矩形范围内的 (纬度, 经度, 记录)；min_lon 大于 max_lon 时表示跨越180度经线"""
+        if min_lon > max_lon:
+            yield from self._bbox_points(min_lon, min_lat, 180.0, max_lat)
+            yield from self._bbox_points(-180.0, min_lat, max_lon, max_lat)
+            return
+        for points in self._cells_in_range(min_lon, min_lat, max_lon, max_lat):
+            for lat, lon, record in points.values():
+                if min_lat <= lat <= max_lat and min_lon <= lon <= max_lon:
+                    yield lat, lon, record
+
+    def within_bbox(self, min_lon, min_lat, max_lon, max_lat):
+        """返回矩形范围内的记录"""
+        return [record for _, _, record in self._bbox_points(min_lon, min_lat, max_lon, max_lat)]
+
+    def near(self, lat, lon, radius_km):
+        """返回距离指定点不超过 radius_km 的记录，按距离从近到远排序"""
+        dlat = radius_km / KM_PER_DEGREE
+        min_lat, max_lat = max(lat - dlat, -90.0), min(lat + dlat, 90.0)
+        # 靠近两极时经度范围覆盖整个纬度圈
+        cos_lat = min(math.cos(math.radians(min_lat)), math.cos(math.radians(max_lat)))
+        dlon = radius_km / (KM_PER_DEGREE * cos_lat) if cos_lat > 1e-9 else 360.0
+        if dlon >= 180.0:
+            min_lon, max_lon = -180.0, 180.0
+        else:
+            min_lon = (lon - dlon + 180.0) % 360.0 - 180.0
+            max_lon = (lon + dlon + 180.0) % 360.0 - 180.0
+
+        matches = []
+        for point_lat, point_lon, record in self._bbox_points(min_lon, min_lat, max_lon, max_lat):
+            distance = haversine_km(lat, lon, point_lat, point_lon)
+            if distance <= radius_km:
+                matches.append((distance, record))
+        matches.sort(key=lambda match: match[0])
+        return [record for _, record in matches]
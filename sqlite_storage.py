@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+SQLite存储后端：每个集合一张表，FTS5负责全文搜索
+
+SQLite只是持久化格式，记录仍整体加载到内存集合中，按ID和外键的查询都由内存索引完成，因此表上除主键外不建索引
+"""
+
+import os
+import sqlite3
+import threading
+
+from search_index import field_terms, query_terms
+from storage import FileLock, JournalStorage, dumps_json, loads_json, write_temp_json
+
+# 报告加载进度时每批读取的行数
+LOAD_BATCH = 5000
+
+
+class SqliteStorage:
+    """把一个集合保存在SQLite表中，记录按插入顺序保存为JSON文本"""
+
+    def __init__(self, db_path, table, search_fields=None):
+        self.db_path = db_path
+        self.table = table
+        self.search_fields = dict(search_fields or {})
+        self._local = threading.local()
+        self._version = None
+        self._write_lock = FileLock(f'{db_path}.{table}.lock')
+        self._create_schema()
+
+    def lock(self):
+        """写入锁，SQLite事务只保证单次写入的原子性，校验与写入之间的读-改-写由它串行化"""
+        return self._write_lock
+
+    def _connection(self):
+        """每个线程使用独立的连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _create_schema(self):
+        """建表、建索引，并创建FTS5全文索引表"""
+        table = self.table
+        conn = self._connection()
+        with conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, version INTEGER NOT NULL)')
+            conn.execute('INSERT OR IGNORE INTO meta (name, version) VALUES (?, 0)', (table,))
+            conn.execute(f'CREATE TABLE IF NOT EXISTS {table} (id TEXT PRIMARY KEY, data TEXT NOT NULL)')
+            # 早期版本为外键列建的索引从未被查询使用，只会拖慢写入
+            for (index,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ? "
+                                         "AND sql IS NOT NULL", (table,)).fetchall():
+                conn.execute(f'DROP INDEX {index}')
+            if self.search_fields:
+                # 全文索引字段改变后按新的字段重建FTS表，否则bm25的字段权重会对错列
+                existing = [row[1] for row in conn.execute(f'PRAGMA table_info({table}_fts)')]
+                stale = existing and existing != list(self.search_fields)
+                if stale:
+                    conn.execute(f'DROP TABLE {table}_fts')
+                columns = ', '.join(self.search_fields)
+                conn.execute(f'CREATE VIRTUAL TABLE IF NOT EXISTS {table}_fts USING fts5({columns})')
+                if stale:
+                    for rowid, data in conn.execute(f'SELECT rowid, data FROM {table}').fetchall():
+                        self._index_row(conn, rowid, loads_json(data))
+
+    def _current_version(self, conn):
+        return conn.execute('SELECT version FROM meta WHERE name = ?', (self.table,)).fetchone()[0]
+
+    def changed(self):
+        """其他连接或进程是否修改过这张表
+
+        每次请求都会调用，先检查代价很低的 PRAGMA data_version：它只在其他连接提交过写入后才变化，
+        变化时再读取这张表的版本号（同一数据库中其他表的写入也会让它变化）
+        """
+        conn = self._connection()
+        data_version = conn.execute('PRAGMA data_version').fetchone()[0]
+        if self._version is not None and data_version == getattr(self._local, 'data_version', None):
+            return False
+        if self._current_version(conn) != self._version:
+            return True
+        # 只在确认没有变化时记下，返回True后调用方再次检查时仍会读取版本号
+        self._local.data_version = data_version
+        return False
+
+    def load(self, progress=None):
+        """按插入顺序读取全部记录，progress(新读取的记录, 已读条数, 总条数) 每读取一批报告一次"""
+        conn = self._connection()
+        self._version = self._current_version(conn)
+        rows = conn.execute(f'SELECT data FROM {self.table} ORDER BY rowid')
+        if progress is None:
+            return [loads_json(data) for (data,) in rows]
+        total = conn.execute(f'SELECT COUNT(*) FROM {self.table}').fetchone()[0]
+        records = []
+        while True:
+            batch = [loads_json(data) for (data,) in rows.fetchmany(LOAD_BATCH)]
+            if not batch:
+                break
+            records.extend(batch)
+            progress(batch, len(records), total)
+        return records
+
+    def read_changes(self):
+        return None
+
+    def write(self, records, operations):
+        """在一个事务中应用本次写入"""
+        conn = self._connection()
+        with conn:
+            for op, payload in operations:
+                if op == 'upsert':
+                    self._upsert_row(conn, payload)
+                else:
+                    self._delete_row(conn, payload)
+            conn.execute('UPDATE meta SET version = version + 1 WHERE name = ?', (self.table,))
+            self._version = self._current_version(conn)
+
+    def pending(self):
+        return 0
+
+    def state(self):
+        return self._version
+
+    def _upsert_row(self, conn, record):
+        """插入或更新一行，已有记录保持原来的rowid，从而保持顺序"""
+        table = self.table
+        conn.execute(
+            f'INSERT INTO {table} (id, data) VALUES (?, ?) ON CONFLICT(id) DO UPDATE SET data = excluded.data',
+            (record['id'], dumps_json(record).decode('utf-8')),
+        )
+        if not self.search_fields:
+            return
+
+        rowid = conn.execute(f'SELECT rowid FROM {table} WHERE id = ?', (record['id'],)).fetchone()[0]
+        conn.execute(f'DELETE FROM {table}_fts WHERE rowid = ?', (rowid,))
+        self._index_row(conn, rowid, record)
+
+    def _index_row(self, conn, rowid, record):
+        """FTS5表与数据表共用rowid，内容为预先切分好的词项，与内存索引的分词规则一致"""
+        table = self.table
+        texts = []
+        for field in self.search_fields:
+            value = record.get(field)
+            texts.append('' if value is None or value == '' else ' '.join(field_terms(field, value)))
+        conn.execute(
+            f'INSERT INTO {table}_fts (rowid, {", ".join(self.search_fields)}) '
+            f'VALUES (?, {", ".join("?" * len(texts))})',
+            [rowid] + texts,
+        )
+
+    def _delete_row(self, conn, record_id):
+        row = conn.execute(f'SELECT rowid FROM {self.table} WHERE id = ?', (record_id,)).fetchone()
+        if row is None:
+            return
+        conn.execute(f'DELETE FROM {self.table} WHERE rowid = ?', row)
+        if self.search_fields:
+            conn.execute(f'DELETE FROM {self.table}_fts WHERE rowid = ?', row)
+
+    def replace_all(self, records):
+        """清空表后写入全部记录，用于从JSON迁移"""
+        conn = self._connection()
+        with conn:
+            conn.execute(f'DELETE FROM {self.table}')
+            if self.search_fields:
+                conn.execute(f'DELETE FROM {self.table}_fts')
+            for record in records:
+                self._upsert_row(conn, record)
+            conn.execute('UPDATE meta SET version = version + 1 WHERE name = ?', (self.table,))
+            self._version = self._current_version(conn)
+
+    def search(self, text):
+        """用FTS5匹配所有查询词项，按带字段权重的bm25排序，返回记录ID"""
+        terms, prefix = query_terms(text)
+        if not terms or not self.search_fields:
+            return []
+        phrases = ['"%s"' % term.replace('"', '""') for term in terms]
+        if prefix:
+            phrases[-1] += '*'
+        weights = ', '.join(str(float(weight)) for weight in self.search_fields.values())
+        table = self.table
+        rows = self._connection().execute(
+            f'SELECT {table}.id FROM {table}_fts JOIN {table} ON {table}.rowid = {table}_fts.rowid '
+            f'WHERE {table}_fts MATCH ? ORDER BY bm25({table}_fts, {weights})',
+            (' AND '.join(phrases),),
+        )
+        return [record_id for (record_id,) in rows]
+
+
+class SqliteSearch:
+    """把FTS5查询结果映射回内存中的记录，接口与 SearchIndex 相同"""
+
+    def __init__(self, storage):
+        self.storage = storage
+        self._docs = {}
+
+    def rebuild(self, records):
+        self._docs = {record.get('id'): record for record in records}
+
+    def add(self, record):
+        self._docs[record.get('id')] = record
+
+    def remove(self, record):
+        if self._docs.get(record.get('id')) is record:
+            del self._docs[record.get('id')]
+
+    def search(self, text):
+        return [self._docs[record_id] for record_id in self.storage.search(text) if record_id in self._docs]
+
+
+def migrate_json(json_path, storage):
+    """把JSON文件（连同尚未压缩的日志）一次性导入SQLite，返回导入的记录数"""
+    records = [record for record in JournalStorage(json_path).load() if record.get('id')]
+    storage.replace_all(records)
+    return len(records)
+
+
+def export_json(storage, json_path):
+    """把SQLite中的数据原子地导出为JSON文件，供静态前端读取"""
+    records = storage.load()
+    os.replace(write_temp_json(json_path, records), json_path)
+    return len(records)
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+静态资源处理：预先生成 .br/.gz 压缩版本，按内容哈希提供长期缓存，并把HTML中的本地引用改写为带版本号的地址
+
+运行时会被写入的数据文件和过大的文件不预先压缩，由服务器在响应时流式压缩，
+否则每次写入后的第一个请求都要以最高级别重新压缩整个文件，并留下一份过期的压缩版本
+"""
+
+import contextlib
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+from collections import namedtuple
+
+from werkzeug.security import safe_join
+
+from http_cache import brotli
+from storage import file_signature
+
+# 浏览器只有在MIME类型为 application/wasm 时才能边下载边编译
+mimetypes.add_type('application/wasm', '.wasm')
+mimetypes.add_type('text/x-c', '.c')
+
+COMPRESSIBLE_EXTENSIONS = {'.html', '.js', '.css', '.json', '.wasm', '.svg', '.c', '.txt'}
+# 小于该字节数的文件不值得压缩
+MIN_COMPRESS_SIZE = 1024
+# 大于该字节数的文件不预先压缩
+MAX_PRECOMPRESS_SIZE = 8 * 1024 * 1024
+# HTML中需要改写的本地脚本和样式引用
+LOCAL_REFERENCE = re.compile(r'''(<(?:script|link)\b[^>]*?\b(?:src|href)=)(["'])([^"':?#]+)\2''', re.I)
+
+# compressible 为真而 variants 为空的文件需要在响应时压缩
+Asset = namedtuple('Asset', ['path', 'signature', 'digest', 'mimetype', 'identity', 'variants', 'dependencies',
+                             'compressible'])
+
+
+def _write_atomic(file_path, data):
+    temp_path = f'{file_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, file_path)
+
+
+class StaticAssets:
+    """静态文件清单，文件变化后在下一次请求时重新生成"""
+
+    def __init__(self, root, cache_dir, dynamic=()):
+        self.root = os.path.abspath(root)
+        self.cache_dir = os.path.abspath(cache_dir)
+        # 运行时会变化的文件或目录（相对于 root），不预先压缩
+        self.dynamic = tuple(path.strip('/') for path in dynamic)
+        self._assets = {}
+        # 每个文件一把锁，同一文件只生成一次，生成较慢的文件不阻塞其他文件的请求；
+        # 生成HTML时会递归获取它引用的资源，因此使用可重入锁
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def version(self, asset):
+        """放在URL中的内容版本号"""
+        return asset.digest[:16]
+
+    def get(self, path):
+        """获取静态文件的清单项，文件不存在时返回None"""
+        full_path = safe_join(self.root, path)
+        if full_path is None or not os.path.isfile(full_path) or full_path.startswith(self.cache_dir + os.sep):
+            return None
+
+        signature = file_signature(full_path)
+        asset = self._assets.get(path)
+        if asset is not None and asset.signature == signature and self._dependencies_current(asset):
+            return asset
+
+        with self._lock:
+            lock = self._locks.setdefault(path, threading.RLock())
+        with lock:
+            asset = self._assets.get(path)
+            if asset is None or asset.signature != signature or not self._dependencies_current(asset):
+                asset = self._build(path, full_path, signature)
+                self._assets[path] = asset
+        return asset
+
+    def _is_dynamic(self, path):
+        return any(path == prefix or path.startswith(prefix + '/') for prefix in self.dynamic)
+
+    def _dependencies_current(self, asset):
+        """HTML引用的资源内容没有变化"""
+        for path, digest in asset.dependencies.items():
+            dependency = self.get(path)
+            if dependency is None or dependency.digest != digest:
+                return False
+        return True
+
+    def _build(self, path, full_path, signature):
+        """计算内容哈希并生成压缩版本"""
+        with open(full_path, 'rb') as f:
+            data = f.read()
+        extension = os.path.splitext(path)[1].lower()
+        mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+        dependencies = {}
+        if extension == '.html':
+            data, dependencies = self._rewrite_html(path, data)
+        digest = hashlib.sha256(data).hexdigest()
+
+        identity = full_path
+        variants = {}
+        compressible = extension in COMPRESSIBLE_EXTENSIONS and len(data) >= MIN_COMPRESS_SIZE
+        if compressible and not self._is_dynamic(path) and len(data) <= MAX_PRECOMPRESS_SIZE:
+            base = os.path.join(self.cache_dir, f'{path}.{digest[:16]}')
+            os.makedirs(os.path.dirname(base), exist_ok=True)
+            if dependencies:
+                identity = base
+                if not os.path.exists(identity):
+                    _write_atomic(identity, data)
+            if not os.path.exists(base + '.gz'):
+                _write_atomic(base + '.gz', gzip.compress(data, compresslevel=9, mtime=0))
+            variants['gzip'] = base + '.gz'
+            if brotli is not None:
+                if not os.path.exists(base + '.br'):
+                    _write_atomic(base + '.br', brotli.compress(data, quality=11))
+                variants['br'] = base + '.br'
+        elif dependencies:
+            identity = os.path.join(self.cache_dir, f'{path}.{digest[:16]}')
+            os.makedirs(os.path.dirname(identity), exist_ok=True)
+            _write_atomic(identity, data)
+        self._remove_stale(path, digest)
+
+        return Asset(path, signature, digest, mimetype, identity, variants, dependencies, compressible)
+
+    def _remove_stale(self, path, digest):
+        """删除该文件以前版本的压缩版本和改写后的HTML"""
+        directory = os.path.dirname(os.path.join(self.cache_dir, path))
+        name = os.path.basename(path)
+        pattern = re.compile(re.escape(name) + r'\.([0-9a-f]{16})(?:\.gz|\.br)?')
+        try:
+            entries = os.listdir(directory)
+        except FileNotFoundError:
+            return
+        for entry in entries:
+            match = pattern.fullmatch(entry)
+            if match and match.group(1) != digest[:16]:
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(os.path.join(directory, entry))
+
+    def _rewrite_html(self, path, data):
+        """把HTML中引用的本地脚本和样式改写为带内容版本号的地址"""
+        html = data.decode('utf-8')
+        directory = os.path.dirname(path)
+        dependencies = {}
+
+        def replace(match):
+            reference = match.group(3)
+            target = os.path.normpath(os.path.join(directory, reference)).replace(os.sep, '/')
+            asset = self.get(target)
+            if asset is None or target == path:
+                return match.group(0)
+            dependencies[target] = asset.digest
+            quote = match.group(2)
+            return f'{match.group(1)}{quote}{reference}?v={self.version(asset)}{quote}'
+
+        html = LOCAL_REFERENCE.sub(replace, html)
+        return html.encode('utf-8'), dependencies
+
+    def build_all(self):
+        """预先生成所有静态文件的压缩版本，返回处理的文件数"""
+        count = 0
+        for directory, subdirectories, files in os.walk(self.root):
+            subdirectories[:] = [name for name in subdirectories if not name.startswith('.')]
+            for name in files:
+                path = os.path.relpath(os.path.join(directory, name), self.root).replace(os.sep, '/')
+                if not name.startswith('.') and self.get(path) is not None:
+                    count += 1
+        return count
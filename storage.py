@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+数据持久化：整文件重写的JSON存储，以及追加写日志（write-ahead log）存储
+
+所有写入都先写临时文件再原子替换，并在进程间文件锁内完成；读取不加锁
+"""
+
+import json
+import os
+import tempfile
+import threading
+
+from bulk import iter_json_array, iter_text
+
+try:
+    import fcntl
+except ImportError:  # Windows 上使用 msvcrt 加锁
+    fcntl = None
+    import msvcrt
+
+try:
+    import orjson
+except ImportError:  # orjson 是可选依赖，未安装时使用标准库的 json
+    orjson = None
+
+# 数据文件的缩进空格数，设为0时写入紧凑的单行JSON，文件更小、读写更快，但不便于直接阅读和比较差异
+JSON_INDENT = int(os.environ.get('JSON_INDENT', '2'))
+
+
+def dumps_json(data, indent=0, sort_keys=False):
+    """把数据编码为UTF-8的JSON字节，indent 为0时输出紧凑格式；安装了 orjson 时使用它"""
+    if orjson is not None and indent in (0, 2):
+        option = (orjson.OPT_INDENT_2 if indent else 0) | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+        try:
+            return orjson.dumps(data, option=option)
+        except TypeError:  # 超出64位的整数等 orjson 不支持的值
+            pass
+    if indent:
+        return json.dumps(data, ensure_ascii=False, indent=indent, sort_keys=sort_keys).encode('utf-8')
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'), sort_keys=sort_keys).encode('utf-8')
+
+
+def loads_json(data):
+    """解析JSON字节或字符串"""
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except ValueError:  # NaN 等标准库接受而 orjson 不接受的写法
+            pass
+    return json.loads(data)
+
+
+def load_json_data(file_path, progress=None):
+    """加载JSON数据文件
+
+    progress(新解析的记录, 已读字节数, 总字节数) 不为None时逐块增量解析，每读入一块报告一次进度，
+    解析过程中其他线程（例如界面线程）不会被长时间阻塞
+    """
+    if not os.path.exists(file_path):
+        return []
+    if progress is None:
+        with open(file_path, 'rb') as f:
+            return loads_json(f.read())
+
+    total = os.path.getsize(file_path)
+    records = []
+    reported = 0
+    with open(file_path, 'rb') as f:
+        def chunks():
+            nonlocal reported
+            for chunk in iter_text(f):
+                progress(records[reported:], f.tell(), total)
+                reported = len(records)
+                yield chunk
+
+        text = chunks()
+        head = ''
+        while not head.strip():
+            chunk = next(text, None)
+            if chunk is None:
+                raise ValueError(f'{file_path} 为空')
+            head += chunk
+        records.extend(iter_json_array(text, head))
+    progress(records[reported:], total, total)
+    return records
+
+
+def save_json_data(file_path, data):
+    """原子地保存数据到JSON文件，读取者只会看到完整的旧文件或新文件"""
+    os.replace(write_temp_json(file_path, data), file_path)
+
+
+def write_temp_json(file_path, data):
+    """把数据写入目标文件同目录下的临时文件并落盘，返回临时文件路径"""
+    directory = os.path.dirname(os.path.abspath(file_path))
+    fd, temp_path = tempfile.mkstemp(prefix='.' + os.path.basename(file_path) + '.', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(dumps_json(data, JSON_INDENT))
+            f.flush()
+            os.fsync(f.fileno())
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    return temp_path
+
+
+class FileLock:
+    """基于锁文件的进程间互斥锁，同一线程内可重入，同一进程内的其他线程也会被阻塞"""
+
+    def __init__(self, lock_path):
+        self.lock_path = lock_path
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._file = None
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        if self._depth == 0:
+            try:
+                self._file = open(self.lock_path, 'a+b')
+                if fcntl is not None:
+                    fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+                else:
+                    self._file.seek(0)
+                    msvcrt.locking(self._file.fileno(), msvcrt.LK_LOCK, 1)
+            except BaseException:
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+                self._thread_lock.release()
+                raise
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        self._depth -= 1
+        if self._depth == 0:
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            else:
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+            self._file.close()
+            self._file = None
+        self._thread_lock.release()
+
+
+def file_signature(file_path):
+    """返回文件的 (inode, mtime, 大小)，文件不存在时返回None"""
+    try:
+        stat = os.stat(file_path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+def apply_operations(records, operations):
+    """把 upsert/delete 操作应用到记录列表上"""
+    positions = {record.get('id'): i for i, record in enumerate(records)}
+    deleted = False
+    for op, payload in operations:
+        if op == 'upsert':
+            position = positions.get(payload.get('id'))
+            if position is None:
+                positions[payload.get('id')] = len(records)
+                records.append(payload)
+            else:
+                records[position] = payload
+        elif op == 'delete' and positions.get(payload) is not None:
+            records[positions.pop(payload)] = None
+            deleted = True
+    if deleted:
+        records[:] = [record for record in records if record is not None]
+    return records
+
+
+class JsonFileStorage:
+    """每次写入都重写整个JSON文件的存储方式"""
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self._signature = None
+        self._write_lock = FileLock(file_path + '.lock')
+
+    def lock(self):
+        """写入锁，调用方在锁内先刷新数据再写入，从而串行化所有进程的读-改-写"""
+        return self._write_lock
+
+    def changed(self):
+        """磁盘上的数据是否被其他进程修改过"""
+        return file_signature(self.file_path) != self._signature
+
+    def load(self, progress=None):
+        """从磁盘加载全部记录，progress 见 load_json_data"""
+        self._signature = file_signature(self.file_path)
+        return load_json_data(self.file_path, progress)
+
+    def read_changes(self):
+        """读取其他进程追加的增量操作，返回None表示需要整体重新加载"""
+        return None
+
+    def write(self, records, operations):
+        """持久化一次写入"""
+        save_json_data(self.file_path, records)
+        self._signature = file_signature(self.file_path)
+
+    def pending(self):
+        """尚未折叠回JSON文件的日志字节数"""
+        return 0
+
+    def state(self):
+        """最近一次加载或写入时磁盘数据的标识，在所有进程中一致"""
+        return self._signature
+
+
+class JournalStorage(JsonFileStorage):
+    """追加写日志存储：每次写入只向日志追加一行，加载时回放，后台压缩回JSON文件"""
+
+    def __init__(self, file_path):
+        super().__init__(file_path)
+        self.journal_path = file_path + '.journal'
+        self._journal_offset = 0
+        # 已读取的日志文件的inode，压缩会用新文件替换日志，旧的读取位置随之失效
+        self._journal_inode = None
+
+    def changed(self):
+        if super().changed():
+            return True
+        signature = file_signature(self.journal_path)
+        if signature is None:
+            return self._journal_offset != 0
+        return signature[2] != self._journal_offset or (self._journal_offset and signature[0] != self._journal_inode)
+
+    def load(self, progress=None):
+        records = super().load(progress)
+        self._journal_offset = 0
+        return apply_operations(records, self._read_journal())
+
+    def read_changes(self):
+        if super().changed():
+            return None
+        return self._read_journal()
+
+    def _read_journal(self):
+        """从上次读到的位置开始读取完整的日志行，日志已被其他进程压缩替换时返回None"""
+        try:
+            f = open(self.journal_path, 'rb')
+        except FileNotFoundError:
+            return None if self._journal_offset else []
+        with f:
+            stat = os.fstat(f.fileno())
+            if self._journal_offset and (stat.st_ino != self._journal_inode or stat.st_size < self._journal_offset):
+                return None
+            self._journal_inode = stat.st_ino
+            f.seek(self._journal_offset)
+            data = f.read()
+
+        # 崩溃时写了一半的最后一行不完整，留到下次再读
+        end = data.rfind(b'\n') + 1
+        self._journal_offset += end
+        operations = []
+        for line in data[:end].splitlines():
+            if not line.strip():
+                continue
+            entry = loads_json(line)
+            if entry['op'] == 'upsert':
+                operations.append(('upsert', entry['record']))
+            else:
+                operations.append(('delete', entry['id']))
+        return operations
+
+    def write(self, records, operations):
+        lines = []
+        for op, payload in operations:
+            if op == 'upsert':
+                entry = {'op': 'upsert', 'record': payload}
+            else:
+                entry = {'op': 'delete', 'id': payload}
+            lines.append(dumps_json(entry))
+        data = b'\n'.join(lines) + b'\n'
+
+        with open(self.journal_path, 'ab') as f:
+            # 调用方持有写入锁并已读到日志末尾，超出部分只可能是崩溃的写入者留下的半行
+            if f.tell() != self._journal_offset:
+                f.truncate(self._journal_offset)
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+            self._journal_inode = os.fstat(f.fileno()).st_ino
+        self._journal_offset += len(data)
+
+    def pending(self):
+        return self._journal_offset
+
+    def state(self):
+        return (self._signature, self._journal_offset)
+
+    def compact(self, temp_path, offset, state):
+        """用已写好的快照替换JSON文件，并从日志中删除已折叠的部分，调用方需持有写入锁
+
+        state 是生成快照时的 state()，其间数据被重新加载过（例如其他进程已经压缩）则放弃本次压缩
+        """
+        if super().changed() or state[0] != self._signature:
+            os.unlink(temp_path)
+            return False
+
+        with open(self.journal_path, 'rb') as f:
+            f.seek(offset)
+            tail = f.read()
+
+        os.replace(temp_path, self.file_path)
+        self._signature = file_signature(self.file_path)
+
+        journal_temp = self.journal_path + '.tmp'
+        with open(journal_temp, 'wb') as f:
+            f.write(tail)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(journal_temp, self.journal_path)
+        self._journal_inode = file_signature(self.journal_path)[0]
+        self._journal_offset -= offset
+        return True
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+并发写入压力测试：多个进程（每个进程多个线程）同时写入同一集合，同时有读取者不断读取数据文件，
+结束后检查没有丢失任何写入、文件始终是完整的JSON
+
+    python stress_writes.py --mode journal --processes 8 --threads 4 --writes 50
+"""
+
+import argparse
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+from datastore import DataStore
+from sqlite_storage import SqliteStorage
+from storage import JournalStorage, JsonFileStorage, load_json_data
+
+
+def open_store(mode, directory):
+    if mode == 'sqlite':
+        storage = SqliteStorage(os.path.join(directory, 'stress.sqlite3'), 'records')
+    elif mode == 'journal':
+        storage = JournalStorage(os.path.join(directory, 'records.json'))
+    else:
+        storage = JsonFileStorage(os.path.join(directory, 'records.json'))
+    return DataStore({'records': storage})
+
+
+def writer(mode, directory, worker, threads, writes, compact):
+    """一个写入进程：每个线程插入自己的记录，并反复更新一条共享的计数器记录"""
+    collection = open_store(mode, directory)['records']
+
+    def run(thread):
+        for i in range(writes):
+            collection.upsert({'id': f'W{worker}-{thread}-{i}', 'worker': worker, 'thread': thread, 'seq': i})
+            # 读-改-写：在写入锁内读取计数器后递增
+            with collection.writing():
+                counter = collection.get('counter') or {'id': 'counter', 'value': 0}
+                collection.upsert({'id': 'counter', 'value': counter['value'] + 1})
+            if compact and i % 10 == 0:
+                collection.compact()
+
+    pool = [threading.Thread(target=run, args=(thread,)) for thread in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+
+
+def reader(mode, directory, stop, failures):
+    """不加锁地反复读取数据文件和内存副本，读到不完整的文件或回放日志出错就记录失败"""
+    file_path = os.path.join(directory, 'records.json')
+    collection = open_store(mode, directory)['records']
+    reads = 0
+    while not stop.is_set():
+        try:
+            if mode != 'sqlite':
+                load_json_data(file_path)
+            collection.all()
+        except ValueError as e:
+            failures.put(str(e))
+        reads += 1
+    failures.put(reads)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mode', choices=['json', 'journal', 'sqlite'], default='json')
+    parser.add_argument('--processes', type=int, default=8, help='写入进程数 (默认 %(default)s)')
+    parser.add_argument('--threads', type=int, default=4, help='每个写入进程的线程数 (默认 %(default)s)')
+    parser.add_argument('--writes', type=int, default=25, help='每个线程的写入次数 (默认 %(default)s)')
+    parser.add_argument('--readers', type=int, default=2, help='并发读取进程数 (默认 %(default)s)')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='stress-')
+    try:
+        stop = multiprocessing.Event()
+        failures = multiprocessing.Queue()
+        readers = [multiprocessing.Process(target=reader, args=(args.mode, directory, stop, failures))
+                   for _ in range(args.readers)]
+        writers = [
+            multiprocessing.Process(target=writer, args=(
+                args.mode, directory, worker, args.threads, args.writes, args.mode == 'journal'))
+            for worker in range(args.processes)
+        ]
+
+        started = time.perf_counter()
+        for process in readers + writers:
+            process.start()
+        for process in writers:
+            process.join()
+        elapsed = time.perf_counter() - started
+        stop.set()
+
+        errors = []
+        reads = 0
+        for _ in readers:
+            item = failures.get()
+            while not isinstance(item, int):
+                errors.append(item)
+                item = failures.get()
+            reads += item
+        for process in readers:
+            process.join()
+
+        collection = open_store(args.mode, directory)['records']
+        if args.mode == 'journal':
+            collection.compact()
+        records = collection.all()
+        expected = args.processes * args.threads * args.writes
+        written = sum(1 for record in records if record['id'] != 'counter')
+        counter = (collection.get('counter') or {}).get('value')
+        if args.mode != 'sqlite':
+            on_disk = len(JournalStorage(os.path.join(directory, 'records.json')).load())
+        else:
+            on_disk = len(records)
+
+        print(f'模式 {args.mode}: {args.processes} 个进程 x {args.threads} 个线程, 用时 {elapsed:.2f} 秒')
+        print(f'记录 {written}/{expected}, 计数器 {counter}/{expected}, 磁盘上 {on_disk} 条, '
+              f'读取 {reads} 次, 读到不完整文件 {len(errors)} 次, '
+              f'{expected * 2 / elapsed:.0f} 次写入/秒')
+        ok = written == expected and counter == expected and on_disk == expected + 1 and not errors
+        print('通过' if ok else '失败')
+        return 0 if ok else 1
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
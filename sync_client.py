@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+变更流客户端：在本地目录中缓存各集合，通过服务器的 /api/changes 增量同步，
+只有游标过期时才重新下载全部数据；作为命令行工具运行时可以持续跟随 /api/changes/stream 做镜像
+
+    python sync_client.py http://localhost:8000 --cache mirror --follow
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from datastore import DataStore
+from storage import JournalStorage
+
+# 本地缓存中各集合的数据文件，与服务器的数据文件同名
+CACHE_FILES = {
+    'literature': 'literature.json',
+    'taxonomy': 'taxonomy.json',
+    'samples': 'sample.json',
+}
+CURSOR_FILE = 'cursor.json'
+# 每次请求拉取的最大变更数
+SYNC_PAGE_SIZE = 1000
+REQUEST_TIMEOUT = 30
+# 本地日志超过这个字节数后折叠回JSON文件
+CACHE_COMPACT_BYTES = 4 * 1024 * 1024
+# 跟随模式断线后重连前等待的秒数
+RECONNECT_DELAY = 3
+
+
+class RequestError(ValueError):
+    """服务器拒绝了请求（4xx），message 为服务器返回的错误信息"""
+
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.status = status
+
+
+def open_cache(cache_dir):
+    """打开本地缓存目录中的数据仓库，写入只追加日志，增量同步的代价与变更量相关"""
+    os.makedirs(cache_dir, exist_ok=True)
+    return DataStore({name: JournalStorage(os.path.join(cache_dir, file_name))
+                      for name, file_name in CACHE_FILES.items()})
+
+
+class ChangeFeedClient:
+    """把服务器的变更应用到本地数据仓库，游标保存在 cursor_path 中"""
+
+    def __init__(self, base_url, store, cursor_path):
+        self.base_url = base_url.rstrip('/')
+        self.store = store
+        self.cursor_path = cursor_path
+        self.cursor = None
+        if os.path.exists(cursor_path):
+            with open(cursor_path, 'r', encoding='utf-8') as f:
+                self.cursor = json.load(f).get('cursor')
+
+    def _save_cursor(self, cursor):
+        self.cursor = cursor
+        temp_path = self.cursor_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'cursor': cursor, 'server': self.base_url}, f)
+        os.replace(temp_path, self.cursor_path)
+
+    def _request(self, method, path, data=None):
+        """发送请求并解析JSON响应，服务器拒绝请求时抛出 RequestError"""
+        body = None if data is None else json.dumps(data, ensure_ascii=False).encode('utf-8')
+        request = urllib.request.Request(self.base_url + path, data=body, method=method,
+                                         headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(request, timeout=REQUEST_TIMEOUT) as response:
+                return json.load(response)
+        except urllib.error.HTTPError as e:
+            if e.code >= 500:
+                raise
+            try:
+                message = json.load(e).get('error')
+            except ValueError:
+                message = None
+            raise RequestError(message or f'HTTP {e.code}', e.code) from None
+
+    def pull(self):
+        """拉取游标之后的变更并应用到本地缓存，返回发生变化的集合名称"""
+        changed = set()
+        while True:
+            since = -1 if self.cursor is None else self.cursor
+            page = self._request('GET', f'/api/changes?since={since}&limit={SYNC_PAGE_SIZE}')
+            if page['reset']:
+                # 先记下游标再下载，下载期间发生的变更会在之后重放，upsert和delete都是幂等的
+                changed.update(self._download_all())
+                self._save_cursor(page['cursor'])
+                continue
+
+            operations = {}
+            for entry in page['changes']:
+                payload = entry['record'] if entry['op'] == 'upsert' else entry['id']
+                operations.setdefault(entry['collection'], []).append((entry['op'], payload))
+            for name, items in operations.items():
+                if name in self.store.collections:
+                    self.store[name].apply_changes(items)
+                    changed.add(name)
+            self._save_cursor(page['cursor'])
+            if not page['more']:
+                break
+
+        for name in changed:
+            collection = self.store[name]
+            if collection.storage.pending() > CACHE_COMPACT_BYTES:
+                collection.compact()
+        return sorted(changed)
+
+    def _download_all(self):
+        """游标过期时下载各集合的全部记录，本地只写入与服务器不同的记录"""
+        changed = []
+        for name in CACHE_FILES:
+            records = self._request('GET', f'/api/{name}')
+            collection = self.store[name]
+            remote_ids = {record.get('id') for record in records}
+            with collection.writing():
+                operations = [('delete', record.get('id')) for record in collection.records
+                              if record.get('id') not in remote_ids]
+                operations += [('upsert', record) for record in records if collection.get(record.get('id')) != record]
+                collection.apply_changes(operations)
+            if operations:
+                changed.append(name)
+        return changed
+
+    def push(self, name, operations):
+        """把本地修改逐条提交到服务器，返回被服务器拒绝的修改及原因
+
+        有修改被拒绝时本地缓存与服务器不再一致，下一次 pull() 会重新下载全部数据
+        """
+        rejected = []
+        for op, payload in operations:
+            try:
+                if op == 'upsert':
+                    self._request('POST', f'/api/{name}', payload)
+                else:
+                    self._request('DELETE', f"/api/{name}/{urllib.parse.quote(payload, safe='')}")
+            except RequestError as e:
+                # 服务器上已经不存在的记录无需再删除
+                if op == 'delete' and e.status == 404:
+                    continue
+                rejected.append((op, payload, str(e)))
+        if rejected:
+            self.cursor = None
+        return rejected
+
+    def iter_events(self):
+        """读取服务器推送的事件，返回 (事件类型, 数据)，连接被服务器关闭时结束"""
+        since = -1 if self.cursor is None else self.cursor
+        request = urllib.request.Request(f'{self.base_url}/api/changes/stream?since={since}',
+                                         headers={'Accept': 'text/event-stream'})
+        with urllib.request.urlopen(request, timeout=REQUEST_TIMEOUT * 2) as response:
+            event, data = 'message', []
+            for line in response:
+                line = line.decode('utf-8').rstrip('\r\n')
+                if not line:
+                    if data:
+                        yield event, json.loads('\n'.join(data))
+                    event, data = 'message', []
+                elif line.startswith('event:'):
+                    event = line[6:].strip()
+                elif line.startswith('data:'):
+                    data.append(line[5:].lstrip())
+
+    def follow(self):
+        """持续跟随服务器的事件流，每收到事件就增量拉取，断线后自动重连"""
+        while True:
+            try:
+                self.report(self.pull())
+                for event, data in self.iter_events():
+                    # 一次拉取会取到一批变更，已经拉取过的事件直接跳过
+                    if event == 'reset' or (event == 'change' and (self.cursor is None or data['seq'] > self.cursor)):
+                        self.report(self.pull())
+            except OSError as e:
+                print(f'连接中断: {e}，{RECONNECT_DELAY} 秒后重连', file=sys.stderr)
+                time.sleep(RECONNECT_DELAY)
+
+    def report(self, changed):
+        if changed:
+            counts = ', '.join(f'{name} {len(self.store[name].records)} 条' for name in changed)
+            print(f'已同步到 {self.cursor}: {counts}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('server', help='服务器地址，例如 http://localhost:8000')
+    parser.add_argument('--cache', default='mirror', help='本地缓存目录 (默认 %(default)s)')
+    parser.add_argument('--follow', action='store_true', help='同步后持续跟随服务器推送的变更')
+    args = parser.parse_args()
+
+    store = open_cache(args.cache)
+    client = ChangeFeedClient(args.server, store, os.path.join(args.cache, CURSOR_FILE))
+    if args.follow:
+        try:
+            client.follow()
+        except KeyboardInterrupt:
+            pass
+    else:
+        client.report(client.pull())
+        print(f'游标: {client.cursor}')
+    store.compact()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+管理界面的表格模型：直接在集合的内存列表上提供数据，视图只为可见的行取数据，
+单条记录的增删改只发出对应行的信号，不再重建整张表；文献和分类下拉框共用同一模型，随之同步
+
+修改只在内存中生效并立即显示，持久化由后台线程合并写入（见 persistence_worker.py）；
+界面线程从不重新加载集合，后台线程加载、写入或同步完成后通过信号调用 sync() 换成集合的新列表
+"""
+
+from PyQt5.QtCore import (QAbstractTableModel, QEvent, QIdentityProxyModel, QModelIndex, QRect, QStringListModel,
+                          Qt, pyqtSignal)
+from PyQt5.QtWidgets import (QApplication, QComboBox, QCompleter, QStyle, QStyledItemDelegate,
+                             QStyleOptionButton)
+
+# 操作列中的按钮
+ACTIONS = [('edit', '编辑'), ('delete', '删除')]
+# 补全列表显示的条数
+SUGGEST_LIMIT = 20
+
+
+class RecordTableModel(QAbstractTableModel):
+    """集合记录的表格模型，columns 为 [(字段, 表头)]，最后附加一列操作按钮"""
+
+    # 有修改暂存到集合中、等待持久化
+    staged = pyqtSignal()
+
+    def __init__(self, collection, columns, parent=None):
+        super().__init__(parent)
+        self.collection = collection
+        self.columns = list(columns)
+        self.action_column = len(self.columns)
+        self._records = []
+        self._version = None
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._records)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.columns) + 1
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole or orientation != Qt.Horizontal:
+            return None
+        return self.columns[section][1] if section < self.action_column else '操作'
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.column() == self.action_column or index.row() >= len(self._records):
+            return None
+        if role in (Qt.DisplayRole, Qt.ToolTipRole):
+            value = self._records[index.row()].get(self.columns[index.column()][0])
+            return '' if value is None else str(value)
+        return None
+
+    def record(self, row):
+        return self._records[row] if row < len(self._records) else {}
+
+    def append_loaded(self, records):
+        """集合仍在后台加载时先显示已解析出的记录，加载完成后由 sync() 换成集合的列表"""
+        if records:
+            first = len(self._records)
+            self.beginInsertRows(QModelIndex(), first, first + len(records) - 1)
+            self._records.extend(records)
+            self.endInsertRows()
+
+    def sync(self):
+        """后台线程换入了新列表（重新加载或应用了其他进程的修改）后整体刷新视图，不读取磁盘
+
+        后台线程只会换成新的列表，不会在背后修改模型持有的列表，因此两次 sync() 之间行号保持有效
+        """
+        with self.collection.locked(refresh=False):
+            if self.collection.records is not self._records or self.collection.version != self._version:
+                self.beginResetModel()
+                self._records = self.collection.records
+                self._version = self.collection.version
+                self.endResetModel()
+
+    def upsert(self, record):
+        """修改一条记录，只通知插入的行或变化的行"""
+        with self.collection.locked(refresh=False):
+            self.sync()
+            row = self.collection.positions.get(record.get('id'))
+            if row is None:
+                row = len(self._records)
+                self.beginInsertRows(QModelIndex(), row, row)
+                self.collection.stage_upsert(record)
+                self.endInsertRows()
+            else:
+                self.collection.stage_upsert(record)
+                self.dataChanged.emit(self.index(row, 0), self.index(row, self.action_column))
+            self._version = self.collection.version
+        self.staged.emit()
+
+    def upsert_many(self, records):
+        """批量修改记录，新增的记录作为一段连续的行插入"""
+        with self.collection.locked(refresh=False):
+            self.sync()
+            positions = self.collection.positions
+            new_ids = {record.get('id') for record in records} - positions.keys()
+            updated = [positions[record.get('id')] for record in records if record.get('id') in positions]
+            first = len(self._records)
+            if new_ids:
+                self.beginInsertRows(QModelIndex(), first, first + len(new_ids) - 1)
+            created = sum(self.collection.stage_upsert(record) for record in records)
+            if new_ids:
+                self.endInsertRows()
+            if updated:
+                self.dataChanged.emit(self.index(min(updated), 0), self.index(max(updated), self.action_column))
+            self._version = self.collection.version
+        if records:
+            self.staged.emit()
+        return created
+
+    def delete(self, record_id):
+        """删除一条记录，只通知被移除的行"""
+        with self.collection.locked(refresh=False):
+            self.sync()
+            row = self.collection.positions.get(record_id)
+            if row is None:
+                return None
+            self.beginRemoveRows(QModelIndex(), row, row)
+            item = self.collection.stage_delete(record_id)
+            self.endRemoveRows()
+            self._version = self.collection.version
+        self.staged.emit()
+        return item
+
+
+class ActionDelegate(QStyledItemDelegate):
+    """在操作列中绘制编辑和删除按钮，点击时发出对应的信号，不为每行创建控件"""
+
+    editRequested = pyqtSignal(int)
+    deleteRequested = pyqtSignal(int)
+
+    def _button_rects(self, rect):
+        width = rect.width() // len(ACTIONS)
+        return [QRect(rect.x() + i * width, rect.y(), width, rect.height()).adjusted(2, 2, -2, -2)
+                for i in range(len(ACTIONS))]
+
+    def paint(self, painter, option, index):
+        style = option.widget.style() if option.widget else QApplication.style()
+        for (_, text), rect in zip(ACTIONS, self._button_rects(option.rect)):
+            button = QStyleOptionButton()
+            button.rect = rect
+            button.text = text
+            button.state = QStyle.State_Enabled | QStyle.State_Raised
+            style.drawControl(QStyle.CE_PushButton, button, painter, option.widget)
+
+    def editorEvent(self, event, model, option, index):
+        if event.type() != QEvent.MouseButtonRelease or event.button() != Qt.LeftButton:
+            return False
+        for (action, _), rect in zip(ACTIONS, self._button_rects(option.rect)):
+            if rect.contains(event.pos()):
+                signal = self.editRequested if action == 'edit' else self.deleteRequested
+                signal.emit(index.row())
+                return True
+        return False
+
+
+class ChoiceProxyModel(QIdentityProxyModel):
+    """把表格模型的每行显示为 "ID - 名称" 供下拉框使用，数据变化通过代理自动同步到下拉框"""
+
+    def __init__(self, source_model, label_field, parent=None):
+        super().__init__(parent)
+        self.label_field = label_field
+        self.setSourceModel(source_model)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        record = self.sourceModel().record(index.row())
+        if role in (Qt.DisplayRole, Qt.EditRole):
+            return f"{record.get('id', '')} - {record.get(self.label_field) or ''}"
+        if role == Qt.UserRole:
+            return record.get('id', '')
+        return super().data(index, role)
+
+
+def make_choice_combobox(model):
+    """可输入搜索的下拉框，补全列表按包含关系匹配，只在输入时过滤"""
+    combo = QComboBox()
+    combo.setModel(model)
+    combo.setEditable(True)
+    combo.setInsertPolicy(QComboBox.NoInsert)
+    # 大量条目时不为计算宽度遍历所有行
+    combo.setSizeAdjustPolicy(QComboBox.AdjustToMinimumContentsLengthWithIcon)
+    combo.setMinimumContentsLength(30)
+    combo.view().setUniformItemSizes(True)
+    completer = QCompleter(model, combo)
+    completer.setCaseSensitivity(Qt.CaseInsensitive)
+    completer.setFilterMode(Qt.MatchContains)
+    completer.setCompletionMode(QCompleter.PopupCompletion)
+    combo.setCompleter(completer)
+    return combo
+
+
+def make_name_combobox(model, collection, name_index):
+    """带补全的记录下拉框，补全列表来自 NameIndex：按ID前缀或名称单词前缀查找，容忍拼写错误，不逐行扫描全部记录"""
+    combo = make_choice_combobox(model)
+    suggestions = QStringListModel(combo)
+    completer = QCompleter(suggestions, combo)
+    # 列表已经是索引排好序的结果，不再按输入的文字过滤
+    completer.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+    # 直接设置到输入框上，选中时按ID定位下拉框的行，而不是由下拉框按补全模型的行号定位
+    combo.lineEdit().setCompleter(completer)
+
+    def update(text):
+        with collection.locked(refresh=False):
+            found = name_index.suggest(text, SUGGEST_LIMIT)
+        suggestions.setStringList([f"{record.get('id', '')} - {record.get(name_index.field) or ''}"
+                                   for record, _ in found])
+        if found:
+            completer.complete()
+
+    combo.lineEdit().textEdited.connect(update)
+    completer.activated[str].connect(lambda text: select_id(combo, collection, text.split(' - ', 1)[0]))
+    return combo
+
+
+def selected_id(combo, collection):
+    """下拉框中选中或输入的记录ID，没有选择时返回None"""
+    text = combo.currentText().strip()
+    if not text:
+        return None
+    if collection.get(text, refresh=False) is not None:
+        return text
+    record_id = text.split(' - ', 1)[0]
+    return record_id if collection.get(record_id, refresh=False) is not None else None
+
+
+def select_id(combo, collection, record_id):
+    """通过ID索引直接定位下拉框中的行"""
+    row = collection.positions.get(record_id) if record_id else None
+    if row is None:
+        combo.setCurrentIndex(-1)
+        combo.clearEditText()
+    else:
+        combo.setCurrentIndex(row)
@@ -1,22 +1,108 @@
 import sys
-import json
 import os
-import re
 import uuid
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                              QPushButton, QLabel, QLineEdit, QTextEdit, QComboBox,
-                             QTableWidget, QTableWidgetItem, QFileDialog, QMessageBox,
-                             QTabWidget, QGroupBox, QFormLayout, QDoubleSpinBox)
-from PyQt5.QtCore import Qt
+                             QTableView, QHeaderView, QFileDialog, QMessageBox,
+                             QTabWidget, QGroupBox, QFormLayout, QDoubleSpinBox, QProgressBar)
+from PyQt5.QtCore import Qt, QThread, QTimer, pyqtSignal
+
+from changes import ChangeLog
+from datastore import DataStore
+from name_index import NameIndex
+from persistence_worker import PersistenceWorker
+from ris import iter_ris_records
+from storage import JournalStorage, JsonFileStorage
+from sync_client import CURSOR_FILE, ChangeFeedClient, open_cache
+from table_models import (ActionDelegate, ChoiceProxyModel, RecordTableModel, make_name_combobox, select_id,
+                          selected_id)
+
+# 与服务器使用相同的存储方式（json 或 journal），两者可以同时读写数据文件
+STORAGE_MODE = os.environ.get('STORAGE_MODE', 'json')
+# 最后一次修改之后等待多久再写入磁盘（毫秒），其间的连续修改合并为一次写入
+SAVE_DELAY_MS = int(os.environ.get('SAVE_DELAY_MS', '500'))
+# 与服务器共用的变更日志，直接写数据文件时服务器的变更流同样能看到这些修改
+CHANGES_FILE = os.environ.get('CHANGES_FILE', 'changes.log')
+# 设置服务器地址后以客户端模式运行：数据缓存在本地目录，通过变更流增量同步，修改提交到服务器
+SERVER_URL = os.environ.get('SERVER_URL', '')
+CLIENT_CACHE_DIR = os.environ.get('CLIENT_CACHE_DIR', '.client_cache')
+# 拉取服务器变更（本地模式下检查数据文件是否被其他进程修改）的间隔（毫秒）
+SYNC_INTERVAL_MS = int(os.environ.get('SYNC_INTERVAL_MS', '3000'))
 
 
 class TaxonomyManager(QMainWindow):
+    # 发给后台线程的加载和保存请求，参数为集合名称列表
+    loadRequested = pyqtSignal(list)
+    flushRequested = pyqtSignal(list)
+    pullRequested = pyqtSignal()
+    # 在后台线程中导入的RIS文件路径
+    importRisRequested = pyqtSignal(str)
+
     def __init__(self):
         super().__init__()
-        self.literature_data = []
-        self.taxonomy_data = []
-        self.sample_data = []
-        
+        # 与服务器共享的持久化层：修改合并后在文件锁内只写入变化的记录，不会覆盖其他进程的写入
+        if SERVER_URL:
+            self.store = open_cache(CLIENT_CACHE_DIR)
+            self.client = ChangeFeedClient(SERVER_URL, self.store, os.path.join(CLIENT_CACHE_DIR, CURSOR_FILE))
+        else:
+            storage_class = JournalStorage if STORAGE_MODE == 'journal' else JsonFileStorage
+            self.store = DataStore({
+                'literature': storage_class('literature.json'),
+                'taxonomy': storage_class('taxonomy.json'),
+                'samples': storage_class('sample.json'),
+            }, ChangeLog(CHANGES_FILE))
+            self.client = None
+        
+        # 三个标签页的表格模型，直接读取集合的内存列表
+        self.lit_model = RecordTableModel(self.store['literature'], [
+            ("id", "文献ID"), ("title", "标题"), ("authors", "作者"), ("journal", "期刊"), ("year", "年份")])
+        self.tax_model = RecordTableModel(self.store['taxonomy'], [
+            ("id", "分类ID"), ("name", "名称"), ("level", "级别"), ("type", "类型"), ("lit_id", "文献ID")])
+        self.smp_model = RecordTableModel(self.store['samples'], [
+            ("id", "样本ID"), ("tax_id", "分类ID"), ("collector", "采集者"), ("latitude", "纬度"), ("longitude", "经度")])
+        # 文献和分类下拉框的数据来自同一个表格模型，保存或删除后自动更新
+        self.lit_choices = ChoiceProxyModel(self.lit_model, "title")
+        self.tax_choices = ChoiceProxyModel(self.tax_model, "name")
+        # 下拉框的补全索引（分类按学名、文献按标题，都可按ID查找），随集合加载和修改增量更新
+        self.tax_names = self.store['taxonomy'].add_index(NameIndex())
+        self.lit_titles = self.store['literature'].add_index(NameIndex('title'))
+        self.models = {'literature': self.lit_model, 'taxonomy': self.tax_model, 'samples': self.smp_model}
+
+        # 加载和保存都在后台线程中进行，界面线程只处理进度和结果
+        self.worker_thread = QThread(self)
+        self.worker = PersistenceWorker(self.store, self.client)
+        self.worker.moveToThread(self.worker_thread)
+        self.worker.progress.connect(self.on_load_progress)
+        self.worker.loaded.connect(self.on_collection_loaded)
+        self.worker.loadFinished.connect(self.on_load_finished)
+        self.worker.saved.connect(self.on_collection_saved)
+        self.worker.failed.connect(self.on_persistence_failed)
+        self.loadRequested.connect(self.worker.load)
+        self.flushRequested.connect(self.worker.flush)
+        self.pullRequested.connect(self.worker.pull)
+        self.importRisRequested.connect(self.worker.import_ris)
+        self.worker.risBatch.connect(self.on_ris_batch)
+        self.worker.risImported.connect(self.on_ris_imported)
+        self.worker.synced.connect(self.on_synced)
+        self.worker.syncFailed.connect(self.on_sync_failed)
+        self.worker_thread.start()
+
+        # 防抖：每次修改都重新计时，停止修改一段时间后才写入
+        self.dirty = set()
+        self.save_timer = QTimer(self)
+        self.save_timer.setSingleShot(True)
+        self.save_timer.setInterval(SAVE_DELAY_MS)
+        self.save_timer.timeout.connect(self.flush_changes)
+        for name, model in self.models.items():
+            model.staged.connect(lambda name=name: self.schedule_save(name))
+
+        # 定期在后台线程中拉取服务器的变更（本地模式下检查其他进程对数据文件的修改），上一次完成前不会重复请求
+        self.pulling = False
+        self.sync_timer = QTimer(self)
+        self.sync_timer.setInterval(SYNC_INTERVAL_MS)
+        self.sync_timer.timeout.connect(self.pull_changes)
+
+        self.loading = True
         self.init_ui()
         self.load_data()
 
@@ -33,6 +119,30 @@ class TaxonomyManager(QMainWindow):
         tab_widget.addTab(self.create_taxonomy_tab(), "分类管理 (TAXid)")
         tab_widget.addTab(self.create_sample_tab(), "样本管理 (SMPid)")
 
+        # 状态栏显示加载进度和保存状态
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setMaximumWidth(240)
+        self.progress_bar.hide()
+        self.statusBar().addPermanentWidget(self.progress_bar)
+
+    def create_table_view(self, model, edit_handler, delete_handler):
+        """创建表格视图，操作列由委托绘制按钮，双击行同样进入编辑"""
+        view = QTableView()
+        view.setModel(model)
+        view.setSelectionBehavior(QTableView.SelectRows)
+        # 固定行高，视图不必为计算行高而读取所有行
+        view.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        view.verticalHeader().setDefaultSectionSize(28)
+        view.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
+        view.setColumnWidth(model.action_column, 140)
+
+        delegate = ActionDelegate(view)
+        delegate.editRequested.connect(lambda row: edit_handler(model.record(row)))
+        delegate.deleteRequested.connect(lambda row: delete_handler(model.record(row).get("id")))
+        view.setItemDelegateForColumn(model.action_column, delegate)
+        view.doubleClicked.connect(lambda index: edit_handler(model.record(index.row())))
+        return view
+
     def create_literature_tab(self):
         tab = QWidget()
         layout = QVBoxLayout()
@@ -70,12 +180,14 @@ class TaxonomyManager(QMainWindow):
         self.lit_save_btn = QPushButton("保存文献")
         self.lit_clear_btn = QPushButton("清空表单")
         self.lit_import_ris_btn = QPushButton("从RIS导入")
+        self.lit_import_ris_file_btn = QPushButton("从RIS文件批量导入")
         self.lit_generate_id_btn = QPushButton("生成ID")
         
         input_layout.addWidget(self.lit_generate_id_btn)
         input_layout.addWidget(self.lit_save_btn)
         input_layout.addWidget(self.lit_clear_btn)
         input_layout.addWidget(self.lit_import_ris_btn)
+        input_layout.addWidget(self.lit_import_ris_file_btn)
         
         input_group.setLayout(form_layout)
         
@@ -83,12 +195,11 @@ class TaxonomyManager(QMainWindow):
         self.lit_save_btn.clicked.connect(self.save_literature)
         self.lit_clear_btn.clicked.connect(self.clear_literature_form)
         self.lit_import_ris_btn.clicked.connect(self.import_from_ris)
+        self.lit_import_ris_file_btn.clicked.connect(self.import_ris_file)
         self.lit_generate_id_btn.clicked.connect(self.generate_literature_id)
         
         # 表格显示
-        self.lit_table = QTableWidget()
-        self.lit_table.setColumnCount(6)
-        self.lit_table.setHorizontalHeaderLabels(["文献ID", "标题", "作者", "期刊", "年份", "操作"])
+        self.lit_table = self.create_table_view(self.lit_model, self.edit_literature, self.delete_literature)
         
         layout.addWidget(input_group)
         layout.addLayout(input_layout)
@@ -105,12 +216,12 @@ class TaxonomyManager(QMainWindow):
         input_group = QGroupBox("添加/编辑分类")
         form_layout = QFormLayout()
         
-        self.tax_lit_id_input = QComboBox()
+        self.tax_lit_id_input = make_name_combobox(self.lit_choices, self.store['literature'], self.lit_titles)
         self.tax_level_input = QComboBox()
         self.tax_level_input.addItems(["Phylum", "Class", "Order", "Family", "Genus", "Species"])
         self.tax_type_input = QComboBox()
         self.tax_type_input.addItems(["new taxon", "new combination", "taxon swap [new synonym]"])
-        self.tax_parent_input = QComboBox()
+        self.tax_parent_input = make_name_combobox(self.tax_choices, self.store['taxonomy'], self.tax_names)
         self.tax_id_input = QLineEdit()
         self.tax_id_input.setPlaceholderText("例如: TAX-xxxxxx-xxxx-xxxx-xxxx-xxxxxxxxxxxx")
         self.tax_name_input = QLineEdit()
@@ -142,9 +253,7 @@ class TaxonomyManager(QMainWindow):
         self.tax_clear_btn.clicked.connect(self.clear_taxonomy_form)
         
         # 表格显示
-        self.tax_table = QTableWidget()
-        self.tax_table.setColumnCount(6)
-        self.tax_table.setHorizontalHeaderLabels(["分类ID", "名称", "级别", "类型", "文献ID", "操作"])
+        self.tax_table = self.create_table_view(self.tax_model, self.edit_taxonomy, self.delete_taxonomy)
         
         layout.addWidget(input_group)
         layout.addLayout(input_layout)
@@ -161,7 +270,7 @@ class TaxonomyManager(QMainWindow):
         input_group = QGroupBox("添加/编辑样本")
         form_layout = QFormLayout()
         
-        self.smp_tax_id_input = QComboBox()
+        self.smp_tax_id_input = make_name_combobox(self.tax_choices, self.store['taxonomy'], self.tax_names)
         self.smp_collector_input = QLineEdit()
         self.smp_latitude_input = QDoubleSpinBox()
         self.smp_latitude_input.setRange(-90, 90)
@@ -198,9 +307,7 @@ class TaxonomyManager(QMainWindow):
         self.smp_clear_btn.clicked.connect(self.clear_sample_form)
         
         # 表格显示
-        self.smp_table = QTableWidget()
-        self.smp_table.setColumnCount(6)
-        self.smp_table.setHorizontalHeaderLabels(["样本ID", "分类ID", "采集者", "纬度", "经度", "操作"])
+        self.smp_table = self.create_table_view(self.smp_model, self.edit_sample, self.delete_sample)
         
         layout.addWidget(input_group)
         layout.addLayout(input_layout)
@@ -225,57 +332,93 @@ class TaxonomyManager(QMainWindow):
         self.smp_id_input.setText(f"SMP-{unique_id}")
 
     def load_data(self):
-        # 加载文献数据
-        if os.path.exists("literature.json"):
-            with open("literature.json", "r", encoding="utf-8") as f:
-                self.literature_data = json.load(f)
-        
-        # 加载分类数据
-        if os.path.exists("taxonomy.json"):
-            with open("taxonomy.json", "r", encoding="utf-8") as f:
-                self.taxonomy_data = json.load(f)
-                
-        # 加载样本数据
-        if os.path.exists("sample.json"):
-            with open("sample.json", "r", encoding="utf-8") as f:
-                self.sample_data = json.load(f)
-                
-        self.refresh_all_tables()
-        self.update_comboboxes()
-
-    def save_data(self):
-        # 保存文献数据
-        with open("literature.json", "w", encoding="utf-8") as f:
-            json.dump(self.literature_data, f, ensure_ascii=False, indent=2)
-            
-        # 保存分类数据
-        with open("taxonomy.json", "w", encoding="utf-8") as f:
-            json.dump(self.taxonomy_data, f, ensure_ascii=False, indent=2)
-            
-        # 保存样本数据
-        with open("sample.json", "w", encoding="utf-8") as f:
-            json.dump(self.sample_data, f, ensure_ascii=False, indent=2)
+        # 在后台线程中加载，表格随解析进度逐批显示记录
+        self.loading = True
+        self.progress_bar.show()
+        self.loadRequested.emit(list(self.models))
+
+    def on_load_progress(self, name, records, done, total):
+        self.models[name].append_loaded(records)
+        self.progress_bar.setRange(0, 1000)
+        self.progress_bar.setValue(int(done * 1000 / total) if total else 1000)
+        self.progress_bar.setFormat(f"{name} %p%")
+        self.statusBar().showMessage(f"正在加载 {name}：{self.models[name].rowCount()} 条")
+
+    def on_collection_loaded(self, name):
+        # 换成集合加载完成后的列表（包含日志中的修改）
+        self.models[name].sync()
+
+    def on_load_finished(self):
+        self.loading = False
+        self.progress_bar.hide()
+        self.statusBar().showMessage("数据加载完成", 3000)
+        self.pull_changes()
+        self.sync_timer.start()
+
+    def pull_changes(self):
+        if not self.pulling:
+            self.pulling = True
+            self.pullRequested.emit()
+
+    def on_synced(self, changed):
+        self.pulling = False
+        for name in changed:
+            self.models[name].sync()
+        if changed and self.client is not None:
+            self.statusBar().showMessage(f"已从服务器同步到第 {self.client.cursor} 项变更", 3000)
+
+    def on_sync_failed(self, message):
+        if self.client is None:
+            self.statusBar().showMessage(f"读取数据文件失败: {message}", 5000)
+        else:
+            self.statusBar().showMessage(f"无法连接服务器: {message}", 5000)
+
+    def data_loading(self):
+        """数据仍在加载时提示用户稍候，返回是否仍在加载"""
+        if self.loading:
+            QMessageBox.information(self, "请稍候", "数据仍在加载，加载完成后才能修改。")
+        return self.loading
+
+    def schedule_save(self, name):
+        self.dirty.add(name)
+        self.save_timer.start()
+        self.statusBar().showMessage("有未保存的修改…")
+
+    def flush_changes(self):
+        """把计时期间累积的修改交给后台线程写入"""
+        if self.dirty:
+            names, self.dirty = sorted(self.dirty), set()
+            self.statusBar().showMessage("正在保存…")
+            self.flushRequested.emit(names)
+
+    def on_collection_saved(self, name, count):
+        # 写入时可能读到了其他进程的修改
+        self.models[name].sync()
+        if not self.dirty and not self.save_timer.isActive():
+            self.statusBar().showMessage("所有修改已保存", 3000)
+
+    def on_persistence_failed(self, name, message):
+        QMessageBox.warning(self, "错误", f"{name}: {message}")
+
+    def closeEvent(self, event):
+        # 停止后台线程（中断未完成的加载）后，在退出前写入尚未保存的修改
+        self.save_timer.stop()
+        self.sync_timer.stop()
+        self.worker_thread.requestInterruption()
+        self.worker_thread.quit()
+        self.worker_thread.wait()
+        # 客户端模式下同样先提交到服务器
+        self.worker.flush(list(self.models))
+        super().closeEvent(event)
 
     def refresh_all_tables(self):
         self.refresh_literature_table()
         self.refresh_taxonomy_table()
         self.refresh_sample_table()
 
-    def update_comboboxes(self):
-        # 更新文献下拉框
-        self.tax_lit_id_input.clear()
-        for lit in self.literature_data:
-            self.tax_lit_id_input.addItem(lit.get("id", "") + " - " + lit.get("title", ""), lit.get("id", ""))
-            
-        # 更新分类下拉框
-        self.tax_parent_input.clear()
-        self.smp_tax_id_input.clear()
-        for tax in self.taxonomy_data:
-            display_text = tax.get("id", "") + " - " + tax.get("name", "")
-            self.tax_parent_input.addItem(display_text, tax.get("id", ""))
-            self.smp_tax_id_input.addItem(display_text, tax.get("id", ""))
-
     def save_literature(self):
+        if self.data_loading():
+            return
         lit_id = self.lit_id_input.text().strip()
         title = self.lit_title_input.text().strip()
         authors = self.lit_authors_input.text().strip()
@@ -309,16 +452,9 @@ class TaxonomyManager(QMainWindow):
         if is_oa is not None:
             literature_entry["is_oa"] = is_oa
             
-        # 检查是否已存在相同ID的文献
-        existing_index = next((i for i, item in enumerate(self.literature_data) if item["id"] == lit_id), None)
-        if existing_index is not None:
-            self.literature_data[existing_index] = literature_entry
-        else:
-            self.literature_data.append(literature_entry)
+        # 检查是否已存在相同ID的文献，存在则更新，否则添加
+        self.lit_model.upsert(literature_entry)
             
-        self.save_data()
-        self.refresh_literature_table()
-        self.update_comboboxes()
         self.clear_literature_form()
         QMessageBox.information(self, "成功", "文献保存成功！")
 
@@ -335,7 +471,7 @@ class TaxonomyManager(QMainWindow):
         self.lit_ris_input.clear()
 
     def load_literature_into_form(self, row):
-        item = self.literature_data[row]
+        item = self.lit_model.record(row)
         self.lit_id_input.setText(item.get("id", ""))
         self.lit_title_input.setText(item.get("title", ""))
         self.lit_authors_input.setText(item.get("authors", ""))
@@ -369,74 +505,65 @@ class TaxonomyManager(QMainWindow):
             self.lit_authors_input.setText(lit_data.get("authors", ""))
             self.lit_journal_input.setText(lit_data.get("journal", ""))
             self.lit_year_input.setText(lit_data.get("year", ""))
+            self.lit_doi_input.setText(lit_data.get("doi", ""))
+            self.lit_url_input.setText(lit_data.get("url", ""))
+            self.lit_abstract_input.setPlainText(lit_data.get("abstract", ""))
             QMessageBox.information(self, "成功", "RIS解析成功！")
         else:
             QMessageBox.warning(self, "解析失败", "无法从RIS内容中提取有效信息！")
 
     def parse_ris_format(self, ris_text):
-        # 简单的RIS格式解析
-        lines = ris_text.split('\n')
-        lit_data = {"title": "", "authors": "", "journal": "", "year": ""}
-        
-        for line in lines:
-            if line.startswith("TI"):
-                lit_data["title"] = line[6:].strip() if len(line) > 6 else ""
-            elif line.startswith("AU"):
-                if lit_data["authors"]:
-                    lit_data["authors"] += "; " + line[6:].strip() if len(line) > 6 else ""
-                else:
-                    lit_data["authors"] = line[6:].strip() if len(line) > 6 else ""
-            elif line.startswith("JO"):
-                lit_data["journal"] = line[6:].strip() if len(line) > 6 else ""
-            elif line.startswith("PY"):
-                year_match = re.search(r'\d{4}', line)
-                if year_match:
-                    lit_data["year"] = year_match.group()
-                    
-        return lit_data
+        # 解析粘贴的RIS内容，只取第一条记录
+        return next(iter_ris_records(ris_text.splitlines()), None)
+
+    def import_ris_file(self):
+        if self.data_loading():
+            return
+        file_path, _ = QFileDialog.getOpenFileName(self, "选择RIS文件", "", "RIS文件 (*.ris *.txt);;所有文件 (*)")
+        if not file_path:
+            return
+
+        # 在后台线程中流式解析，解析出的记录分批暂存，导入完成前不能再次导入
+        self.lit_import_ris_file_btn.setEnabled(False)
+        self.statusBar().showMessage("正在导入RIS文件…")
+        self.importRisRequested.emit(file_path)
+
+    def on_ris_batch(self, records):
+        self.lit_model.upsert_many(records)
+
+    def on_ris_imported(self, imported, skipped, error):
+        self.lit_import_ris_file_btn.setEnabled(True)
+        if error:
+            QMessageBox.warning(self, "导入失败", f"读取RIS文件出错: {error}\n已导入 {imported} 条文献。")
+        else:
+            QMessageBox.information(self, "导入完成", f"成功导入 {imported} 条文献，跳过 {skipped} 条缺少标题的记录。")
 
     def save_taxonomy(self):
+        if self.data_loading():
+            return
         tax_id = self.tax_id_input.text().strip()
         name = self.tax_name_input.text().strip()
         level = self.tax_level_input.currentText()
         tax_type = self.tax_type_input.currentText()
-        lit_id = self.tax_lit_id_input.currentData()
-        parent_tax_id = self.tax_parent_input.currentData()
+        lit_id = selected_id(self.tax_lit_id_input, self.store['literature'])
+        parent_tax_id = selected_id(self.tax_parent_input, self.store['taxonomy'])
         description = self.tax_description_input.toPlainText().strip()
         
         if not tax_id or not name:
             QMessageBox.warning(self, "输入错误", "分类ID和名称不能为空！")
             return
             
-        # 检查是否已存在相同ID的分类
-        for i, tax in enumerate(self.taxonomy_data):
-            if tax.get("id") == tax_id:
-                # 更新现有分类
-                self.taxonomy_data[i] = {
-                    "id": tax_id,
-                    "name": name,
-                    "level": level,
-                    "type": tax_type,
-                    "lit_id": lit_id,
-                    "parent_tax_id": parent_tax_id,
-                    "description": description
-                }
-                break
-        else:
-            # 添加新分类
-            self.taxonomy_data.append({
-                "id": tax_id,
-                "name": name,
-                "level": level,
-                "type": tax_type,
-                "lit_id": lit_id,
-                "parent_tax_id": parent_tax_id,
-                "description": description
-            })
+        # 检查是否已存在相同ID的分类，存在则更新，否则添加新分类
+        self.tax_model.upsert({
+            "id": tax_id,
+            "name": name,
+            "level": level,
+            "type": tax_type,
+            "lit_id": lit_id,
+            "parent_tax_id": parent_tax_id,
+            "description": description
+        })
             
-        self.save_data()
-        self.refresh_taxonomy_table()
-        self.update_comboboxes()
         self.clear_taxonomy_form()
         QMessageBox.information(self, "成功", "分类保存成功！")
 
@@ -447,8 +574,10 @@ class TaxonomyManager(QMainWindow):
         self.tax_description_input.clear()
 
     def save_sample(self):
+        if self.data_loading():
+            return
         smp_id = self.smp_id_input.text().strip()
-        tax_id = self.smp_tax_id_input.currentData()
+        tax_id = selected_id(self.smp_tax_id_input, self.store['taxonomy'])
         collector = self.smp_collector_input.text().strip()
         latitude = self.smp_latitude_input.value()
         longitude = self.smp_longitude_input.value()
@@ -458,32 +587,16 @@ class TaxonomyManager(QMainWindow):
             QMessageBox.warning(self, "输入错误", "样本ID和分类ID不能为空！")
             return
             
-        # 检查是否已存在相同ID的样本
-        for i, smp in enumerate(self.sample_data):
-            if smp.get("id") == smp_id:
-                # 更新现有样本
-                self.sample_data[i] = {
-                    "id": smp_id,
-                    "tax_id": tax_id,
-                    "collector": collector,
-                    "latitude": latitude,
-                    "longitude": longitude,
-                    "description": description
-                }
-                break
-        else:
-            # 添加新样本
-            self.sample_data.append({
-                "id": smp_id,
-                "tax_id": tax_id,
-                "collector": collector,
-                "latitude": latitude,
-                "longitude": longitude,
-                "description": description
-            })
+        # 检查是否已存在相同ID的样本，存在则更新，否则添加新样本
+        self.smp_model.upsert({
+            "id": smp_id,
+            "tax_id": tax_id,
+            "collector": collector,
+            "latitude": latitude,
+            "longitude": longitude,
+            "description": description
+        })
             
-        self.save_data()
-        self.refresh_sample_table()
         self.clear_sample_form()
         QMessageBox.information(self, "成功", "样本保存成功！")
 
@@ -496,82 +609,13 @@ class TaxonomyManager(QMainWindow):
         self.smp_description_input.clear()
 
     def refresh_literature_table(self):
-        self.lit_table.setRowCount(len(self.literature_data))
-        for row, lit in enumerate(self.literature_data):
-            self.lit_table.setItem(row, 0, QTableWidgetItem(lit.get("id", "")))
-            self.lit_table.setItem(row, 1, QTableWidgetItem(lit.get("title", "")))
-            self.lit_table.setItem(row, 2, QTableWidgetItem(lit.get("authors", "")))
-            self.lit_table.setItem(row, 3, QTableWidgetItem(lit.get("journal", "")))
-            
-            # 显示年份
-            year_item = QTableWidgetItem(lit.get("year", ""))
-            self.lit_table.setItem(row, 4, year_item)
-            
-            # 添加操作按钮
-            btn_widget = QWidget()
-            btn_layout = QHBoxLayout(btn_widget)
-            edit_btn = QPushButton("编辑")
-            delete_btn = QPushButton("删除")
-            edit_btn.clicked.connect(lambda checked, l=lit: self.edit_literature(l))
-            delete_btn.clicked.connect(lambda checked, lid=lit.get("id"): self.delete_literature(lid))
-            btn_layout.addWidget(edit_btn)
-            btn_layout.addWidget(delete_btn)
-            btn_layout.setContentsMargins(0, 0, 0, 0)
-            self.lit_table.setCellWidget(row, 5, btn_widget)
-            
-            # 添加操作按钮
-            btn_widget = QWidget()
-            btn_layout = QHBoxLayout(btn_widget)
-            edit_btn = QPushButton("编辑")
-            delete_btn = QPushButton("删除")
-            edit_btn.clicked.connect(lambda checked, l=lit: self.edit_literature(l))
-            delete_btn.clicked.connect(lambda checked, lid=lit.get("id"): self.delete_literature(lid))
-            btn_layout.addWidget(edit_btn)
-            btn_layout.addWidget(delete_btn)
-            btn_layout.setContentsMargins(0, 0, 0, 0)
-            self.lit_table.setCellWidget(row, 5, btn_widget)
+        self.lit_model.sync()
 
     def refresh_taxonomy_table(self):
-        self.tax_table.setRowCount(len(self.taxonomy_data))
-        for row, tax in enumerate(self.taxonomy_data):
-            self.tax_table.setItem(row, 0, QTableWidgetItem(tax.get("id", "")))
-            self.tax_table.setItem(row, 1, QTableWidgetItem(tax.get("name", "")))
-            self.tax_table.setItem(row, 2, QTableWidgetItem(tax.get("level", "")))
-            self.tax_table.setItem(row, 3, QTableWidgetItem(tax.get("type", "")))
-            self.tax_table.setItem(row, 4, QTableWidgetItem(tax.get("lit_id", "")))
-            
-            # 添加操作按钮
-            btn_widget = QWidget()
-            btn_layout = QHBoxLayout(btn_widget)
-            edit_btn = QPushButton("编辑")
-            delete_btn = QPushButton("删除")
-            edit_btn.clicked.connect(lambda checked, t=tax: self.edit_taxonomy(t))
-            delete_btn.clicked.connect(lambda checked, tid=tax.get("id"): self.delete_taxonomy(tid))
-            btn_layout.addWidget(edit_btn)
-            btn_layout.addWidget(delete_btn)
-            btn_layout.setContentsMargins(0, 0, 0, 0)
-            self.tax_table.setCellWidget(row, 5, btn_widget)
+        self.tax_model.sync()
 
     def refresh_sample_table(self):
-        self.smp_table.setRowCount(len(self.sample_data))
-        for row, smp in enumerate(self.sample_data):
-            self.smp_table.setItem(row, 0, QTableWidgetItem(smp.get("id", "")))
-            self.smp_table.setItem(row, 1, QTableWidgetItem(smp.get("tax_id", "")))
-            self.smp_table.setItem(row, 2, QTableWidgetItem(smp.get("collector", "")))
-            self.smp_table.setItem(row, 3, QTableWidgetItem(str(smp.get("latitude", ""))))
-            self.smp_table.setItem(row, 4, QTableWidgetItem(str(smp.get("longitude", ""))))
-            
-            # 添加操作按钮
-            btn_widget = QWidget()
-            btn_layout = QHBoxLayout(btn_widget)
-            edit_btn = QPushButton("编辑")
-            delete_btn = QPushButton("删除")
-            edit_btn.clicked.connect(lambda checked, s=smp: self.edit_sample(s))
-            delete_btn.clicked.connect(lambda checked, sid=smp.get("id"): self.delete_sample(sid))
-            btn_layout.addWidget(edit_btn)
-            btn_layout.addWidget(delete_btn)
-            btn_layout.setContentsMargins(0, 0, 0, 0)
-            self.smp_table.setCellWidget(row, 5, btn_widget)
+        self.smp_model.sync()
 
     def edit_literature(self, literature):
         self.lit_id_input.setText(literature.get("id", ""))
@@ -593,13 +637,12 @@ class TaxonomyManager(QMainWindow):
             self.lit_is_oa_input.clear()
 
     def delete_literature(self, lit_id):
+        if self.data_loading():
+            return
         reply = QMessageBox.question(self, "确认删除", f"确定要删除文献 {lit_id} 吗？",
                                      QMessageBox.Yes | QMessageBox.No)
         if reply == QMessageBox.Yes:
-            self.literature_data = [lit for lit in self.literature_data if lit.get("id") != lit_id]
-            self.save_data()
-            self.refresh_literature_table()
-            self.update_comboboxes()
+            self.lit_model.delete(lit_id)
             QMessageBox.information(self, "成功", "文献删除成功！")
 
     def edit_taxonomy(self, taxonomy):
@@ -618,25 +661,18 @@ class TaxonomyManager(QMainWindow):
             self.tax_type_input.setCurrentIndex(type_index)
             
         # 设置文献ID
-        for i in range(self.tax_lit_id_input.count()):
-            if self.tax_lit_id_input.itemData(i) == taxonomy.get("lit_id"):
-                self.tax_lit_id_input.setCurrentIndex(i)
-                break
+        select_id(self.tax_lit_id_input, self.store['literature'], taxonomy.get("lit_id"))
                 
         # 设置父分类ID
-        for i in range(self.tax_parent_input.count()):
-            if self.tax_parent_input.itemData(i) == taxonomy.get("parent_tax_id"):
-                self.tax_parent_input.setCurrentIndex(i)
-                break
+        select_id(self.tax_parent_input, self.store['taxonomy'], taxonomy.get("parent_tax_id"))
 
     def delete_taxonomy(self, tax_id):
+        if self.data_loading():
+            return
         reply = QMessageBox.question(self, "确认删除", f"确定要删除分类 {tax_id} 吗？",
                                      QMessageBox.Yes | QMessageBox.No)
         if reply == QMessageBox.Yes:
-            self.taxonomy_data = [tax for tax in self.taxonomy_data if tax.get("id") != tax_id]
-            self.save_data()
-            self.refresh_taxonomy_table()
-            self.update_comboboxes()
+            self.tax_model.delete(tax_id)
             QMessageBox.information(self, "成功", "分类删除成功！")
 
     def edit_sample(self, sample):
@@ -647,18 +683,15 @@ class TaxonomyManager(QMainWindow):
         self.smp_description_input.setPlainText(sample.get("description", ""))
         
         # 设置分类ID
-        for i in range(self.smp_tax_id_input.count()):
-            if self.smp_tax_id_input.itemData(i) == sample.get("tax_id"):
-                self.smp_tax_id_input.setCurrentIndex(i)
-                break
+        select_id(self.smp_tax_id_input, self.store['taxonomy'], sample.get("tax_id"))
 
     def delete_sample(self, smp_id):
+        if self.data_loading():
+            return
         reply = QMessageBox.question(self, "确认删除", f"确定要删除样本 {smp_id} 吗？",
                                      QMessageBox.Yes | QMessageBox.No)
         if reply == QMessageBox.Yes:
-            self.sample_data = [smp for smp in self.sample_data if smp.get("id") != smp_id]
-            self.save_data()
-            self.refresh_sample_table()
+            self.smp_model.delete(smp_id)
             QMessageBox.information(self, "成功", "样本删除成功！")
 
 